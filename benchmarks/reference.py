@@ -0,0 +1,175 @@
+import os
+import re
+
+# Implementazione originale del diff, del blame e del filtro delle righe, usata come riferimento per verificare che
+# i percorsi ottimizzati restituiscano gli stessi commit candidati. La selezione delle righe segue le regole attuali:
+# si analizzano le righe del parent (il lato '+c,d' di ogni hunk del diff 'commit parent'), scartando quelle vuote o
+# di solo commento, e i file assenti nel parent vengono ignorati. Il riconoscimento dei commenti è scritto qui in modo
+# indipendente da src.main, a partire dalle stesse regole.
+
+# (commenti di riga, commenti di blocco) per linguaggio
+PYTHON_SYNTAX = (('#',), (('"""', '"""'), ("'''", "'''")))
+C_SYNTAX = (('//',), (('/*', '*/'),))
+HASH_SYNTAX = (('#',), ())
+MARKUP_SYNTAX = ((), (('<!--', '-->'),))
+GENERIC_SYNTAX = (('#', '//'), (('/*', '*/'), ('<!--', '-->'), ('"""', '"""'), ("'''", "'''")))
+SYNTAX_BY_EXTENSION = {}
+for extensions, syntax in (
+        ('.py .pyw .pyi .pyx', PYTHON_SYNTAX),
+        ('.c .h .cc .cpp .cxx .hh .hpp .hxx .java .js .jsx .mjs .cjs .ts .tsx .go .rs .cs .kt .kts .swift .scala .php '
+         '.m .mm .dart .groovy .gradle .css .scss .less .proto .cu .sol', C_SYNTAX),
+        ('.sh .bash .zsh .rb .pl .pm .r .yml .yaml .toml .cmake .mk .ps1 .tcl .nim .jl .ex .exs .bzl .cfg .conf '
+         '.dockerfile', HASH_SYNTAX),
+        ('.sql', (('--',), (('/*', '*/'),))),
+        ('.lua', (('--',), (('--[[', ']]'),))),
+        ('.hs', (('--',), (('{-', '-}'),))),
+        ('.html .htm .xml .xhtml .svg .vue .md', MARKUP_SYNTAX),
+        ('.lisp .clj .cljs .el .scm .asm .s', ((';',), ())),
+        ('.tex .sty .erl', (('%',), ())),
+        ('.vim', (('"',), ())),
+        ('.ini', ((';', '#'), ()))):
+    SYNTAX_BY_EXTENSION.update(dict.fromkeys(extensions.split(), syntax))
+SYNTAX_BY_FILE_NAME = dict.fromkeys(['makefile', 'dockerfile', 'cmakelists.txt', 'build', 'gemfile', 'rakefile',
+                                     'vagrantfile'], HASH_SYNTAX)
+
+
+def get_syntax(file_path):
+    file_name = os.path.basename(file_path).lower()
+    return SYNTAX_BY_FILE_NAME.get(file_name) or SYNTAX_BY_EXTENSION.get(os.path.splitext(file_name)[1],
+                                                                         GENERIC_SYNTAX)
+
+
+def is_comment_only(text, line_comments, block_comments):
+    # la riga è formata solo da commenti di blocco chiusi, seguiti al più da un commento di riga
+    text = text.strip()
+    while text:
+        if any(text.startswith(prefix) for prefix in line_comments):
+            return True
+        for start, end in block_comments:
+            close = text.find(end, len(start)) if text.startswith(start) else -1
+            if close >= 0:
+                text = text[close + len(end):].strip()
+                break
+        else:
+            return False
+    return True
+
+
+def get_code_line_numbers(file_path, start_line, lines):
+    # numeri di riga delle righe di codice di un hunk: lo stato dei commenti di blocco vale solo all'interno dell'hunk
+    line_comments, block_comments = get_syntax(file_path)
+    code_numbers = []
+    open_block_end = None
+    for line_number, line in enumerate(lines, start_line):
+        text = line.strip()
+        if open_block_end is not None:
+            if open_block_end not in text:
+                continue
+            text = text[text.index(open_block_end) + len(open_block_end):].strip()
+            open_block_end = None
+        if not text or is_comment_only(text, line_comments, block_comments):
+            continue
+
+        for start, end in block_comments:
+            if start == end:
+                # i delimitatori uguali (le docstring) scartano solo la riga che contiene il delimitatore da solo
+                if text == start:
+                    break
+            elif text.startswith(start) and end not in text[len(start):]:
+                open_block_end = end
+                break
+            elif text.endswith(end) and start not in text:
+                break
+        else:
+            code_numbers.append(line_number)
+    return code_numbers
+
+
+def generate_changes_dict(diff_output):
+    file_path_pattern = re.compile(r'^\+\+\+ b/(.*)$')
+    line_number_pattern = re.compile(r'^@@ -(\d+)(,(\d+))? \+(\d+)(,(\d+))? @@')
+
+    result_dict = {}
+    current_file_path = None
+    numbers_list = []
+
+    diff_lines = iter(diff_output.split('\n'))
+    for line in diff_lines:
+        line_number_match = line_number_pattern.match(line)
+
+        if line.startswith('+++ '):
+            if current_file_path and numbers_list:
+                result_dict[current_file_path] = numbers_list
+            numbers_list = []
+            file_path_match = file_path_pattern.match(line)
+            current_file_path = file_path_match.group(1) if file_path_match else None
+        elif line_number_match:
+            num_lines = 1 if line_number_match.group(3) is None else int(line_number_match.group(3))
+            parent_start_line = int(line_number_match.group(4))
+            parent_num_lines = 1 if line_number_match.group(6) is None else int(line_number_match.group(6))
+
+            hunk_lines = []
+            while len(hunk_lines) < num_lines + parent_num_lines:
+                hunk_line = next(diff_lines)
+                if not hunk_line.startswith('\\'):
+                    hunk_lines.append(hunk_line)
+            if current_file_path is None:
+                continue
+
+            # le righe '+' sono le righe del parent, con la numerazione del parent
+            parent_lines = [hunk_line[1:] for hunk_line in hunk_lines if hunk_line.startswith('+')]
+            numbers_list.extend(get_code_line_numbers(current_file_path, parent_start_line, parent_lines))
+
+    if current_file_path and numbers_list:
+        result_dict[current_file_path] = numbers_list
+
+    return result_dict
+
+
+def get_candidate_commits(repo, blame_result, file_path, changes_dict, recent):
+    pattern = re.compile(r'([a-f0-9]+)\s+(\d+)\s+(\d+)?(?:\s+(\d+))?\nauthor\s+([^\n]+)')
+
+    commit_set = set()
+    most_recent_commit = None
+
+    for commit_hash, first_number, second_number, third_number, author in pattern.findall(blame_result):
+        if int(second_number) in changes_dict.get(file_path, []):
+            if recent:
+                if most_recent_commit is None or \
+                        repo.commit(commit_hash).committed_date > repo.commit(most_recent_commit[0]).committed_date:
+                    most_recent_commit = (commit_hash, author)
+            else:
+                commit_set.add((commit_hash, author))
+
+    if recent and most_recent_commit is not None:
+        commit_set.add(most_recent_commit)
+
+    return commit_set
+
+
+def search_candidate_commit_szz(repo, bug_fix_commit, recent=False, stage_timer=None):
+    stage_timer = stage_timer or (lambda name: _NullTimer())
+    all_candidate_commits = set()
+    parent_commit = bug_fix_commit.parents[0]
+
+    with stage_timer('diff'):
+        diff = repo.git.diff(bug_fix_commit.hexsha, parent_commit.hexsha, '-U0', '--histogram')
+    with stage_timer('parse'):
+        changes_dict = generate_changes_dict(diff)
+
+    for file_path in changes_dict:
+        with stage_timer('blame'):
+            blame_result = repo.git.blame(parent_commit.hexsha, file_path, "--line-porcelain")
+        with stage_timer('filter'):
+            all_candidate_commits |= get_candidate_commits(repo, blame_result, file_path, changes_dict, recent)
+
+    return all_candidate_commits
+
+
+class _NullTimer:
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
@@ -0,0 +1,198 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import git
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import src.main as szz_main  # noqa: E402
+from benchmarks import reference  # noqa: E402
+from benchmarks.synthetic_repo import generate_repository  # noqa: E402
+
+STAGES = ['discovery', 'diff', 'parse', 'blame', 'filter']
+
+
+class StageTimer:
+    # Accumula il tempo trascorso in ciascuna fase dell'analisi
+
+    def __init__(self):
+        self.seconds = {}
+
+    @contextmanager
+    def __call__(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[stage] = self.seconds.get(stage, 0.0) + time.perf_counter() - start
+
+
+def run_optimized(bug_fix_commits, timer):
+    # ripete i passi di search_candidate_commit_szz misurando separatamente ciascuna fase
+    results = {}
+    for bug_fix_commit in bug_fix_commits:
+        parent_sha = bug_fix_commit.parents[0].hexsha
+        if isinstance(szz_main.backend, szz_main.GitCliBackend):
+            with timer('diff'):
+                diff_lines = list(szz_main.stream_git_diff(bug_fix_commit.hexsha, parent_sha))
+            with timer('parse'):
+                changes_dict = szz_main.generate_changes_dict(diff_lines)
+        else:
+            # gli altri backend restituiscono direttamente gli intervalli modificati
+            with timer('diff'):
+                changes_dict = szz_main.backend.get_changes(bug_fix_commit.hexsha, parent_sha)
+
+        all_candidate_commits = set()
+        for file_path, line_ranges in changes_dict.items():
+            with timer('blame'):
+                blame_result = szz_main.backend.blame(parent_sha, file_path, line_ranges)
+            with timer('filter'):
+                all_candidate_commits |= szz_main.get_candidate_commits(blame_result, file_path, changes_dict)
+        results[bug_fix_commit.hexsha] = all_candidate_commits
+
+    return results
+
+
+def run_reference(repository, bug_fix_commits, recent, timer):
+    return {bug_fix_commit.hexsha: reference.search_candidate_commit_szz(repository, bug_fix_commit, recent, timer)
+            for bug_fix_commit in bug_fix_commits}
+
+
+def compare_results(results, reference_results):
+    # restituisce i commit bug fix per cui i commit candidati non coincidono con quelli dell'implementazione originale
+    return sorted(bug_fix_sha for bug_fix_sha in reference_results
+                  if set(results.get(bug_fix_sha, ())) != reference_results[bug_fix_sha])
+
+
+def run_benchmark(repo_path, fix_limit, recent, discovery, use_git_pool, backend):
+    szz_main.repo = git.Repo(repo_path)
+    # gli argomenti partono dai valori predefiniti della riga di comando
+    szz_main.args = szz_main.create_parser().parse_args([])
+    vars(szz_main.args).update(recent=recent, discovery=discovery, git_pool=use_git_pool, backend=backend)
+    szz_main.backend = szz_main.create_backend(backend, szz_main.repo)
+    szz_main.git_pool = szz_main.GitProcessPool(szz_main.repo.git_dir) if use_git_pool else None
+
+    timer = StageTimer()
+    with timer('discovery'):
+        bug_fix_commits = list(szz_main.get_bug_fix_commits_for_szz())
+    # i commit senza parent non hanno un diff da analizzare
+    bug_fix_commits = [bug_fix_commit for bug_fix_commit in bug_fix_commits if bug_fix_commit.parents][:fix_limit]
+
+    optimized_results = run_optimized(bug_fix_commits, timer)
+
+    start = time.perf_counter()
+    end_to_end_results = {bug_fix_commit.hexsha: szz_main.search_candidate_commit_szz(bug_fix_commit)
+                          for bug_fix_commit in bug_fix_commits}
+    end_to_end_seconds = time.perf_counter() - start
+
+    reference_timer = StageTimer()
+    reference_results = run_reference(szz_main.repo, bug_fix_commits, recent, reference_timer)
+
+    if szz_main.git_pool is not None:
+        szz_main.git_pool.close()
+    szz_main.backend.close()
+    szz_main.repo.close()
+
+    mismatches = sorted(set(compare_results(optimized_results, reference_results) +
+                            compare_results(end_to_end_results, reference_results)))
+    return {
+        'bug_fix_commits': len(bug_fix_commits),
+        'candidate_commits': sum(len(candidates) for candidates in reference_results.values()),
+        'stages': {stage: timer.seconds.get(stage, 0.0) for stage in STAGES},
+        'end_to_end': end_to_end_seconds,
+        'reference_stages': {stage: reference_timer.seconds.get(stage, 0.0) for stage in STAGES[1:]},
+        'equivalent': not mismatches,
+        'mismatches': mismatches,
+    }
+
+
+def get_tool_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def save_run(output_path, run):
+    # i risultati vengono aggiunti a quelli delle esecuzioni precedenti, così da poterli confrontare nel tempo con
+    # l'ultima esecuzione fatta con gli stessi parametri
+    runs = []
+    if os.path.exists(output_path):
+        with open(output_path) as output_file:
+            runs = json.load(output_file)
+    previous_run = next((previous for previous in reversed(runs) if previous['parameters'] == run['parameters']),
+                        None)
+    runs.append(run)
+    with open(output_path, 'w') as output_file:
+        json.dump(runs, output_file, indent=2)
+    return previous_run
+
+
+def print_run(run, previous_run):
+    print(f"Bug-fix commits analyzed: {run['results']['bug_fix_commits']}")
+    for stage, seconds in run['results']['stages'].items():
+        line = f'{stage:>10}: {seconds:9.3f}s'
+        reference_seconds = run['results']['reference_stages'].get(stage)
+        if reference_seconds:
+            line += f'  (reference {reference_seconds:9.3f}s)'
+        if previous_run is not None and previous_run['results']['stages'].get(stage):
+            line += f"  x{seconds / previous_run['results']['stages'][stage]:.2f} vs previous run"
+        print(line)
+    print(f"End to end: {run['results']['end_to_end']:.3f}s")
+    if run['results']['equivalent']:
+        print('The candidate commits are the same as the reference implementation')
+    else:
+        print(f"The candidate commits differ from the reference implementation for: "
+              f"{', '.join(run['results']['mismatches'])}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark the SZZ stages on a synthetic or existing repository")
+    parser.add_argument('--repo-path', type=str,
+                        help="Existing repository to analyze. If omitted a synthetic repository is generated")
+    parser.add_argument('--commits', type=int, default=500, help="Number of commits of the synthetic repository")
+    parser.add_argument('--files', type=int, default=20, help="Number of files of the synthetic repository")
+    parser.add_argument('--file-lines', type=int, default=1000, help="Initial number of lines of each file")
+    parser.add_argument('--fix-density', type=float, default=0.2, help="Fraction of commits that are bug fixes")
+    parser.add_argument('--hunk-size', type=int, default=3, help="Number of lines replaced by each hunk")
+    parser.add_argument('--hunks-per-commit', type=int, default=2, help="Number of hunks for each changed file")
+    parser.add_argument('--comment-density', type=float, default=0.2,
+                        help="Fraction of lines of the synthetic repository that are comments or blank lines")
+    parser.add_argument('--seed', type=int, default=42, help="Seed of the random generator")
+    parser.add_argument('--fix-limit', type=int, default=100, help="Maximum number of bug-fix commits analyzed")
+    parser.add_argument('-r', '--recent', action='store_true', help="Benchmark the most recent commit selection")
+    parser.add_argument('--discovery', choices=['python', 'git'], default='python',
+                        help="Bug-fix commit discovery mode")
+    parser.add_argument('--git-pool', action='store_true', help="Use long-lived git processes")
+    parser.add_argument('--backend', choices=['cli', 'pygit2'], default='cli', help="Repository access backend")
+    parser.add_argument('--output', type=str, default='benchmark_results.json',
+                        help="JSON file where the results of every run are appended")
+    benchmark_args = parser.parse_args()
+
+    parameters = {key: value for key, value in vars(benchmark_args).items() if key != 'output'}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        repo_path = benchmark_args.repo_path
+        if repo_path is None:
+            repo_path = os.path.join(tmp_dir, 'synthetic')
+            generate_repository(repo_path, benchmark_args.commits, benchmark_args.files, benchmark_args.file_lines,
+                                benchmark_args.fix_density, benchmark_args.hunk_size,
+                                benchmark_args.hunks_per_commit, benchmark_args.comment_density, benchmark_args.seed)
+        results = run_benchmark(repo_path, benchmark_args.fix_limit, benchmark_args.recent, benchmark_args.discovery,
+                                benchmark_args.git_pool, benchmark_args.backend)
+
+    benchmark_run = {
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'tool_revision': get_tool_revision(),
+        'parameters': parameters,
+        'results': results,
+    }
+    print_run(benchmark_run, save_run(benchmark_args.output, benchmark_run))
+    sys.exit(0 if results['equivalent'] else 1)
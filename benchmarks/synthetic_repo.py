@@ -0,0 +1,90 @@
+import argparse
+import random
+import subprocess
+
+AUTHORS = ['Alice Rossi', 'Bruno Bianchi', 'Carla Verdi', 'Davide Russo', 'Elena Romano']
+
+
+def generate_line(rng, comment_density, code_line):
+    # una frazione comment_density delle righe è un commento o una riga vuota, così gli hunk sostituiscono anche
+    # codice con commenti e viceversa
+    choice = rng.random()
+    if choice < comment_density / 2:
+        return f'# note on {code_line.split()[0]}'
+    if choice < comment_density:
+        return ''
+    return code_line
+
+
+def generate_repository(repo_path, commits=500, files=20, file_lines=1000, fix_density=0.2, hunk_size=3,
+                        hunks_per_commit=2, comment_density=0.2, seed=42):
+    # Crea un repository git locale con una storia sintetica. La storia viene scritta con git fast-import, così anche
+    # migliaia di commit vengono generati in pochi secondi. Una frazione fix_density dei commit ha un messaggio da
+    # commit bug fix e riferisce un'issue, gli altri sono commit di funzionalità.
+    rng = random.Random(seed)
+    file_contents = {f'src/module_{index}.py': [generate_line(rng, comment_density, f'value_{index}_{line} = {line}')
+                                                for line in range(file_lines)]
+                     for index in range(files)}
+    stream = []
+    timestamp = 1600000000
+    line_counter = 0
+
+    for commit_index in range(commits):
+        if commit_index == 0:
+            changed_paths = list(file_contents)
+            message = 'Initial import'
+        else:
+            changed_paths = rng.sample(list(file_contents), min(files, rng.randint(1, 3)))
+            if rng.random() < fix_density:
+                message = f'Fix bug #{commit_index} in {changed_paths[0]}'
+            else:
+                message = f'Add feature {commit_index}'
+
+            for path in changed_paths:
+                lines = file_contents[path]
+                for _ in range(hunks_per_commit):
+                    # ogni hunk sostituisce hunk_size righe e a volte ne aggiunge o ne toglie una
+                    start = rng.randrange(max(len(lines) - hunk_size, 1))
+                    new_lines = []
+                    for _ in range(hunk_size + rng.choice([-1, 0, 0, 1])):
+                        line_counter += 1
+                        new_lines.append(generate_line(rng, comment_density,
+                                                       f'changed_{line_counter} = {commit_index}'))
+                    lines[start:start + hunk_size] = new_lines
+
+        timestamp += rng.randint(60, 86400)
+        author = rng.choice(AUTHORS)
+        signature = f'{author} <{author.split()[0].lower()}@example.com> {timestamp} +0000'
+        message_bytes = message.encode('utf-8')
+        stream.append(f'commit refs/heads/master\nmark :{commit_index + 1}\nauthor {signature}\n'
+                      f'committer {signature}\ndata {len(message_bytes)}\n'.encode('utf-8') + message_bytes + b'\n')
+        if commit_index:
+            stream.append(f'from :{commit_index}\n'.encode('utf-8'))
+        for path in changed_paths:
+            content = ('\n'.join(file_contents[path]) + '\n').encode('utf-8')
+            stream.append(f'M 100644 inline {path}\ndata {len(content)}\n'.encode('utf-8') + content + b'\n')
+        stream.append(b'\n')
+
+    subprocess.run(['git', 'init', '-q', repo_path], check=True)
+    subprocess.run(['git', '-C', repo_path, 'symbolic-ref', 'HEAD', 'refs/heads/master'], check=True)
+    subprocess.run(['git', '-C', repo_path, 'fast-import', '--quiet'], input=b''.join(stream), check=True)
+    subprocess.run(['git', '-C', repo_path, 'reset', '-q', '--hard'], check=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Generate a synthetic git repository for the SZZ benchmarks")
+    parser.add_argument('repo_path', type=str, help="Directory where the repository is created")
+    parser.add_argument('--commits', type=int, default=500, help="Number of commits in the history")
+    parser.add_argument('--files', type=int, default=20, help="Number of files in the repository")
+    parser.add_argument('--file-lines', type=int, default=1000, help="Initial number of lines of each file")
+    parser.add_argument('--fix-density', type=float, default=0.2, help="Fraction of commits that are bug fixes")
+    parser.add_argument('--hunk-size', type=int, default=3, help="Number of lines replaced by each hunk")
+    parser.add_argument('--hunks-per-commit', type=int, default=2, help="Number of hunks for each changed file")
+    parser.add_argument('--comment-density', type=float, default=0.2,
+                        help="Fraction of lines that are comments or blank lines")
+    parser.add_argument('--seed', type=int, default=42, help="Seed of the random generator")
+    generator_args = parser.parse_args()
+
+    generate_repository(generator_args.repo_path, generator_args.commits, generator_args.files,
+                        generator_args.file_lines, generator_args.fix_density, generator_args.hunk_size,
+                        generator_args.hunks_per_commit, generator_args.comment_density, generator_args.seed)
@@ -1,9 +1,184 @@
+import abc
 import argparse
+import asyncio
+import bisect
+import codecs
+import csv
+import heapq
 import json
+import os
+import sqlite3
+import subprocess
+import sys
+import time
+import tracemalloc
+from array import array
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager, nullcontext
+from functools import lru_cache
+from itertools import islice, tee
 from datetime import datetime
 import git
 import re
 
+try:
+    import resource
+except ImportError:  # non disponibile su Windows
+    resource = None
+
+try:
+    import pygit2
+except ImportError:  # il backend pygit2 è opzionale
+    pygit2 = None
+
+DEFAULT_BLAME_CACHE_SIZE = 100000
+SLOWEST_FIX_COMMITS = 10
+# commit bug fix inviati al pool di processi per ogni processo prima di attendere il primo risultato
+PIPELINE_WINDOW_PER_JOB = 4
+# repository tenuti aperti da ogni processo durante l'analisi in batch
+BATCH_REPOSITORY_CACHE_SIZE = 8
+# numero di commit caricati singolarmente oltre il quale si costruisce la tabella dei metadati
+COMMIT_METADATA_LOOKUP_THRESHOLD = 64
+BLAME_CACHE_SCHEMA_VERSION = 3
+# riga passata a git diff-tree --stdin dopo ogni richiesta: non inizia con uno sha, quindi git la ristampa così com'è
+# subito dopo il diff, e nessuna riga di un diff può iniziare con '#'
+DIFF_END_MARKER = '#szz-diff-end'
+LINE_INDEX_MAGIC = b'SZZ-LINE-INDEX 2\n'
+LINE_INDEX_COMMIT_MARKER = '#szz-commit '
+LINE_ALIVE = 0xFFFFFFFF
+BLAME_HEADER_PATTERN = re.compile(r'([0-9a-f]{40,64})\s+\d+\s+(\d+)')
+
+CommitInfo = namedtuple('CommitInfo', ['hexsha', 'parents', 'author', 'committed_date', 'message'])
+BatchEntry = namedtuple('BatchEntry', ['repo_path', 'issue', 'pattern', 'output'])
+RepositoryContext = namedtuple('RepositoryContext', ['repo', 'backend', 'blame_cache', 'git_pool'])
+
+
+class Profiler:
+    # Raccoglie, se abilitato, il tempo reale e di CPU di ogni fase, i processi git avviati con i byte letti, i
+    # contatori del blame e i commit bug fix più lenti. Quando è disabilitato ogni metodo non fa nulla, così le
+    # chiamate possono restare nel codice senza costi.
+
+    def __init__(self, enabled=False, trace_memory=False):
+        self.enabled = enabled
+        self.trace_memory = enabled and trace_memory
+        self.reset()
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def reset(self):
+        self.stages = {}
+        self.subprocesses = {}
+        self.counters = {}
+        self.slowest_fix_commits = []
+
+    def stage(self, name):
+        return self._measure_stage(name) if self.enabled else nullcontext()
+
+    @contextmanager
+    def _measure_stage(self, name):
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        children_start = os.times()
+        try:
+            yield
+        finally:
+            children_end = os.times()
+            stage = self.stages.setdefault(name, {'calls': 0, 'wall_time': 0.0, 'cpu_time': 0.0,
+                                                  'children_cpu_time': 0.0})
+            stage['calls'] += 1
+            stage['wall_time'] += time.perf_counter() - wall_start
+            stage['cpu_time'] += time.process_time() - cpu_start
+            # tempo di CPU dei processi git terminati durante la fase
+            stage['children_cpu_time'] += (children_end.children_user - children_start.children_user +
+                                           children_end.children_system - children_start.children_system)
+
+    def iter_stage(self, name, iterable):
+        # le fasi in streaming vengono misurate solo mentre producono ciascun elemento
+        return self._measure_iter_stage(name, iter(iterable)) if self.enabled else iterable
+
+    def _measure_iter_stage(self, name, iterator):
+        while True:
+            with self._measure_stage(name):
+                item = next(iterator, StopIteration)
+            if item is StopIteration:
+                return
+            yield item
+
+    def fix_commit(self, commit_sha):
+        return self._measure_fix_commit(commit_sha) if self.enabled else nullcontext()
+
+    @contextmanager
+    def _measure_fix_commit(self, commit_sha):
+        wall_start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_fix_commit(commit_sha, time.perf_counter() - wall_start)
+
+    def add_fix_commit(self, commit_sha, seconds):
+        # si conservano solo i commit più lenti in un heap di dimensione fissa
+        heapq.heappush(self.slowest_fix_commits, (seconds, commit_sha))
+        if len(self.slowest_fix_commits) > SLOWEST_FIX_COMMITS:
+            heapq.heappop(self.slowest_fix_commits)
+
+    def count_subprocess(self, command):
+        if self.enabled:
+            self.subprocesses.setdefault(command, {'spawned': 0, 'bytes_read': 0})['spawned'] += 1
+
+    def add_bytes_read(self, command, bytes_read):
+        if self.enabled:
+            self.subprocesses.setdefault(command, {'spawned': 0, 'bytes_read': 0})['bytes_read'] += bytes_read
+
+    def count(self, name, value=1):
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def take(self):
+        # restituisce i dati raccolti finora e li azzera, per inviarli da un processo del pool a quello principale
+        data = {'stages': self.stages, 'subprocesses': self.subprocesses, 'counters': self.counters,
+                'slowest_fix_commits': self.slowest_fix_commits}
+        self.reset()
+        return data
+
+    def merge(self, data):
+        for name, stage in data['stages'].items():
+            merged_stage = self.stages.setdefault(name, dict.fromkeys(stage, 0))
+            for key, value in stage.items():
+                merged_stage[key] += value
+        for command, subprocess_stats in data['subprocesses'].items():
+            merged_stats = self.subprocesses.setdefault(command, {'spawned': 0, 'bytes_read': 0})
+            for key, value in subprocess_stats.items():
+                merged_stats[key] += value
+        for name, value in data['counters'].items():
+            self.count(name, value)
+        for seconds, commit_sha in data['slowest_fix_commits']:
+            self.add_fix_commit(commit_sha, seconds)
+
+    def report(self):
+        memory = {}
+        if resource is not None:
+            # ru_maxrss è espresso in kilobyte su Linux
+            memory['max_rss_kb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            memory['children_max_rss_kb'] = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+        if self.trace_memory:
+            memory['python_peak_bytes'] = tracemalloc.get_traced_memory()[1]
+            memory['top_allocations'] = [str(statistic) for statistic in
+                                         tracemalloc.take_snapshot().statistics('lineno')[:10]]
+
+        return {
+            'stages': self.stages,
+            'subprocesses': self.subprocesses,
+            'counters': self.counters,
+            'memory': memory,
+            'slowest_fix_commits': [{'commit': commit_sha, 'seconds': seconds} for seconds, commit_sha in
+                                    sorted(self.slowest_fix_commits, reverse=True)],
+        }
+
+    def write(self, report_path):
+        with open(report_path, 'w') as report_file:
+            json.dump(self.report(), report_file, indent=2)
+
 
 def load_regex_config(config_path='../../regex_config.txt'):
     # Apre il file specificato e restituisce il contenuto come stringa, rimuovendo spazi bianchi in eccesso.
@@ -16,105 +191,1669 @@ def load_regex_config(config_path='../../regex_config.txt'):
         return None  # Ritorna None in caso di errore
 
 
-def get_bug_fix_commits_szz_issue():
-    commits = repo.iter_commits()
-    bug_fix_commits = []
-    for commit in commits:
-        commit_message = commit.message.lower()
-        match = is_fix_contained(commit_message, issue_pattern)
-        if match:
-            bug_fix_commits.append(commit)
-    return bug_fix_commits
+def get_required_literal(pattern):
+    # Restituisce, in minuscolo, la sequenza più lunga di caratteri letterali che ogni corrispondenza del pattern deve
+    # contenere, oppure una stringa vuota se non è possibile ricavarla (alternative, modalità verbose). I gruppi e le
+    # classi di caratteri interrompono la sequenza e il loro contenuto viene ignorato.
+    if re.compile(pattern).flags & re.VERBOSE:
+        return ''
+    runs = ['']
+    depth = 0
+    position = 0
+    while position < len(pattern):
+        char = pattern[position]
+        literal = None
+        if char == '\\':
+            escaped = pattern[position + 1:position + 2]
+            # i codici dei caratteri e i riferimenti ai gruppi sono seguiti da cifre che non sono letterali
+            if escaped in ('x', 'u', 'U', 'N') or escaped.isdigit():
+                return ''
+            # \d, \b, \n e simili non sono caratteri letterali
+            if escaped and not escaped.isalnum():
+                literal = escaped
+            position += 2
+        elif char == '[':
+            position += 1
+            if pattern[position:position + 1] == '^':
+                position += 1
+            # una parentesi chiusa subito dopo l'apertura fa parte della classe
+            if pattern[position:position + 1] == ']':
+                position += 1
+            while position < len(pattern) and pattern[position] != ']':
+                position += 2 if pattern[position] == '\\' else 1
+            position += 1
+        elif char in '*?+{':
+            quantifier = re.match(r'\*|\?|\+|\{(\d*)(?:,\d*)?\}', pattern[position:])
+            if quantifier is None:
+                # una parentesi graffa che non introduce un quantificatore è un carattere letterale
+                literal = char
+                position += 1
+            else:
+                # il carattere ripetuto resta obbligatorio solo se il quantificatore richiede almeno una ripetizione
+                if depth == 0 and runs[-1] and (quantifier.group() in ('*', '?') or quantifier.group(1) in ('', '0')):
+                    runs[-1] = runs[-1][:-1]
+                position += len(quantifier.group())
+                if pattern[position:position + 1] in ('?', '+'):
+                    position += 1
+        else:
+            if char == '|' and depth == 0:
+                return ''
+            if char == '(':
+                depth += 1
+            elif char == ')':
+                depth -= 1
+            elif char not in '|.^$':
+                literal = char
+            position += 1
+
+        # solo i caratteri ASCII vengono confrontati con il messaggio convertito in minuscolo
+        if depth == 0 and literal is not None and literal.isascii():
+            runs[-1] += literal.lower()
+        elif runs[-1]:
+            runs.append('')
+    return max(runs, key=len)
+
+
+class BugFixClassifier:
+    # Riconosce i commit bug fix dal messaggio. I pattern (uno per riga in regex_config.txt) vengono compilati una
+    # sola volta in un'unica espressione regolare, con un gruppo con nome per ogni pattern, e confrontati con il
+    # messaggio senza distinguere maiuscole e minuscole: i pattern con un gruppo catturano il numero dell'issue
+    # (per esempio '#(\d+)' o 'JIRA-(\d+)'), gli altri (per esempio 'fixes' o 'closes') indicano solo un bug fix.
+    # Prima della regex si cercano nel messaggio le parti letterali che ogni pattern richiede, così la maggior parte
+    # dei messaggi viene scartata senza eseguire la regex. Le parole chiave (keywords) devono comparire tutte.
+
+    def __init__(self, patterns=(), keywords=()):
+        self.patterns = list(patterns)
+        self.keywords = tuple(keyword.lower() for keyword in keywords)
+        self.issue_groups = {}
+        alternatives = []
+        literals = []
+        group_index = 1
+        compiled_patterns = [re.compile(pattern) for pattern in self.patterns]
+        # i pattern con il numero dell'issue vengono provati per primi, così una parola chiave non nasconde il
+        # riferimento all'issue che la segue
+        for position in sorted(range(len(self.patterns)), key=lambda position: compiled_patterns[position].groups == 0):
+            group_name = f'pattern{position}'
+            alternatives.append(f'(?P<{group_name}>{self.patterns[position]})')
+            if compiled_patterns[position].groups > 0:
+                self.issue_groups[group_name] = group_index + 1
+            group_index += 1 + compiled_patterns[position].groups
+            literals.append(get_required_literal(self.patterns[position]))
+        self.regex = re.compile('|'.join(alternatives), re.IGNORECASE) if alternatives else None
+        # basta un pattern senza parti letterali perché il filtro preliminare non possa scartare nessun messaggio
+        self.literals = literals if all(literals) else None
+
+    @classmethod
+    def from_config(cls, config):
+        # accetta il contenuto di regex_config.txt, con un pattern per riga, oppure una lista di pattern
+        patterns = config.splitlines() if isinstance(config, str) else config
+        return cls([pattern.strip() for pattern in patterns if pattern.strip()])
+
+    @property
+    def pattern(self):
+        return '\n'.join(self.patterns)
+
+    def classify(self, commit_message):
+        # restituisce, con un'unica scansione del messaggio, se il commit è un bug fix e i numeri delle issue citate
+        # nell'ordine in cui compaiono
+        if not isinstance(commit_message, str):
+            return False, []
+        lowered_message = commit_message.lower()
+        if not all(keyword in lowered_message for keyword in self.keywords):
+            return False, []
+        if self.regex is None:
+            return bool(self.keywords), []
+        # il confronto senza maiuscole di re è equivalente alla ricerca nel messaggio in minuscolo solo per l'ASCII
+        if self.literals is not None and commit_message.isascii() and \
+                not any(literal in lowered_message for literal in self.literals):
+            profiler.count('classifier_prefiltered')
+            return False, []
+
+        profiler.count('classifier_regex_runs')
+        is_fix = False
+        issue_numbers = []
+        for match in self.regex.finditer(commit_message):
+            is_fix = True
+            issue_group = self.issue_groups.get(match.lastgroup)
+            if issue_group is None or match.group(issue_group) is None:
+                continue
+            try:
+                issue_number = int(match.group(issue_group))
+            except ValueError:
+                continue
+            if issue_number not in issue_numbers:
+                issue_numbers.append(issue_number)
+        return is_fix, issue_numbers
+
+    def git_patterns(self):
+        # restituisce i pattern tradotti per git log, o None se almeno uno non può essere tradotto
+        git_patterns = [regex_to_git_ere(pattern) for pattern in self.patterns]
+        return None if None in git_patterns else git_patterns
+
+
+# la regola sulle parole chiave dell'analisi senza issue: il messaggio deve contenere sia 'bug' sia 'fix'
+KEYWORD_CLASSIFIER = BugFixClassifier(keywords=('bug', 'fix'))
+
+
+def get_bug_fix_commits_szz_issue(rev=None):
+    # se i pattern possono essere espressi come espressioni regolari di git, la ricerca viene fatta da git log, che
+    # restituisce i commit che corrispondono ad almeno uno dei pattern
+    if args.discovery == 'git':
+        git_patterns = issue_classifier.git_patterns()
+        if git_patterns is not None:
+            yield from iter_git_log_commits('-E', '-i', *[f'--grep={git_pattern}' for git_pattern in git_patterns],
+                                            rev=rev)
+            return
+
+    # i commit vengono restituiti man mano che git rev-list li produce, senza costruire la lista dell'intera storia
+    for commit in repo.iter_commits(rev):
+        is_fix, issue_numbers = issue_classifier.classify(commit.message)
+        if is_fix:
+            yield commit
+
+
+def regex_to_git_ere(pattern):
+    # Traduce un'espressione regolare Python in una POSIX estesa per git log -E -i. Restituisce None quando il
+    # pattern usa costrutti che git non supporta o che avrebbero un significato diverso (ancore, gruppi speciali).
+    # Sia git sia BugFixClassifier ignorano maiuscole e minuscole, quindi le lettere maiuscole sono ammesse.
+    escapes = {'d': '[0-9]', 's': '[[:space:]]', 'w': '[[:alnum:]_]',
+               'D': '[^0-9]', 'S': '[^[:space:]]', 'W': '[^[:alnum:]_]'}
+    class_escapes = {'d': '0-9', 's': '[:space:]', 'w': '[:alnum:]_'}
+    git_pattern = ''
+    position = 0
+    after_quantifier = False
+
+    while position < len(pattern):
+        char = pattern[position]
+        if char == '?' and after_quantifier:
+            # un quantificatore non greedy trova una corrispondenza se e solo se la trova quello greedy
+            after_quantifier = False
+            position += 1
+            continue
+        after_quantifier = char in '*+?}'
+        if char == '\\':
+            if position + 1 == len(pattern):
+                return None
+            escaped = pattern[position + 1]
+            if escaped in escapes:
+                git_pattern += escapes[escaped]
+            elif not escaped.isalnum() and not escaped.isspace():
+                git_pattern += '\\' + escaped
+            else:
+                return None
+            position += 2
+        elif char == '[':
+            end = position + 1
+            git_class = '['
+            if end < len(pattern) and pattern[end] == '^':
+                git_class += '^'
+                end += 1
+            if end < len(pattern) and pattern[end] == ']':
+                git_class += ']'
+                end += 1
+            while end < len(pattern) and pattern[end] != ']':
+                if pattern[end] == '\\':
+                    if end + 1 == len(pattern) or pattern[end + 1] not in class_escapes:
+                        return None
+                    git_class += class_escapes[pattern[end + 1]]
+                    end += 2
+                elif pattern[end] == '[':
+                    return None
+                else:
+                    git_class += pattern[end]
+                    end += 1
+            if end == len(pattern):
+                return None
+            git_pattern += git_class + ']'
+            position = end + 1
+        elif char in '^$' or (char == '(' and pattern[position + 1:position + 2] == '?'):
+            return None
+        else:
+            git_pattern += char
+            position += 1
+
+    return git_pattern
+
+
+def iter_git_log_commits(*grep_options, rev=None):
+    # git log restituisce solo i commit il cui messaggio corrisponde ai filtri, separati da un carattere NUL
+    revisions = [rev] if rev is not None else []
+    process = repo.git.log('-z', '--format=%H%n%B', *grep_options, *revisions, as_process=True)
+    profiler.count_subprocess('log')
+    buffer = b''
+    for chunk in iter(lambda: process.stdout.read(1 << 16), b''):
+        profiler.add_bytes_read('log', len(chunk))
+        buffer += chunk
+        *records, buffer = buffer.split(b'\0')
+        for record in records:
+            yield make_commit(record)
+    if buffer:
+        yield make_commit(buffer)
+    process.wait()
+
+
+def make_commit(log_record):
+    commit_hash, message = log_record.decode('utf-8', 'replace').split('\n', 1)
+    # il resto dei dati del commit viene caricato solo quando serve
+    return git.Commit(repo, bytes.fromhex(commit_hash), message=message)
+
+
+class LineRanges:
+    # Insieme di numeri di riga memorizzato come intervalli chiusi, ordinati e fusi tra loro. La verifica di
+    # appartenenza usa una ricerca binaria sugli inizi degli intervalli, quindi un hunk di molte righe non viene mai
+    # espanso in una lista.
+
+    def __init__(self, line_ranges=()):
+        self.starts = []
+        self.ends = []
+        for start, end in sorted(line_ranges):
+            if start > end:
+                continue
+            if self.ends and start <= self.ends[-1] + 1:
+                self.ends[-1] = max(self.ends[-1], end)
+            else:
+                self.starts.append(start)
+                self.ends.append(end)
+
+    @classmethod
+    def from_lines(cls, line_numbers):
+        return cls((line_number, line_number) for line_number in line_numbers)
+
+    def ranges(self):
+        return list(zip(self.starts, self.ends))
+
+    def blame_options(self):
+        # opzioni -L per limitare git blame agli intervalli
+        return [f'-L{start},{end}' for start, end in zip(self.starts, self.ends)]
+
+    def union(self, other):
+        return LineRanges(self.ranges() + other.ranges())
+
+    def difference(self, other):
+        # restituisce le parti degli intervalli che non sono contenute in other
+        missing_ranges = []
+        for start, end in zip(self.starts, self.ends):
+            position = bisect.bisect_right(other.ends, start - 1)
+            while start <= end and position < len(other.starts) and other.starts[position] <= end:
+                if other.starts[position] > start:
+                    missing_ranges.append((start, other.starts[position] - 1))
+                start = max(start, other.ends[position] + 1)
+                position += 1
+            if start <= end:
+                missing_ranges.append((start, end))
+
+        return LineRanges(missing_ranges)
+
+    def truncate(self, last_line):
+        return LineRanges((start, min(end, last_line)) for start, end in self.ranges() if start <= last_line)
+
+    def __contains__(self, line_number):
+        position = bisect.bisect_right(self.starts, line_number) - 1
+        return position >= 0 and line_number <= self.ends[position]
+
+    def __iter__(self):
+        for start, end in zip(self.starts, self.ends):
+            yield from range(start, end + 1)
+
+    def __len__(self):
+        return sum(end - start + 1 for start, end in zip(self.starts, self.ends))
+
+    def __bool__(self):
+        return bool(self.starts)
+
+    def __eq__(self, other):
+        return isinstance(other, LineRanges) and self.starts == other.starts and self.ends == other.ends
+
+    def __repr__(self):
+        return f'LineRanges({self.ranges()!r})'
+
+
+# commenti di riga e commenti di blocco (inizio, fine) per linguaggio
+C_COMMENTS = (('//',), (('/*', '*/'),))
+HASH_COMMENTS = (('#',), ())
+COMMENT_SYNTAXES = {
+    'python': (('#',), (('"""', '"""'), ("\'\'\'", "\'\'\'"))),
+    'c': C_COMMENTS,
+    'hash': HASH_COMMENTS,
+    'sql': (('--',), (('/*', '*/'),)),
+    'lua': (('--',), (('--[[', ']]'),)),
+    'haskell': (('--',), (('{-', '-}'),)),
+    'markup': ((), (('<!--', '-->'),)),
+    'lisp': ((';',), ()),
+    'latex': (('%',), ()),
+    'vim': (('"',), ()),
+    'ini': ((';', '#'), ()),
+    # per i file con estensione sconosciuta si riconoscono le sintassi dei linguaggi più comuni
+    'generic': (('#', '//'), (('/*', '*/'), ('<!--', '-->'), ('"""', '"""'), ("\'\'\'", "\'\'\'"))),
+}
+COMMENT_SYNTAX_BY_EXTENSION = {
+    **dict.fromkeys(['.py', '.pyw', '.pyi', '.pyx'], 'python'),
+    **dict.fromkeys(['.c', '.h', '.cc', '.cpp', '.cxx', '.hh', '.hpp', '.hxx', '.java', '.js', '.jsx', '.mjs',
+                     '.cjs', '.ts', '.tsx', '.go', '.rs', '.cs', '.kt', '.kts', '.swift', '.scala', '.php', '.m',
+                     '.mm', '.dart', '.groovy', '.gradle', '.css', '.scss', '.less', '.proto', '.cu', '.sol'], 'c'),
+    **dict.fromkeys(['.sh', '.bash', '.zsh', '.rb', '.pl', '.pm', '.r', '.yml', '.yaml', '.toml', '.cmake', '.mk',
+                     '.ps1', '.tcl', '.nim', '.jl', '.ex', '.exs', '.bzl', '.cfg', '.conf', '.dockerfile'], 'hash'),
+    '.sql': 'sql',
+    '.lua': 'lua',
+    '.hs': 'haskell',
+    **dict.fromkeys(['.html', '.htm', '.xml', '.xhtml', '.svg', '.vue', '.md'], 'markup'),
+    **dict.fromkeys(['.lisp', '.clj', '.cljs', '.el', '.scm', '.asm', '.s'], 'lisp'),
+    **dict.fromkeys(['.tex', '.sty', '.erl'], 'latex'),
+    '.vim': 'vim',
+    '.ini': 'ini',
+}
+COMMENT_SYNTAX_BY_FILE_NAME = {'makefile': 'hash', 'dockerfile': 'hash', 'cmakelists.txt': 'hash', 'build': 'hash',
+                               'gemfile': 'hash', 'rakefile': 'hash', 'vagrantfile': 'hash'}
+
+
+class CommentLexer:
+    # Riconosce le righe che contengono solo commenti per un linguaggio. Il contenuto delle righe arriva da un diff
+    # senza contesto, quindi lo stato dei commenti di blocco vale solo all'interno di un hunk: una riga che chiude un
+    # blocco senza aprirlo viene considerata la fine di un commento iniziato prima dell'hunk.
+
+    def __init__(self, line_comments, block_comments):
+        comment_patterns = [re.escape(prefix) + '.*' for prefix in line_comments]
+        # un commento di blocco termina alla prima chiusura, così il codice tra due commenti non viene scavalcato
+        comment_patterns += [f'{re.escape(start)}(?:(?!{re.escape(end)}).)*{re.escape(end)}'
+                             for start, end in block_comments]
+        # una riga è un commento se è formata solo da commenti di blocco chiusi, seguiti al più da un commento di riga
+        self.comment_pattern = re.compile(r'(?:\s*(?:' + '|'.join(comment_patterns) + r'))+\s*$') \
+            if comment_patterns else None
+        self.block_comments = block_comments
+
+    def is_comment(self, text):
+        return self.comment_pattern is not None and self.comment_pattern.match(text) is not None
+
+    def code_lines(self, lines):
+        # restituisce, per ogni riga, True se contiene codice e False se è vuota o contiene solo commenti
+        block_end = None
+        code_flags = []
+        for line in lines:
+            text = line.strip()
+            if block_end is not None:
+                end_position = text.find(block_end)
+                if end_position < 0:
+                    code_flags.append(False)
+                    continue
+                text = text[end_position + len(block_end):].strip()
+                block_end = None
+
+            if not text or self.is_comment(text):
+                code_flags.append(False)
+                continue
+
+            is_code = True
+            for start, end in self.block_comments:
+                # con delimitatori uguali (le docstring) non si può sapere se la riga apre o chiude il blocco, quindi
+                # si scarta solo la riga del delimitatore e le righe seguenti restano codice
+                if start == end:
+                    if text == start:
+                        is_code = False
+                        break
+                    continue
+                if text.startswith(start) and end not in text[len(start):]:
+                    # inizio di un commento di blocco che continua nelle righe successive
+                    block_end = end
+                    is_code = False
+                    break
+                if text.endswith(end) and start not in text:
+                    is_code = False
+                    break
+            code_flags.append(is_code)
+        return code_flags
+
+
+@lru_cache(maxsize=None)
+def get_comment_lexer(syntax_name):
+    return CommentLexer(*COMMENT_SYNTAXES[syntax_name])
+
+
+def get_file_comment_lexer(file_path):
+    file_name = os.path.basename(file_path).lower()
+    syntax_name = COMMENT_SYNTAX_BY_FILE_NAME.get(file_name) or \
+        COMMENT_SYNTAX_BY_EXTENSION.get(os.path.splitext(file_name)[1], 'generic')
+    return get_comment_lexer(syntax_name)
+
+
+def get_code_line_ranges(comment_lexer, start_line, lines):
+    # intervalli delle righe di codice tra le righe consecutive che iniziano da start_line: le righe vuote o di solo
+    # commento non vengono analizzate col blame
+    line_ranges = []
+    for line_number, is_code in enumerate(comment_lexer.code_lines(lines), start_line):
+        if not is_code:
+            profiler.count('diff_lines_skipped')
+            continue
+        if line_ranges and line_ranges[-1][1] == line_number - 1:
+            line_ranges[-1] = (line_ranges[-1][0], line_number)
+        else:
+            line_ranges.append((line_number, line_number))
+    return line_ranges
 
 
-def generate_changes_dict(diff_output):
+def iter_diff_changes(diff_lines):
+    # Analizza il diff una riga alla volta e restituisce, per ogni file, la coppia (percorso, intervalli di righe
+    # modificate). Nel diff 'commit parent' il lato '+' di ogni hunk ('+c,d') è il commit parent, cioè la versione
+    # analizzata col blame: numeri di riga e contenuto vengono quindi presi entrambi dalle righe aggiunte ('+'), per
+    # scartare quelle vuote o di solo commento. Le righe rimosse vengono saltate contandole, così una riga di codice
+    # che inizia per '+++' non viene scambiata per un'intestazione.
     file_path_pattern = re.compile(r'^\+\+\+ b/(.*)$')
     line_number_pattern = re.compile(r'^@@ -(\d+)(,(\d+))? \+(\d+)(,(\d+))? @@')
 
-    result_dict = {}
     current_file_path = None
-    numbers_list = []
-
-    diff_lines = diff_output.split('\n')
+    comment_lexer = None
+    line_ranges = []
+    hunk_lines_left = 0
+    parent_start = 0
+    parent_line_count = 0
+    parent_lines = []
 
     for line in diff_lines:
-        file_path_match = file_path_pattern.match(line)
-        line_number_match = line_number_pattern.match(line)
-
-        if file_path_match:
-            if current_file_path and numbers_list:
-                result_dict[current_file_path] = numbers_list
-                numbers_list = []
+        if hunk_lines_left:
+            # '\ No newline at end of file' non è una riga dell'hunk
+            if line.startswith('\\'):
+                continue
+            hunk_lines_left -= 1
+            if line.startswith('+') and len(parent_lines) < parent_line_count:
+                parent_lines.append(line[1:])
+                if len(parent_lines) == parent_line_count:
+                    line_ranges.extend(get_code_line_ranges(comment_lexer, parent_start, parent_lines))
+            continue
+
+        if line.startswith('+++ '):
+            if line_ranges:
+                yield current_file_path, line_ranges
+            line_ranges = []
+
+            # un file eliminato ('+++ /dev/null') non esiste nel commit parent e quindi non ha righe da analizzare
+            file_path_match = file_path_pattern.match(line)
+            current_file_path = file_path_match.group(1) if file_path_match else None
+            comment_lexer = get_file_comment_lexer(current_file_path) if current_file_path else None
+        elif line.startswith('@@'):
+            line_number_match = line_number_pattern.match(line)
+            if line_number_match is None:
+                continue
+            hunk_removed_lines = 1 if line_number_match.group(3) is None else int(line_number_match.group(3))
+            parent_start = int(line_number_match.group(4))
+            parent_line_count = 1 if line_number_match.group(6) is None else int(line_number_match.group(6))
+            hunk_lines_left = hunk_removed_lines + parent_line_count
+            parent_lines = []
+            # senza un file corrente le righe dell'hunk vengono solo saltate
+            if comment_lexer is None:
+                parent_line_count = 0
+
+    if line_ranges:
+        yield current_file_path, line_ranges
+
+
+def get_git_environment():
+    # GIT_OPTIONAL_LOCKS=0 evita i lock facoltativi (ad esempio l'aggiornamento dell'indice), così più analisi possono
+    # leggere insieme lo stesso mirror senza intralciarsi
+    return {**os.environ, 'GIT_OPTIONAL_LOCKS': '0'}
+
+
+def open_repository(path):
+    # il repository può essere una copia di lavoro, la sua cartella .git o un mirror bare: ogni comando git riceve
+    # --git-dir e legge solo dal database degli oggetti, senza usare né bloccare la copia di lavoro
+    repository = git.Repo(path)
+    repository.git.set_persistent_git_options(git_dir=repository.git_dir)
+    repository.git.update_environment(GIT_OPTIONAL_LOCKS='0')
+    return repository
+
+
+class GitProcessPool:
+    # Processi git di lunga durata riutilizzati per tutta l'analisi, invece di avviarne uno nuovo per ogni chiamata:
+    # git cat-file --batch-check per i metadati degli oggetti, git cat-file --batch per il loro contenuto e
+    # git diff-tree --stdin per i diff tra un commit bug fix e il suo parent.
+
+    def __init__(self, git_dir, diff_pathspecs=()):
+        self.git_dir = git_dir
+        # i pathspec vengono passati a diff-tree all'avvio e valgono per tutti i diff
+        self.diff_pathspecs = list(diff_pathspecs)
+        self.processes = {}
+
+    def _get_process(self, name, *command):
+        process = self.processes.get(name)
+        if process is None or process.poll() is not None:
+            process = subprocess.Popen(['git', f'--git-dir={self.git_dir}', *command], stdin=subprocess.PIPE,
+                                       stdout=subprocess.PIPE, env=get_git_environment())
+            self.processes[name] = process
+            profiler.count_subprocess(name)
+        return process
+
+    def _readline(self, name, process):
+        line = process.stdout.readline()
+        profiler.add_bytes_read(name, len(line))
+        return line
+
+    def _request(self, name, command, request):
+        process = self._get_process(name, *command)
+        process.stdin.write(request.encode('utf-8'))
+        process.stdin.flush()
+        return process
+
+    def object_header(self, object_name):
+        # restituisce (sha, tipo, dimensione) dell'oggetto, oppure None se non esiste
+        process = self._request('batch-check', ['cat-file', '--batch-check'], f'{object_name}\n')
+        header = self._readline('batch-check', process).decode('utf-8', 'replace').split()
+        if len(header) != 3:
+            return None
+        return header[0], header[1], int(header[2])
+
+    def read_object(self, object_name):
+        # restituisce (sha, tipo, contenuto) dell'oggetto, oppure None se non esiste
+        process = self._request('batch', ['cat-file', '--batch'], f'{object_name}\n')
+        header = self._readline('batch', process).decode('utf-8', 'replace').split()
+        if len(header) != 3:
+            return None
+        data = process.stdout.read(int(header[2]))
+        process.stdout.read(1)  # il contenuto è seguito da un a capo
+        profiler.add_bytes_read('batch', len(data) + 1)
+        return header[0], header[1], data
+
+    def commit_info(self, commit_sha):
+        git_object = self.read_object(commit_sha)
+        if git_object is None or git_object[1] != 'commit':
+            return None
+
+        headers, message = git_object[2].decode('utf-8', 'replace').split('\n\n', 1)
+        parents = []
+        author = None
+        committed_date = None
+        for header in headers.split('\n'):
+            key, value = header.split(' ', 1) if ' ' in header else (header, '')
+            if key == 'parent':
+                parents.append(value)
+            elif key == 'author':
+                author = value.rsplit(' <', 1)[0]
+            elif key == 'committer':
+                committed_date = int(value.rsplit(' ', 2)[1])
+
+        return CommitInfo(git_object[0], parents, author, committed_date, message)
+
+    def diff_lines(self, commit_sha, parent_sha):
+        # diff-tree interpreta la riga come '<commit> <parent>' e confronta il secondo con il primo, quindi lo sha
+        # del parent va prima per ottenere lo stesso diff di git diff <commit> <parent>
+        diff_command = ['diff-tree', '--stdin', '-M', '-p', '-U0', '--histogram']
+        if self.diff_pathspecs:
+            diff_command += ['--', *self.diff_pathspecs]
+        process = self._request('diff-tree', diff_command, f'{parent_sha} {commit_sha}\n{DIFF_END_MARKER}\n')
+        finished = False
+        try:
+            for line in process.stdout:
+                profiler.add_bytes_read('diff-tree', len(line))
+                line = line.decode('utf-8', 'replace').rstrip('\n')
+                if line == DIFF_END_MARKER:
+                    finished = True
+                    return
+                # la prima riga ripete lo sha ricevuto in input
+                if line != parent_sha:
+                    yield line
+        finally:
+            # se il diff non è stato letto fino in fondo, si scarta il resto per non confonderlo con il successivo
+            while not finished:
+                line = self._readline('diff-tree', process)
+                finished = not line or line.decode('utf-8', 'replace').rstrip('\n') == DIFF_END_MARKER
+
+    def close(self):
+        for process in self.processes.values():
+            process.stdin.close()
+            process.wait()
+        self.processes = {}
+
+
+def stream_git_diff(commit_sha, parent_sha):
+    # con i processi git persistenti il diff viene chiesto all'istanza di diff-tree già avviata
+    if git_pool is not None:
+        yield from git_pool.diff_lines(commit_sha, parent_sha)
+        return
+
+    # legge l'output di git diff man mano che viene prodotto, senza caricarlo interamente in memoria
+    pathspecs = get_diff_pathspecs()
+    if pathspecs:
+        pathspecs = ['--', *pathspecs]
+    process = repo.git.diff(commit_sha, parent_sha, '-U0', '--histogram', *pathspecs, as_process=True)
+    profiler.count_subprocess('diff')
+    for line in process.stdout:
+        profiler.add_bytes_read('diff', len(line))
+        yield line.decode('utf-8', 'replace').rstrip('\n')
+    process.wait()
 
-            current_file_path = file_path_match.group(1)
-        elif line_number_match:
-            start_line = int(line_number_match.group(1))
-            num_lines = 1 if line_number_match.group(3) is None else int(line_number_match.group(3))
 
-            # Aggiungi le linee modificate solo se non sono commenti
-            if not match_comment(line):
-                numbers_list.extend(range(start_line, start_line + num_lines))
+def generate_changes_dict(diff_output):
+    # il diff può essere una stringa oppure un iterabile di righe (ad esempio letto in streaming da git)
+    diff_lines = diff_output.split('\n') if isinstance(diff_output, str) else diff_output
 
-    if current_file_path and numbers_list:
-        result_dict[current_file_path] = numbers_list
+    result_dict = {}
+    for file_path, line_ranges in iter_diff_changes(diff_lines):
+        result_dict[file_path] = LineRanges(line_ranges)
 
     return result_dict
 
 
-def match_comment(line):
-    comment_pattern = re.compile(r'^\s*(\'\'\'|"""|#|//|<!--|/\*)|(?:.*?--!>|.*?\*/|\'\'\'|""")\s*$')
-
-    return comment_pattern.match(line[1:])  # Ignora il primo carattere perchè le linee iniziano per '-'
-
-
-# Funzione per ottenere i numeri delle issue
-def is_fix_contained(commit_message, issue_pattern):
-    if not isinstance(commit_message, str):
-        return False
-
-    match = issue_pattern.search(commit_message)
-    return bool(match)
+def translate_pathspec_pattern(pattern, glob):
+    # Traduce il pattern di un pathspec in un'espressione regolare. Senza la magic word glob i caratteri jolly valgono
+    # come in fnmatch e '*' attraversa anche le directory; con glob '*' si ferma a '/' e '**' indica un numero
+    # qualsiasi di directory. Come in git, '\\' rende letterale il carattere seguente.
+    regex_parts = []
+    position = 0
+    while position < len(pattern):
+        char = pattern[position]
+        at_segment_start = position == 0 or pattern[position - 1] == '/'
+        if glob and at_segment_start and pattern.startswith('**/', position):
+            regex_parts.append('(?:.*/)?')
+            position += 3
+            continue
+        if glob and at_segment_start and pattern.startswith('**', position) and position + 2 == len(pattern):
+            regex_parts.append('.*')
+            position += 2
+            continue
+        if char == '*':
+            while pattern.startswith('*', position + 1):
+                position += 1
+            regex_parts.append('[^/]*' if glob else '.*')
+        elif char == '?':
+            regex_parts.append('[^/]' if glob else '.')
+        elif char == '[':
+            class_end = pattern.find(']', position + 2)
+            if class_end < 0:
+                regex_parts.append(re.escape(char))
+            else:
+                class_body = pattern[position + 1:class_end]
+                negated = class_body[:1] in ('!', '^')
+                class_body = ''.join('\\' + class_char if class_char in '\\[]^' else class_char
+                                     for class_char in (class_body[1:] if negated else class_body))
+                regex_parts.append(f"[{'^' if negated else ''}{class_body}]")
+                position = class_end
+        elif char == '\\' and position + 1 < len(pattern):
+            position += 1
+            regex_parts.append(re.escape(pattern[position]))
+        else:
+            regex_parts.append(re.escape(char))
+        position += 1
+    return ''.join(regex_parts)
+
+
+@lru_cache(maxsize=None)
+def compile_pathspec(pathspec):
+    # Restituisce (esclusione, espressione regolare) per un pathspec di git relativo alla radice del repository. Sono
+    # riconosciute le magic word glob, literal, icase ed exclude, anche nelle forme brevi ':!' e ':^'. Un pattern
+    # senza caratteri jolly indica il file omonimo e tutti i file dell'omonima directory.
+    magic_words = set()
+    pattern = pathspec
+    if pathspec.startswith(':('):
+        magic_end = pathspec.find(')')
+        magic_words = {word.strip() for word in pathspec[2:magic_end].split(',')}
+        pattern = pathspec[magic_end + 1:]
+    elif pathspec.startswith(':'):
+        position = 1
+        while position < len(pathspec) and pathspec[position] in '!^/':
+            if pathspec[position] != '/':
+                magic_words.add('exclude')
+            position += 1
+        pattern = pathspec[position + 1 if pathspec.startswith(':', position) else position:]
+
+    flags = re.IGNORECASE if 'icase' in magic_words else 0
+    pattern = pattern.rstrip('/')
+    if pattern in ('', '.'):
+        regex = '.*'
+    elif 'literal' in magic_words or not any(char in pattern for char in '*?[\\'):
+        regex = re.escape(pattern) + '(?:/.*)?'
+    else:
+        # come in git, il pattern corrisponde anche al percorso scritto letteralmente, ad esempio 'a[1].py'
+        regex = f"(?:{re.escape(pattern)}|{translate_pathspec_pattern(pattern, 'glob' in magic_words)})"
+    return 'exclude' in magic_words, re.compile(regex, flags | re.DOTALL)
+
+
+def pathspecs_match(pathspecs, file_path):
+    # come git: il file deve corrispondere ad almeno un pathspec di inclusione, se ce ne sono, e a nessuno di esclusione
+    included = None
+    for pathspec in pathspecs:
+        exclude, pathspec_regex = compile_pathspec(pathspec)
+        if exclude:
+            if pathspec_regex.fullmatch(file_path):
+                return False
+        elif not included:
+            included = pathspec_regex.fullmatch(file_path) is not None
+    return included is not False
+
+
+class PruneRules:
+    # Regole per escludere dei file prima del blame. I pathspec di inclusione ed esclusione e le estensioni escluse
+    # vengono passati a git diff, così quei file non compaiono neppure nel diff; le soglie sulla dimensione del file
+    # nel commit parent e sul numero di righe cambiate, generali o per estensione, scartano i file rimasti prima di
+    # eseguire il blame. Vengono contati i file analizzati e quelli scartati.
+
+    def __init__(self, include=(), exclude=(), extensions=None, max_blob_size=None, max_changed_lines=None):
+        self.include = list(include)
+        self.exclude = list(exclude)
+        # estensione -> {'exclude': bool, 'max_blob_size': int, 'max_changed_lines': int}
+        self.extensions = extensions or {}
+        self.max_blob_size = max_blob_size
+        self.max_changed_lines = max_changed_lines
+        self.stats = {}
+
+    @classmethod
+    def load(cls, config_path=None, include=(), exclude=(), max_blob_size=None, max_changed_lines=None):
+        # le opzioni della riga di comando si aggiungono o sostituiscono quelle del file di configurazione
+        config = {}
+        if config_path is not None:
+            with open(config_path, 'r') as config_file:
+                config = json.load(config_file)
+        return cls(config.get('include', []) + list(include or []), config.get('exclude', []) + list(exclude or []),
+                   config.get('extensions'), max_blob_size if max_blob_size is not None else
+                   config.get('max_blob_size'), max_changed_lines if max_changed_lines is not None else
+                   config.get('max_changed_lines'))
+
+    def excluded_extensions(self):
+        return [extension for extension, rule in self.extensions.items() if rule.get('exclude')]
+
+    def pathspecs(self):
+        # un pathspec senza magic word confronta l'intero percorso come fnmatch, quindi '*.lock' vale in ogni
+        # directory
+        return (self.include + [f':(exclude){pattern}' for pattern in self.exclude] +
+                [f':(exclude)*{extension}' for extension in self.excluded_extensions()])
+
+    def matches_path(self, file_path):
+        # stessa selezione dei pathspec passati a git diff, per i backend che non eseguono git diff e per contare i
+        # file esclusi
+        return pathspecs_match(self.pathspecs(), file_path)
+
+    def get_limit(self, file_path, limit_name):
+        # la regola dell'estensione più lunga che corrisponde al file prevale sulla soglia generale
+        for extension in sorted(self.extensions, key=len, reverse=True):
+            if file_path.endswith(extension) and limit_name in self.extensions[extension]:
+                return self.extensions[extension][limit_name]
+        return getattr(self, limit_name)
+
+    def has_size_limits(self):
+        return self.max_blob_size is not None or any('max_blob_size' in rule for rule in self.extensions.values())
+
+    def count(self, name, value=1):
+        self.stats[name] = self.stats.get(name, 0) + value
+
+    def take_stats(self):
+        stats, self.stats = self.stats, {}
+        return stats
+
+    def add_stats(self, stats):
+        for name, value in stats.items():
+            self.count(name, value)
+
+    def describe(self):
+        return {'include': self.include, 'exclude': self.exclude, 'extensions': self.extensions,
+                'max_blob_size': self.max_blob_size, 'max_changed_lines': self.max_changed_lines}
+
+
+def prune_changes(parent_sha, changes_dict):
+    # scarta i file che superano le soglie prima di eseguire il blame; la selezione per percorso è già applicata dal
+    # backend quando legge il diff
+    if prune_rules is None:
+        return changes_dict
+
+    pruned_changes = {}
+    for file_path, line_numbers in changes_dict.items():
+        line_ranges = line_numbers if isinstance(line_numbers, LineRanges) else LineRanges.from_lines(line_numbers)
+        max_changed_lines = prune_rules.get_limit(file_path, 'max_changed_lines')
+        if max_changed_lines is not None and len(line_ranges) > max_changed_lines:
+            prune_rules.count('files_skipped_by_changed_lines')
+            prune_rules.count('lines_skipped', len(line_ranges))
+        else:
+            pruned_changes[file_path] = line_numbers
+
+    # la dimensione dei file viene letta con una sola richiesta per tutti i file rimasti
+    if pruned_changes and prune_rules.has_size_limits():
+        blob_sizes = backend.blob_sizes(parent_sha, list(pruned_changes))
+        for file_path in list(pruned_changes):
+            max_blob_size = prune_rules.get_limit(file_path, 'max_blob_size')
+            if max_blob_size is not None and blob_sizes.get(file_path, 0) > max_blob_size:
+                prune_rules.count('files_skipped_by_size')
+                prune_rules.count('bytes_skipped', blob_sizes[file_path])
+                line_numbers = pruned_changes.pop(file_path)
+                prune_rules.count('lines_skipped', len(line_numbers))
+
+    prune_rules.count('files_blamed', len(pruned_changes))
+    return pruned_changes
+
+
+def get_diff_pathspecs():
+    return prune_rules.pathspecs() if prune_rules is not None else []
+
+
+def count_files_skipped_by_path(commit_sha, parent_sha):
+    # i file esclusi dai pathspec non compaiono nel diff: per riportarli si leggono i soli nomi dei file cambiati
+    # (senza i file assenti nel parent, che non vengono mai analizzati), senza calcolarne le differenze. Serve un
+    # processo git in più per ogni commit, quindi il conteggio viene fatto solo con --profile e senza --git-pool
+    profiler.count_subprocess('diff')
+    changed_paths = repo.git.diff('--name-only', '-z', '--diff-filter=d', commit_sha, parent_sha).split('\0')
+    # il contatore viene creato anche se vale zero, così il riepilogo sa che i file sono stati contati
+    prune_rules.count('files_skipped_by_path',
+                      sum(1 for file_path in changed_paths if file_path and not prune_rules.matches_path(file_path)))
+
+
+def print_prune_stats():
+    if prune_rules is not None:
+        stats = prune_rules.stats
+        # i file esclusi dai pathspec vengono riportati solo se sono stati contati
+        skipped_by_path = f", {stats['files_skipped_by_path']} skipped by path" \
+            if 'files_skipped_by_path' in stats else ''
+        print(f"Pruned files: {stats.get('files_blamed', 0)} blamed, {stats.get('files_skipped_by_size', 0)} "
+              f"skipped by size ({stats.get('bytes_skipped', 0)} bytes), "
+              f"{stats.get('files_skipped_by_changed_lines', 0)} skipped by changed lines{skipped_by_path} "
+              f"({stats.get('lines_skipped', 0)} changed lines not blamed)")
+
+
+def parse_blame_output(blame_result, changed_lines=None):
+    # Analizza l'output di git blame --porcelain una riga alla volta. Le informazioni di un commit sono riportate solo
+    # la prima volta che il commit compare, quindi l'autore e la data del commit vengono memorizzati per sha. Le righe
+    # di contenuto (che iniziano con un tab) chiudono il gruppo della riga e non vengono analizzate; se è indicato
+    # l'insieme delle righe cambiate vengono restituite solo quelle, come tuple (numero di linea, commit, autore,
+    # data del commit)
+    authors = {}
+    committed_dates = {}
+    blame_entries = []
+    parsed_lines = 0
+    commit_hash = None
+
+    for line in blame_result.split('\n'):
+        if commit_hash is None:
+            # si attende l'intestazione '<sha> <riga originale> <riga finale> [<righe del gruppo>]'
+            header_match = BLAME_HEADER_PATTERN.match(line.strip())
+            if header_match is not None:
+                commit_hash, line_number = header_match.group(1), int(header_match.group(2))
+        elif line.startswith('\t'):
+            parsed_lines += 1
+            if changed_lines is None or line_number in changed_lines:
+                blame_entries.append((line_number, commit_hash, authors.get(commit_hash),
+                                      committed_dates.get(commit_hash)))
+            commit_hash = None
+        elif line.startswith('author '):
+            authors[commit_hash] = line[7:]
+        elif line.startswith('committer-time '):
+            committed_dates[commit_hash] = int(line[15:])
+
+    profiler.count('blame_lines_parsed', parsed_lines)
+    return blame_entries
 
 
 def get_candidate_commits(blame_result, file_path, changes_dict):
-    pattern = re.compile(r'([a-f0-9]+)\s+(\d+)\s+(\d+)?(?:\s+(\d+))?\nauthor\s+([^\n]+)')
-
     commit_set = set()
     most_recent_commit = None
-    matches = pattern.findall(blame_result)
 
-    for match in matches:
-        commit_hash, first_number, second_number, third_number, author = match
+    changed_lines = changes_dict.get(file_path, [])
+
+    # il blame può arrivare come output testuale di git oppure già analizzato (ad esempio dalla cache)
+    if isinstance(blame_result, str):
+        blame_result = parse_blame_output(blame_result, changed_lines)
+
+    matched_lines = 0
+    for line_number, commit_hash, author, committed_date in blame_result:
         # se il numero di linea cambiato è presente nell'output del blame allora aggiungilo
-        if int(second_number) in changes_dict.get(file_path, []):
+        if line_number in changed_lines:
+            matched_lines += 1
+            # la data del commit letta dal blame accompagna il candidato fino al filtro sulle issue
+            candidate_commit = CandidateCommit(commit_hash, author, committed_date)
             # in particolare, se la flag -r è specificata, aggiungi solo il commit più recente per il file
             if args.recent:
                 # se nessun commit è stato indicato come più recente, o quello attuale è più recente di quello
                 # precendente, allora aggiorna il commit più recente
-                if most_recent_commit is None or commit_is_more_recent(commit_hash, most_recent_commit[0]):
-                    most_recent_commit = (commit_hash, author)
+                if most_recent_commit is None or commit_is_more_recent(candidate_commit, most_recent_commit):
+                    most_recent_commit = candidate_commit
             else:
-                commit_set.add((commit_hash, author))
+                commit_set.add(candidate_commit)
 
     # se è stata specificata la flag, allora l'unico commit da aggiungere è il più recente
     if args.recent and most_recent_commit is not None:
         commit_set.add(most_recent_commit)
 
+    profiler.count('blame_lines_matched', matched_lines)
+
     return commit_set
 
 
-def commit_is_more_recent(commit_hash1, commit_hash2):
-    commit1 = repo.commit(commit_hash1)
-    commit2 = repo.commit(commit_hash2)
-    return commit1.committed_date > commit2.committed_date
+class CandidateCommit(tuple):
+    # Commit candidato: è la coppia (sha, autore) usata in tutto il programma, e come tale viene confrontato, salvato
+    # e stampato, ma porta con sé anche la data del commit letta dal blame, così il flag -r e il filtro sulle issue
+    # non devono caricare il commit dal repository
+
+    def __new__(cls, commit_hash, author, committed_date=None):
+        candidate_commit = super().__new__(cls, (commit_hash, author))
+        candidate_commit.committed_date = committed_date
+        return candidate_commit
+
+    def __getnewargs__(self):
+        return self[0], self[1], self.committed_date
+
+
+def get_candidate_date(candidate_commit):
+    # il commit può essere uno sha oppure un commit candidato; i risultati letti da file (stato incrementale,
+    # giornale) sono semplici coppie senza data, che viene letta dal repository
+    committed_date = getattr(candidate_commit, 'committed_date', None)
+    if committed_date is None:
+        commit_hash = candidate_commit if isinstance(candidate_commit, str) else candidate_commit[0]
+        committed_date, author = get_commit_date_and_author(commit_hash)
+    return committed_date
+
+
+class CommitMetadata:
+    # Tabella compatta sha -> (data del commit, autore), costruita con un'unica passata di git log. Le date sono
+    # memorizzate in un array di interi a 64 bit e gli autori sono internati in una tabella a parte.
+
+    def __init__(self):
+        self.index = {}
+        self.committed_dates = array('q')
+        self.author_ids = array('I')
+        self.authors = []
+        self.author_index = {}
+
+    @classmethod
+    def build(cls, repository, rev='HEAD'):
+        commit_metadata = cls()
+        process = repository.git.log(rev, '--format=%H%x00%ct%x00%an', as_process=True)
+        profiler.count_subprocess('log')
+        # le righe vengono lette man mano che git le produce, senza accumulare l'intero output
+        for line in process.stdout:
+            profiler.add_bytes_read('log', len(line))
+            commit_hash, committed_date, author = line.decode('utf-8', 'replace').rstrip('\n').split('\0')
+            commit_metadata.add(commit_hash, int(committed_date), author)
+        process.wait()
+        return commit_metadata
+
+    def add(self, commit_hash, committed_date, author):
+        author_id = self.author_index.get(author)
+        if author_id is None:
+            author_id = self.author_index[author] = len(self.authors)
+            self.authors.append(author)
+
+        self.index[commit_hash] = len(self.committed_dates)
+        self.committed_dates.append(committed_date)
+        self.author_ids.append(author_id)
+
+    def committed_date(self, commit_hash):
+        position = self.index.get(commit_hash)
+        return None if position is None else self.committed_dates[position]
+
+    def author(self, commit_hash):
+        position = self.index.get(commit_hash)
+        return None if position is None else self.authors[self.author_ids[position]]
+
+    def __contains__(self, commit_hash):
+        return commit_hash in self.index
+
+    def __len__(self):
+        return len(self.committed_dates)
+
+
+def unquote_diff_path(path):
+    # git racchiude tra virgolette, con le sequenze di escape del C, i percorsi che contengono caratteri speciali
+    if path.startswith('"') and path.endswith('"'):
+        return codecs.escape_decode(path[1:-1].encode('latin-1', 'backslashreplace'))[0].decode('utf-8', 'replace')
+    return path
+
+
+class LineIndexVersionError(ValueError):
+    pass
+
+
+class LineOriginIndex:
+    # Indice dell'origine di ogni riga, costruito con un'unica passata su tutta la storia del first-parent di HEAD,
+    # in ordine topologico. Per ogni file si conserva un "weave": l'elenco di tutte le righe che il file ha mai
+    # contenuto, in un ordine compatibile con ogni sua versione, con il commit che ha introdotto la riga e quello che
+    # l'ha rimossa (posizioni nella catena dei commit). Le righe della versione del file in un commit sono quelle
+    # introdotte prima e non ancora rimosse, quindi l'autore di una riga in un qualunque commit della catena si
+    # ottiene senza git blame.
+    # Le righe introdotte da un merge possono provenire dal ramo secondario, per cui in quel caso (come per i commit
+    # fuori dalla catena e per i file binari) la ricerca non dà risultato e si ricorre a git blame.
+
+    def __init__(self):
+        self.commits = []
+        self.commit_positions = {}
+        self.author_ids = array('I')
+        self.authors = []
+        self.author_index = {}
+        self.committed_dates = array('q')
+        self.merges = bytearray()
+        # per ogni file: righe del weave con il commit di introduzione e di rimozione
+        self.inserted = []
+        self.removed = []
+        self.untrusted_from = []
+        # percorso -> lista di [inizio, fine, file], fine None finché il percorso esiste
+        self.path_bindings = {}
+        self.path_files = {}
+
+    @classmethod
+    def load(cls, index_path):
+        line_index = cls()
+        with open(index_path, 'rb') as index_file:
+            magic = index_file.readline()
+            if magic != LINE_INDEX_MAGIC:
+                if magic.startswith(LINE_INDEX_MAGIC.split()[0]):
+                    raise LineIndexVersionError(f'{index_path} was written by a different version of the line index')
+                raise ValueError(f'{index_path} is not a line index file')
+            header = json.loads(index_file.readline())
+            sha_size = header['sha_size']
+            commit_data = index_file.read(sha_size * header['commits'])
+            line_index.commits = [commit_data[position:position + sha_size].hex() for position in
+                                  range(0, len(commit_data), sha_size)]
+            line_index.author_ids.frombytes(index_file.read(line_index.author_ids.itemsize * header['commits']))
+            line_index.committed_dates.frombytes(index_file.read(line_index.committed_dates.itemsize *
+                                                                 header['commits']))
+            line_index.merges = bytearray(index_file.read(header['commits']))
+            for file_lines in header['file_lines']:
+                for weave in (line_index.inserted, line_index.removed):
+                    weave.append(array('I'))
+                    weave[-1].frombytes(index_file.read(weave[-1].itemsize * file_lines))
+            line_index.untrusted_from = header['untrusted_from']
+            byte_order = header['byte_order']
+
+        if byte_order != sys.byteorder:
+            for weave in [line_index.author_ids, line_index.committed_dates] + line_index.inserted + \
+                    line_index.removed:
+                weave.byteswap()
+        line_index.authors = header['authors']
+        line_index.author_index = {author: author_id for author_id, author in enumerate(line_index.authors)}
+        line_index.commit_positions = {commit_sha: position for position, commit_sha in enumerate(line_index.commits)}
+        for file_path, start, end, file_id in header['path_bindings']:
+            line_index.path_bindings.setdefault(file_path, []).append([start, end, file_id])
+            if end is None:
+                line_index.path_files[file_path] = file_id
+        return line_index
+
+    def save(self, index_path):
+        # intestazione JSON seguita dai dati binari: sha, autori, date, merge e i due array di ogni weave
+        header = {
+            'sha_size': len(self.commits[0]) // 2 if self.commits else 20,
+            'commits': len(self.commits),
+            'byte_order': sys.byteorder,
+            'authors': self.authors,
+            'file_lines': [len(weave) for weave in self.inserted],
+            'untrusted_from': self.untrusted_from,
+            'path_bindings': [[file_path, start, end, file_id] for file_path, bindings in self.path_bindings.items()
+                              for start, end, file_id in bindings],
+        }
+        tmp_path = index_path + '.tmp'
+        with open(tmp_path, 'wb') as index_file:
+            index_file.write(LINE_INDEX_MAGIC)
+            index_file.write(json.dumps(header, separators=(',', ':')).encode('utf-8') + b'\n')
+            index_file.write(b''.join(bytes.fromhex(commit_sha) for commit_sha in self.commits))
+            index_file.write(self.author_ids.tobytes())
+            index_file.write(self.committed_dates.tobytes())
+            index_file.write(bytes(self.merges))
+            for inserted, removed in zip(self.inserted, self.removed):
+                index_file.write(inserted.tobytes())
+                index_file.write(removed.tobytes())
+        os.replace(tmp_path, index_path)
+
+    def update(self, repository):
+        # aggiunge i commit del first-parent di HEAD non ancora indicizzati; se la storia è stata riscritta l'indice
+        # viene ricostruito. Restituisce True se l'indice è cambiato
+        head = repository.head.commit.hexsha
+        if self.commits and self.commits[-1] == head:
+            return False
+
+        rev = 'HEAD'
+        if self.commits:
+            try:
+                new_commits = repository.git.rev_list('--first-parent', '--parents', f'{self.commits[-1]}..HEAD')
+            except git.GitCommandError:
+                # l'ultimo commit indicizzato non esiste più nel repository (storia riscritta e ripulita da git gc,
+                # oppure indice creato su un altro repository)
+                new_commits = ''
+            oldest_commit = new_commits.split('\n')[-1].split() if new_commits else []
+            if len(oldest_commit) > 1 and oldest_commit[1] == self.commits[-1]:
+                rev = f'{self.commits[-1]}..HEAD'
+            else:
+                self.__init__()
+
+        for commit_sha, parents, author, committed_date, patches in self.iter_log_patches(repository, rev):
+            self.add_commit(commit_sha, parents, author, committed_date, patches)
+        return True
+
+    @staticmethod
+    def iter_log_patches(repository, rev):
+        # legge git log -p una sola volta e restituisce, per ogni commit, l'elenco delle modifiche ai file con gli
+        # hunk (riga iniziale, righe rimosse, righe aggiunte); il contenuto delle righe viene saltato
+        hunk_pattern = re.compile(r'^@@ -(\d+)(?:,(\d+))? \+\d+(?:,(\d+))? @@')
+        process = repository.git.log(rev, '--first-parent', '-m', '--reverse', '--topo-order', '--root', '-p',
+                                     '-U0', '-M', '--no-color', '--no-ext-diff', '--no-textconv',
+                                     f'--format={LINE_INDEX_COMMIT_MARKER}%H%x00%P%x00%aN%x00%ct', as_process=True)
+        profiler.count_subprocess('log')
+
+        commit = None
+        patch = None
+        hunk_lines_left = 0
+        for line in process.stdout:
+            profiler.add_bytes_read('log', len(line))
+            if hunk_lines_left:
+                if not line.startswith(b'\\'):
+                    hunk_lines_left -= 1
+                continue
+
+            line = line.decode('utf-8', 'replace').rstrip('\n')
+            if line.startswith(LINE_INDEX_COMMIT_MARKER):
+                if commit is not None:
+                    yield commit
+                commit_sha, parents, author, committed_date = line[len(LINE_INDEX_COMMIT_MARKER):].split('\0')
+                commit = (commit_sha, parents.split(), author, int(committed_date), [])
+            elif line.startswith('diff --git '):
+                patch = {'old_path': None, 'new_path': None, 'new': False, 'binary': False, 'hunks': []}
+                # per i file binari il percorso si ricava solo da questa riga, se non è ambiguo
+                paths = line[len('diff --git '):]
+                path_length = (len(paths) - 5) // 2
+                if paths == f'a/{paths[2:2 + path_length]} b/{paths[2:2 + path_length]}':
+                    patch['old_path'] = patch['new_path'] = paths[2:2 + path_length]
+                commit[4].append(patch)
+            elif patch is None:
+                continue
+            elif line.startswith('rename from '):
+                patch['old_path'] = unquote_diff_path(line[len('rename from '):])
+            elif line.startswith('rename to '):
+                patch['new_path'] = unquote_diff_path(line[len('rename to '):])
+            elif line.startswith('new file mode'):
+                patch['new'] = True
+                patch['old_path'] = None
+            elif line.startswith('deleted file mode'):
+                patch['new_path'] = None
+            elif line.startswith('--- '):
+                patch['old_path'] = None if line == '--- /dev/null' else unquote_diff_path(line[4:])[2:]
+            elif line.startswith('+++ '):
+                patch['new_path'] = None if line == '+++ /dev/null' else unquote_diff_path(line[4:])[2:]
+            elif line.startswith('Binary files '):
+                patch['binary'] = True
+            elif line.startswith('@@'):
+                hunk_match = hunk_pattern.match(line)
+                if hunk_match is not None:
+                    old_start = int(hunk_match.group(1))
+                    old_lines = 1 if hunk_match.group(2) is None else int(hunk_match.group(2))
+                    new_lines = 1 if hunk_match.group(3) is None else int(hunk_match.group(3))
+                    patch['hunks'].append((old_start, old_lines, new_lines))
+                    hunk_lines_left = old_lines + new_lines
+
+        if commit is not None:
+            yield commit
+        process.wait()
+
+    def add_commit(self, commit_sha, parents, author, committed_date, patches):
+        position = len(self.commits)
+        self.commits.append(commit_sha)
+        self.commit_positions[commit_sha] = position
+        author_id = self.author_index.get(author)
+        if author_id is None:
+            author_id = self.author_index[author] = len(self.authors)
+            self.authors.append(author)
+        self.author_ids.append(author_id)
+        self.committed_dates.append(committed_date)
+        self.merges.append(len(parents) > 1)
+
+        # i file vengono individuati con i percorsi precedenti al commit, poi si aggiornano i percorsi, così anche
+        # gli scambi di nome tra due file sono gestiti correttamente
+        changed_files = []
+        for patch in patches:
+            file_id = None if patch['new'] else self.path_files.get(patch['old_path'])
+            changed_files.append(file_id)
+        for patch, file_id in zip(patches, changed_files):
+            if patch['old_path'] is not None and patch['old_path'] != patch['new_path'] and \
+                    self.path_files.get(patch['old_path']) == file_id:
+                self.unbind_path(patch['old_path'], position)
+        for index, patch in enumerate(patches):
+            file_id = changed_files[index]
+            if patch['new_path'] is None:
+                continue
+            if file_id is None:
+                # file nuovo, oppure file di cui l'indice non conosce la storia
+                file_id = changed_files[index] = self.add_file(position if not patch['new'] else None)
+            if self.path_files.get(patch['new_path']) != file_id:
+                self.unbind_path(patch['new_path'], position)
+                self.path_bindings.setdefault(patch['new_path'], []).append([position, None, file_id])
+                self.path_files[patch['new_path']] = file_id
+
+        for patch, file_id in zip(patches, changed_files):
+            if file_id is None:
+                continue
+            if patch['binary'] and self.untrusted_from[file_id] is None:
+                self.untrusted_from[file_id] = position
+            # da quando un file non è più affidabile le sue righe non vengono più aggiornate
+            if self.untrusted_from[file_id] is None and not self.apply_hunks(file_id, patch['hunks'], position):
+                self.untrusted_from[file_id] = position
+
+    def add_file(self, untrusted_from=None):
+        self.inserted.append(array('I'))
+        self.removed.append(array('I'))
+        self.untrusted_from.append(untrusted_from)
+        return len(self.inserted) - 1
+
+    def unbind_path(self, file_path, position):
+        file_id = self.path_files.pop(file_path, None)
+        if file_id is not None:
+            self.path_bindings[file_path][-1][1] = position
+
+    def apply_hunks(self, file_id, hunks, position):
+        inserted, removed = self.inserted[file_id], self.removed[file_id]
+        # posizioni nel weave delle righe presenti prima del commit
+        live_lines = [line for line, removed_at in enumerate(removed) if removed_at == LINE_ALIVE]
+
+        # gli hunk vengono applicati dal basso, così le posizioni di quelli precedenti non cambiano
+        for old_start, old_lines, new_lines in reversed(hunks):
+            preceding_lines = old_start - 1 + old_lines if old_lines else old_start
+            # un hunk oltre la fine del file indica che l'indice non corrisponde più al contenuto del file
+            if preceding_lines > len(live_lines):
+                return False
+            for line in live_lines[old_start - 1:old_start - 1 + old_lines]:
+                removed[line] = position
+            # le nuove righe seguono quelle rimosse, oppure la riga dopo cui sono inserite
+            weave_position = live_lines[preceding_lines - 1] + 1 if preceding_lines else 0
+            inserted[weave_position:weave_position] = array('I', [position]) * new_lines
+            removed[weave_position:weave_position] = array('I', [LINE_ALIVE]) * new_lines
+        return True
+
+    def find_file(self, file_path, position):
+        for start, end, file_id in self.path_bindings.get(file_path, ()):
+            if start <= position and (end is None or position < end):
+                return file_id
+        return None
+
+    def lookup(self, revision, file_path, line_ranges):
+        # restituisce le tuple (numero di linea, commit, autore, data) delle righe richieste nella revisione e gli
+        # intervalli delle righe introdotte da un merge, che vanno chieste a git blame; None se l'indice non conosce
+        # la revisione o il file
+        position = self.commit_positions.get(revision)
+        if position is None or not line_ranges:
+            return None
+        file_id = self.find_file(file_path, position)
+        if file_id is None or (self.untrusted_from[file_id] is not None and position >= self.untrusted_from[file_id]):
+            return None
+
+        blame_entries = []
+        merge_lines = []
+        last_line = line_ranges.ends[-1]
+        line_number = 0
+        for inserted_at, removed_at in zip(self.inserted[file_id], self.removed[file_id]):
+            if inserted_at <= position < removed_at:
+                line_number += 1
+                if line_number in line_ranges:
+                    if self.merges[inserted_at]:
+                        merge_lines.append(line_number)
+                    else:
+                        blame_entries.append((line_number, self.commits[inserted_at],
+                                              self.authors[self.author_ids[inserted_at]],
+                                              self.committed_dates[inserted_at]))
+                if line_number >= last_line:
+                    break
+        return blame_entries, LineRanges.from_lines(merge_lines)
+
+
+def load_line_index(index_path):
+    # carica l'indice salvato, lo aggiorna con i nuovi commit e lo salva se è cambiato
+    line_index = LineOriginIndex()
+    if os.path.exists(index_path):
+        try:
+            line_index = LineOriginIndex.load(index_path)
+        except LineIndexVersionError as e:
+            # un indice in un formato precedente viene ricostruito
+            print(f'{e}, it is rebuilt')
+    with profiler.stage('line_index_update'):
+        if line_index.update(repo):
+            line_index.save(index_path)
+    return line_index
+
+
+def get_commit_date_and_author(commit_hash):
+    # i primi commit vengono caricati uno alla volta; se le ricerche continuano (molti risultati letti da file senza
+    # data) conviene costruire una volta sola la tabella dei metadati con un'unica passata di git log
+    global commit_metadata, commit_lookups
+    if commit_metadata is None and commit_lookups >= COMMIT_METADATA_LOOKUP_THRESHOLD:
+        with profiler.stage('commit_lookup'):
+            commit_metadata = CommitMetadata.build(repo)
+    if commit_metadata is not None and commit_hash in commit_metadata:
+        return commit_metadata.committed_date(commit_hash), commit_metadata.author(commit_hash)
+
+    # carica il commit dal repository, tramite i processi git di lunga durata se disponibili
+    commit_lookups += 1
+    profiler.count('commit_lookups')
+    with profiler.stage('commit_lookup'):
+        if git_pool is not None:
+            commit_info = git_pool.commit_info(commit_hash)
+            if commit_info is not None:
+                return commit_info.committed_date, commit_info.author
+
+        commit = repo.commit(commit_hash)
+        return commit.committed_date, commit.author.name
+
+
+def commit_is_more_recent(commit1, commit2):
+    # i commit candidati portano la data letta dal blame, quindi il repository viene letto solo per gli sha
+    return get_candidate_date(commit1) > get_candidate_date(commit2)
+
+
+class BlameCache:
+    # Cache persistente su SQLite dei blame già analizzati. Il blame di una revisione fissata non cambia mai, quindi
+    # la coppia (sha del commit, percorso del file) identifica univocamente il risultato.
+
+    def __init__(self, db_path, max_entries=DEFAULT_BLAME_CACHE_SIZE):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        # il timeout permette a più analisi di condividere lo stesso file
+        self.connection = sqlite3.connect(db_path, timeout=60)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+
+        version = self.connection.execute('PRAGMA user_version').fetchone()[0]
+        if version != BLAME_CACHE_SCHEMA_VERSION:
+            # formato obsoleto: la cache può sempre essere ricostruita, quindi la si svuota
+            self.connection.execute('DROP TABLE IF EXISTS blame')
+            self.connection.execute(f'PRAGMA user_version = {BLAME_CACHE_SCHEMA_VERSION}')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS blame (revision TEXT NOT NULL, path TEXT NOT NULL, '
+                                'ranges TEXT NOT NULL, entries TEXT NOT NULL, last_access REAL NOT NULL, '
+                                'PRIMARY KEY (revision, path))')
+        self.connection.execute('CREATE INDEX IF NOT EXISTS blame_last_access ON blame (last_access)')
+        self.connection.commit()
+
+    def get(self, revision, path, line_ranges):
+        # restituisce le righe del blame già salvate e gli intervalli richiesti che non sono ancora coperti
+        row = self.connection.execute('SELECT ranges, entries FROM blame WHERE revision = ? AND path = ?',
+                                      (revision, path)).fetchone()
+        if row is None:
+            self.misses += 1
+            return LineRanges(), [], line_ranges
+
+        cached_ranges = LineRanges(tuple(line_range) for line_range in json.loads(row[0]))
+        blame_entries = [tuple(entry) for entry in json.loads(row[1])]
+        missing_ranges = line_ranges.difference(cached_ranges)
+        if missing_ranges:
+            self.misses += 1
+        else:
+            self.hits += 1
+            # aggiorna l'ultimo accesso, usato per l'eviction LRU
+            self.connection.execute('UPDATE blame SET last_access = ? WHERE revision = ? AND path = ?',
+                                    (time.time(), revision, path))
+            self.connection.commit()
+
+        return cached_ranges, blame_entries, missing_ranges
+
+    def put(self, revision, path, line_ranges, blame_entries):
+        self.connection.execute('INSERT OR REPLACE INTO blame (revision, path, ranges, entries, last_access) '
+                                'VALUES (?, ?, ?, ?, ?)',
+                                (revision, path, json.dumps(line_ranges.ranges(), separators=(',', ':')),
+                                 json.dumps(blame_entries, separators=(',', ':')), time.time()))
+        self._evict()
+        self.connection.commit()
+
+    def _evict(self):
+        # rimuove le voci usate meno di recente quando si supera la dimensione massima
+        count = self.connection.execute('SELECT COUNT(*) FROM blame').fetchone()[0]
+        if count > self.max_entries:
+            self.connection.execute('DELETE FROM blame WHERE rowid IN (SELECT rowid FROM blame '
+                                    'ORDER BY last_access ASC LIMIT ?)', (count - self.max_entries,))
+
+    def close(self):
+        self.connection.close()
+
+
+def default_blame_cache_path(repository):
+    # il file della cache viene creato accanto al repository, non al suo interno
+    repository_path = os.path.normpath(repository.working_tree_dir or repository.git_dir)
+    return repository_path + '.szz_blame_cache.sqlite'
+
+
+def blame_line_ranges(revision, file_path, line_ranges):
+    # esegue il blame solo sugli intervalli di righe modificate invece che sull'intero file
+    profiler.count_subprocess('blame')
+    try:
+        blame_result = repo.git.blame(revision, *line_ranges.blame_options(), "--porcelain", "--", file_path)
+        profiler.add_bytes_read('blame', len(blame_result))
+        return blame_result
+    except git.GitCommandError as e:
+        # git rifiuta gli intervalli che iniziano oltre la fine del file: li si scarta e si riprova
+        file_length = re.search(r'has only (\d+) lines?', str(e.stderr))
+        if file_length is None:
+            raise
+        line_ranges = line_ranges.truncate(int(file_length.group(1)))
+        if not line_ranges:
+            return ''
+        return blame_line_ranges(revision, file_path, line_ranges)
+
+
+def get_cached_blame(revision, file_path, line_ranges):
+    cached_ranges, blame_entries, missing_ranges = blame_cache.get(revision, file_path, line_ranges)
+    if missing_ranges:
+        # si calcola il blame solo delle righe mancanti e lo si aggiunge a quello già salvato
+        missing_result = backend.blame(revision, file_path, missing_ranges)
+        if isinstance(missing_result, str):
+            missing_result = parse_blame_output(missing_result)
+        blame_entries = blame_entries + missing_result
+        blame_cache.put(revision, file_path, cached_ranges.union(missing_ranges), blame_entries)
+
+    return blame_entries
+
+
+class GitCliBackend:
+    # Accesso al repository tramite la riga di comando di git (GitPython), con l'analisi del testo prodotto
+
+    name = 'cli'
+
+    def get_changes(self, commit_sha, parent_sha):
+        # il diff viene letto in streaming e analizzato man mano
+        changes_dict = generate_changes_dict(stream_git_diff(commit_sha, parent_sha))
+        if get_diff_pathspecs() and profiler.enabled and git_pool is None:
+            count_files_skipped_by_path(commit_sha, parent_sha)
+        return changes_dict
+
+    def blame(self, revision, file_path, line_ranges):
+        return blame_line_ranges(revision, file_path, line_ranges)
+
+    def blob_sizes(self, revision, file_paths):
+        # dimensione in byte di ogni file nella revisione, letta da cat-file --batch-check se disponibile,
+        # altrimenti con un unico git ls-tree
+        blob_sizes = {}
+        if git_pool is not None:
+            for file_path in file_paths:
+                header = git_pool.object_header(f'{revision}:{file_path}')
+                if header is not None:
+                    blob_sizes[file_path] = header[2]
+            return blob_sizes
+
+        profiler.count_subprocess('ls-tree')
+        for record in repo.git.ls_tree('-l', '-z', '--full-tree', revision, '--', *file_paths).split('\0'):
+            if record:
+                object_info, file_path = record.split('\t', 1)
+                object_size = object_info.split()[3]
+                if object_size != '-':
+                    blob_sizes[file_path] = int(object_size)
+        return blob_sizes
+
+    def close(self):
+        pass
+
+
+class Pygit2Backend:
+    # Accesso al repository tramite libgit2: diff e blame vengono calcolati nel processo e restituiti come oggetti,
+    # senza avviare processi git né analizzarne l'output. libgit2 non implementa l'algoritmo histogram, quindi si usa
+    # patience, che in rari casi può dividere gli hunk in modo diverso da git diff --histogram
+
+    name = 'pygit2'
+
+    def __init__(self, git_dir):
+        self.repository = pygit2.Repository(git_dir)
+        # gli hunk del blame riportano solo lo sha del commit, l'autore e la data vengono letti una volta per commit
+        self.commit_info = {}
+
+    def get_changes(self, commit_sha, parent_sha):
+        # stesso verso di 'git diff commit parent': il lato nuovo di ogni hunk è il parent, di cui si usano percorsi,
+        # numeri di riga e contenuto
+        diff = self.repository.diff(commit_sha, parent_sha, context_lines=0, flags=pygit2.GIT_DIFF_PATIENCE)
+        diff.find_similar()
+
+        changes_dict = {}
+        for patch in diff:
+            if patch.delta.status == pygit2.GIT_DELTA_DELETED:
+                continue
+            file_path = patch.delta.new_file.path
+            # libgit2 non riceve i pathspec, quindi la selezione dei file viene applicata qui
+            if prune_rules is not None and not prune_rules.matches_path(file_path):
+                prune_rules.count('files_skipped_by_path')
+                continue
+            comment_lexer = get_file_comment_lexer(file_path)
+            line_ranges = []
+            for hunk in patch.hunks:
+                # come in iter_diff_changes, si analizzano le righe del parent (le righe '+') che non sono commenti
+                parent_lines = [diff_line.content.rstrip('\n') for diff_line in hunk.lines if diff_line.origin == '+']
+                line_ranges.extend(get_code_line_ranges(comment_lexer, hunk.new_start, parent_lines))
+            if line_ranges:
+                changes_dict[file_path] = LineRanges(line_ranges)
+
+        return changes_dict
+
+    def blame(self, revision, file_path, line_ranges):
+        commit = self.repository.revparse_single(revision)
+        # come con git blame, le righe oltre la fine del file vengono scartate
+        file_data = commit.tree[file_path].data
+        file_length = file_data.count(b'\n') + (1 if file_data and not file_data.endswith(b'\n') else 0)
+        line_ranges = line_ranges.truncate(file_length)
+
+        blame_entries = []
+        for start, end in line_ranges.ranges():
+            for hunk in self.repository.blame(file_path, newest_commit=commit.id, min_line=start, max_line=end):
+                commit_sha = str(hunk.final_commit_id)
+                author, committed_date = self.get_commit_info(commit_sha)
+                first_line = max(hunk.final_start_line_number, start)
+                last_line = min(hunk.final_start_line_number + hunk.lines_in_hunk - 1, end)
+                blame_entries.extend((line_number, commit_sha, author, committed_date) for line_number in
+                                     range(first_line, last_line + 1))
+
+        return blame_entries
+
+    def blob_sizes(self, revision, file_paths):
+        tree = self.repository.revparse_single(revision).tree
+        return {file_path: tree[file_path].size for file_path in file_paths if file_path in tree}
+
+    def get_commit_info(self, commit_sha):
+        commit_info = self.commit_info.get(commit_sha)
+        if commit_info is None:
+            commit = self.repository[commit_sha]
+            commit_info = self.commit_info[commit_sha] = (commit.author.name, commit.commit_time)
+        return commit_info
+
+    def close(self):
+        self.repository.free()
+
+
+def create_backend(backend_name, repository):
+    if backend_name == 'pygit2':
+        return Pygit2Backend(repository.git_dir)
+    return GitCliBackend()
+
+
+def get_blame_entries(revision, file_path, line_ranges):
+    if blame_cache is not None:
+        return get_cached_blame(revision, file_path, line_ranges)
+    blame_result = backend.blame(revision, file_path, line_ranges)
+    return parse_blame_output(blame_result) if isinstance(blame_result, str) else blame_result
+
+
+def print_blame_cache_stats():
+    if blame_cache is not None:
+        print(f'Blame cache: {blame_cache.hits} hits, {blame_cache.misses} misses ({blame_cache.db_path})')
+
+
+async def blame_line_ranges_async(revision, file_path, line_ranges, semaphore):
+    # come blame_line_ranges, ma il processo git viene avviato con asyncio; il semaforo limita i blame contemporanei
+    async with semaphore:
+        profiler.count_subprocess('blame')
+        process = await asyncio.create_subprocess_exec('git', f'--git-dir={repo.git_dir}', 'blame', revision,
+                                                       *line_ranges.blame_options(), '--porcelain', '--',
+                                                       file_path, stdout=asyncio.subprocess.PIPE,
+                                                       stderr=asyncio.subprocess.PIPE, env=get_git_environment())
+        stdout, stderr = await process.communicate()
+    profiler.add_bytes_read('blame', len(stdout))
+    if process.returncode == 0:
+        return stdout.decode('utf-8', 'replace')
+
+    stderr = stderr.decode('utf-8', 'replace')
+    file_length = re.search(r'has only (\d+) lines?', stderr)
+    if file_length is None:
+        raise git.GitCommandError(['git', 'blame', revision, '--', file_path], process.returncode, stderr)
+    line_ranges = line_ranges.truncate(int(file_length.group(1)))
+    if not line_ranges:
+        return ''
+    return await blame_line_ranges_async(revision, file_path, line_ranges, semaphore)
+
+
+async def blame_file_async(revision, file_path, line_ranges, semaphore):
+    # con la cache vengono avviati solo i blame delle righe che non sono già salvate
+    if blame_cache is None:
+        return file_path, await blame_line_ranges_async(revision, file_path, line_ranges, semaphore)
+
+    cached_ranges, blame_entries, missing_ranges = blame_cache.get(revision, file_path, line_ranges)
+    if missing_ranges:
+        missing_result = await blame_line_ranges_async(revision, file_path, missing_ranges, semaphore)
+        blame_entries = blame_entries + parse_blame_output(missing_result)
+        blame_cache.put(revision, file_path, cached_ranges.union(missing_ranges), blame_entries)
+    return file_path, blame_entries
+
+
+async def get_all_candidate_commits_async(parent_commit, blame_targets, changes_dict):
+    semaphore = asyncio.Semaphore(get_blame_concurrency())
+    all_candidate_commits = set()
+
+    # ogni output viene analizzato appena il relativo blame termina, mentre gli altri sono ancora in corso
+    for blame_task in asyncio.as_completed([blame_file_async(parent_commit.hexsha, file_path, line_ranges, semaphore)
+                                            for file_path, line_ranges in blame_targets]):
+        file_path, blame_result = await blame_task
+        with profiler.stage('filter'):
+            candidate_commits = get_candidate_commits(blame_result, file_path, changes_dict)
+        all_candidate_commits = all_candidate_commits.union(candidate_commits)
+
+    return all_candidate_commits
+
+
+def get_blame_concurrency():
+    return args.blame_concurrency if args.blame_concurrency > 1 else 1
 
 
 def get_all_candidate_commits(parent_commit, changes_dict):
     all_candidate_commits = set()
 
-    for file_path, line_numbers in changes_dict.items():
-        blame_result = repo.git.blame(parent_commit.hexsha, file_path, "--line-porcelain")
-        candidate_commits = get_candidate_commits(blame_result, file_path, changes_dict)
+    # il dizionario può contenere anche semplici liste di numeri di riga
+    blame_targets = [(file_path, line_numbers if isinstance(line_numbers, LineRanges) else
+                      LineRanges.from_lines(line_numbers)) for file_path, line_numbers in changes_dict.items()]
+
+    # le righe che l'indice delle origini sa attribuire non richiedono git blame
+    if line_index is not None:
+        remaining_targets = []
+        for file_path, line_ranges in blame_targets:
+            with profiler.stage('line_index'):
+                line_index_result = line_index.lookup(parent_commit.hexsha, file_path, line_ranges)
+            if line_index_result is None:
+                profiler.count('line_index_misses')
+                remaining_targets.append((file_path, line_ranges))
+                continue
+            profiler.count('line_index_hits')
+            blame_entries, merge_ranges = line_index_result
+            if merge_ranges:
+                # solo le righe introdotte da un merge vengono attribuite con git blame
+                with profiler.stage('blame'):
+                    blame_entries = sorted(blame_entries + get_blame_entries(parent_commit.hexsha, file_path,
+                                                                             merge_ranges))
+            with profiler.stage('filter'):
+                candidate_commits = get_candidate_commits(blame_entries, file_path, changes_dict)
+            all_candidate_commits = all_candidate_commits.union(candidate_commits)
+        blame_targets = remaining_targets
+
+    # i file di un commit che ne modifica più di uno vengono analizzati con blame contemporanei; il backend pygit2
+    # calcola il blame nel processo e non avvia processi git
+    if isinstance(backend, GitCliBackend) and get_blame_concurrency() > 1 and len(blame_targets) > 1:
+        with profiler.stage('blame'):
+            return all_candidate_commits.union(asyncio.run(get_all_candidate_commits_async(parent_commit, blame_targets,
+                                                                                            changes_dict)))
+
+    for file_path, line_ranges in blame_targets:
+        with profiler.stage('blame'):
+            if blame_cache is None:
+                blame_result = backend.blame(parent_commit.hexsha, file_path, line_ranges)
+            else:
+                blame_result = get_cached_blame(parent_commit.hexsha, file_path, line_ranges)
+        with profiler.stage('filter'):
+            candidate_commits = get_candidate_commits(blame_result, file_path, changes_dict)
         all_candidate_commits = all_candidate_commits.union(candidate_commits)
 
     return all_candidate_commits
@@ -128,15 +1867,176 @@ def print_candidate_commit(total_candidate_commits):
             print(com)
 
 
-def get_bug_fix_commits_for_szz():
-    commits = repo.iter_commits()
-    bug_fix_commits = []
-    for commit in commits:
-        commit_message = commit.message.lower()
-        if 'bug' in commit_message and ('fix' in commit_message or 'fixed' in commit_message):
-            bug_fix_commits.append(commit)
+class OutputSink(abc.ABC):
+    # Scrive i commit candidati di ogni commit bug fix appena la sua analisi termina. Dopo ogni commit il file viene
+    # svuotato, così chi legge l'output può elaborare i risultati mentre l'analisi è ancora in corso
+
+    def __init__(self, output_file):
+        self.output_file = output_file
+
+    def write(self, bug_fix_sha, candidate_commits):
+        self.write_record(str(bug_fix_sha), sorted(candidate_commits))
+        self.output_file.flush()
+
+    @abc.abstractmethod
+    def write_record(self, bug_fix_sha, candidate_commits):
+        pass
+
+    def close(self):
+        self.output_file.close()
+
+
+class JsonLinesSink(OutputSink):
+    # una riga JSON per ogni commit bug fix, anche se non ha commit candidati
+
+    def write_record(self, bug_fix_sha, candidate_commits):
+        record = {'bug_fix_commit': bug_fix_sha,
+                  'candidate_commits': [{'commit': commit_sha, 'author': author} for commit_sha, author in
+                                        candidate_commits]}
+        self.output_file.write(json.dumps(record) + '\n')
+
 
-    return bug_fix_commits
+class CsvSink(OutputSink):
+    # una riga per ogni commit candidato; un commit bug fix senza candidati ha una riga con i campi vuoti
+
+    def __init__(self, output_file):
+        super().__init__(output_file)
+        self.writer = csv.writer(output_file)
+        self.writer.writerow(['bug_fix_commit', 'candidate_commit', 'author'])
+
+    def write_record(self, bug_fix_sha, candidate_commits):
+        if not candidate_commits:
+            self.writer.writerow([bug_fix_sha, '', ''])
+        for commit_sha, author in candidate_commits:
+            self.writer.writerow([bug_fix_sha, commit_sha, author])
+
+
+OUTPUT_SINKS = {'jsonl': JsonLinesSink, 'csv': CsvSink}
+
+
+def open_output_sink(output_path, output_format=None):
+    # se il formato non è indicato viene dedotto dall'estensione del file
+    if output_format is None:
+        output_format = 'csv' if output_path.lower().endswith('.csv') else 'jsonl'
+    return OUTPUT_SINKS[output_format](open(output_path, 'w', newline='', encoding='utf-8'))
+
+
+class ProgressJournal:
+    # Registro delle analisi completate: la prima riga contiene le opzioni dell'esecuzione, le successive un commit
+    # bug fix con i suoi commit candidati. Ogni riga viene sincronizzata sul disco prima di passare al commit
+    # successivo, così dopo un'interruzione l'analisi può riprendere dall'ultimo commit registrato
+
+    def __init__(self, journal_file):
+        self.journal_file = journal_file
+
+    @classmethod
+    def open(cls, journal_path, options, resume=False):
+        # restituisce il registro aperto in scrittura e i risultati già registrati, se si riprende un'esecuzione
+        # con le stesse opzioni
+        completed, valid_end = cls.read(journal_path, options) if resume else ({}, None)
+        if valid_end is None:
+            journal = cls(open(journal_path, 'wb'))
+            journal.append({'options': options})
+        else:
+            journal_file = open(journal_path, 'r+b')
+            # una riga scritta solo in parte al momento dell'interruzione viene eliminata
+            journal_file.truncate(valid_end)
+            journal_file.seek(valid_end)
+            journal = cls(journal_file)
+        return journal, completed
+
+    @staticmethod
+    def read(journal_path, options):
+        completed = {}
+        try:
+            journal_file = open(journal_path, 'rb')
+        except FileNotFoundError:
+            return completed, None
+
+        with journal_file:
+            header = journal_file.readline()
+            try:
+                if json.loads(header).get('options') != options:
+                    print(f'The journal {journal_path} was created with different options, the analysis starts '
+                          f'again')
+                    return completed, None
+            except ValueError:
+                return completed, None
+
+            valid_end = journal_file.tell()
+            for line in journal_file:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                if not line.endswith(b'\n'):
+                    break
+                completed[record['bug_fix_commit']] = [tuple(candidate) for candidate in
+                                                       record['candidate_commits']]
+                valid_end += len(line)
+        return completed, valid_end
+
+    def write(self, bug_fix_sha, candidate_commits):
+        self.append({'bug_fix_commit': str(bug_fix_sha), 'candidate_commits': sorted(candidate_commits)})
+
+    def append(self, record):
+        self.journal_file.write(json.dumps(record).encode('utf-8') + b'\n')
+        self.journal_file.flush()
+        os.fsync(self.journal_file.fileno())
+
+    def close(self):
+        self.journal_file.close()
+
+
+def get_journal_path():
+    return args.journal
+
+
+def start_journal(mode, results):
+    # con --resume i risultati registrati dall'esecuzione interrotta vengono riportati come se fossero appena stati
+    # calcolati; restituisce gli sha dei commit bug fix da non analizzare di nuovo
+    global progress_journal
+    journal_path = get_journal_path()
+    if journal_path is None:
+        return set()
+
+    progress_journal, completed = ProgressJournal.open(journal_path, get_incremental_options(mode), args.resume)
+    if completed:
+        print(f'Resuming from {journal_path}: {len(completed)} bug-fix commits were already analyzed')
+    for bug_fix_sha, candidate_commits in completed.items():
+        store_result(results, bug_fix_sha, candidate_commits, journal=False)
+    return set(completed)
+
+
+def finish_journal():
+    global progress_journal
+    if progress_journal is not None:
+        progress_journal.close()
+        progress_journal = None
+
+
+def store_result(results, bug_fix_commit, candidate_commits, journal=True):
+    # il commit viene registrato nel giornale prima di essere scritto nei risultati
+    if journal and progress_journal is not None:
+        progress_journal.write(bug_fix_commit, candidate_commits)
+    # con un file di output i risultati vengono scritti subito e conservati in memoria solo se servono per lo
+    # stato incrementale
+    if output_sink is None or get_incremental_state_path() is not None:
+        results[bug_fix_commit] = candidate_commits
+    if output_sink is not None:
+        output_sink.write(bug_fix_commit, candidate_commits)
+
+
+def get_bug_fix_commits_for_szz(rev=None):
+    # la regola sulle parole chiave equivale a cercare entrambe le parole ignorando maiuscole e minuscole
+    if args.discovery == 'git':
+        yield from iter_git_log_commits('-i', '--all-match', '--grep=bug', '--grep=fix', rev=rev)
+        return
+
+    for commit in repo.iter_commits(rev):
+        is_fix, issue_numbers = KEYWORD_CLASSIFIER.classify(commit.message)
+        if is_fix:
+            yield commit
 
 
 def search_candidate_commit_szz(bug_fix_commit):
@@ -144,130 +2044,745 @@ def search_candidate_commit_szz(bug_fix_commit):
     # verifichiamo se il commit ha effettivamente un parent da confrontare, altrimenti non possiamo fare il
     # confronto
     if bug_fix_commit.parents is not None:
-        parent_commit = bug_fix_commit.parents[0]
-        diff = repo.git.diff(bug_fix_commit.hexsha, parent_commit.hexsha, '-U0', '--histogram')
+        with profiler.fix_commit(bug_fix_commit.hexsha):
+            parent_commit = bug_fix_commit.parents[0]
+
+            # generiamo il dizionario che contiene come chiave i file cambiati e come valore i numeri di riga
+            # modificati, ed in particolare le linee che dal commit parent sono state eliminate e sostituite col fix
+            # del bug. Il diff viene letto in streaming, quindi la fase comprende sia git diff sia l'analisi
+            with profiler.stage('diff'):
+                changes_dict = backend.get_changes(bug_fix_commit.hexsha, parent_commit.hexsha)
+            # i file esclusi dalle regole non vengono passati al blame
+            changes_dict = prune_changes(parent_commit.hexsha, changes_dict)
+            # una volta fatto ciò la funzione all_candidate_commits trova i commit che hanno modificato quelle linee
+            # l'ultima volta
+            all_candidate_commits = get_all_candidate_commits(parent_commit, changes_dict)
+
+    return all_candidate_commits
 
-        # generiamo il dizionario che contiene come chiave i file cambiati e come valore i numeri di riga
-        # modificati, ed in particolare le linee che dal commit parent sono state eliminate e sostituite col fix
-        # del bug
-        changes_dict = generate_changes_dict(diff)
-        # una volta fatto ciò la funzione all_candidate_commits trova i commit che hanno modificato quelle linee
-        # l'ultima volta
-        all_candidate_commits = get_all_candidate_commits(parent_commit, changes_dict)
 
+def profiler_enabled():
+    return args.profile is not None
+
+
+def get_jobs():
+    return args.jobs if args.jobs > 1 else 1
+
+
+def init_worker(repo_path, worker_args, blame_cache_path, blame_cache_size, worker_prune_rules=None):
+    # ogni processo del pool apre il proprio repository e la propria connessione alla cache
+    global repo, args, blame_cache, git_pool, profiler, backend, prune_rules, line_index
+    repo = open_repository(repo_path)
+    backend = create_backend(worker_args.backend, repo)
+    args = worker_args
+    # l'indice è già aggiornato dal processo principale, ogni processo del pool lo legge dal file
+    line_index = LineOriginIndex.load(worker_args.line_index) if worker_args.line_index is not None else None
+    profiler = Profiler(profiler_enabled(), worker_args.profile_memory)
+    prune_rules = worker_prune_rules
+    git_pool = GitProcessPool(repo.git_dir, get_diff_pathspecs()) if worker_args.git_pool else None
+    blame_cache = BlameCache(blame_cache_path, blame_cache_size) if blame_cache_path is not None else None
+
+
+def search_candidate_commit_worker(bug_fix_sha, issue_opened_at=None):
+    hits, misses = (blame_cache.hits, blame_cache.misses) if blame_cache is not None else (0, 0)
+    all_candidate_commits = search_candidate_commit_szz(repo.commit(bug_fix_sha))
+    # nell'analisi in batch anche il filtro sulle issue viene applicato dal processo che ha analizzato il commit
+    if issue_opened_at is not None:
+        with profiler.stage('issue_filter'):
+            all_candidate_commits = extract_commit_by_timestamp(all_candidate_commits, issue_opened_at)
+
+    # insieme ai commit candidati si restituiscono gli accessi alla cache, i dati del profiling e i file scartati,
+    # così il processo principale può riportare le statistiche complessive
+    if blame_cache is not None:
+        hits, misses = blame_cache.hits - hits, blame_cache.misses - misses
+    worker_stats = {'blame_cache_hits': hits, 'blame_cache_misses': misses,
+                    'profile': profiler.take() if profiler.enabled else None,
+                    'prune': prune_rules.take_stats() if prune_rules is not None else None}
+    return all_candidate_commits, worker_stats
+
+
+def add_worker_stats(worker_stats):
+    if blame_cache is not None:
+        blame_cache.hits += worker_stats['blame_cache_hits']
+        blame_cache.misses += worker_stats['blame_cache_misses']
+    if worker_stats['profile'] is not None:
+        profiler.merge(worker_stats['profile'])
+    if worker_stats['prune'] is not None and prune_rules is not None:
+        prune_rules.add_stats(worker_stats['prune'])
+
+
+def search_candidate_commits(bug_fix_commits):
+    # restituisce i commit candidati di ciascun bug fix nello stesso ordine dei commit ricevuti
+    jobs = get_jobs()
+    if jobs == 1:
+        for bug_fix_commit in bug_fix_commits:
+            yield search_candidate_commit_szz(bug_fix_commit)
+        return
+
+    blame_cache_path, blame_cache_size = (blame_cache.db_path, blame_cache.max_entries) if blame_cache is not None \
+        else (None, None)
+    with ProcessPoolExecutor(max_workers=jobs, initializer=init_worker,
+                             initargs=(repo.git_dir, args, blame_cache_path, blame_cache_size,
+                                       prune_rules)) as executor:
+        # a differenza di map, che consuma subito tutti i commit, si inviano al pool solo pochi commit alla volta:
+        # la memoria resta limitata anche con storie molto lunghe e i risultati escono nell'ordine di invio, quindi
+        # l'output resta riproducibile
+        pending = deque()
+        for bug_fix_commit in bug_fix_commits:
+            pending.append(executor.submit(search_candidate_commit_worker, bug_fix_commit.hexsha))
+            if len(pending) >= jobs * PIPELINE_WINDOW_PER_JOB:
+                yield collect_worker_result(pending.popleft())
+        while pending:
+            yield collect_worker_result(pending.popleft())
+
+
+def collect_worker_result(future):
+    all_candidate_commits, worker_stats = future.result()
+    add_worker_stats(worker_stats)
     return all_candidate_commits
 
 
-def extract_issue_number(commit_message, regex_pattern):
-    # Utilizza il pattern di espressione regolare per
-    # cercare il numero dell'issue nel messaggio del commit.
-    pattern = re.compile(regex_pattern)
-    match = pattern.search(commit_message)
-    if match:
-        return int(match.group(1))
-    return None
+def parse_issue_timestamp(issue_opened_at):
+    # Converti la stringa ISO 8601 in un oggetto datetime
+    issue_opened_at_datetime = datetime.fromisoformat(issue_opened_at.replace('Z', '+00:00'))
+
+    # Estrai il timestamp Unix
+    return int(issue_opened_at_datetime.timestamp())
+
+
+def iter_json_array(issue_file, chunk_size=1 << 16):
+    # legge un array JSON un elemento alla volta, senza caricare in memoria l'intero albero del documento
+    decoder = json.JSONDecoder()
+    buffer = issue_file.read(chunk_size).lstrip()
+    if not buffer.startswith('['):
+        raise json.JSONDecodeError('Expecting a JSON array', buffer, 0)
+    buffer = buffer[1:]
+    eof = False
+
+    while True:
+        buffer = buffer.lstrip().lstrip(',').lstrip()
+        if buffer.startswith(']'):
+            return
+        try:
+            element, end = decoder.raw_decode(buffer)
+            # un elemento che arriva fino alla fine del buffer potrebbe essere troncato (ad esempio un numero)
+            if end < len(buffer) or eof:
+                yield element
+                buffer = buffer[end:]
+                continue
+        except json.JSONDecodeError:
+            if eof:
+                raise
+        chunk = issue_file.read(chunk_size)
+        eof = not chunk
+        buffer += chunk
+
+
+def iter_json_lines(issue_file):
+    for line in issue_file:
+        if line.strip():
+            yield json.loads(line)
+
+
+def iter_json_records(json_file):
+    # il primo carattere non vuoto distingue un array JSON da un file JSON Lines
+    first_char = json_file.read(1)
+    while first_char.isspace():
+        first_char = json_file.read(1)
+    json_file.seek(0)
+    return iter_json_array(json_file) if first_char == '[' else iter_json_lines(json_file)
+
+
+class IssueStore:
+    # Indice delle issue per numero, con la data di apertura già convertita in timestamp Unix
+
+    def __init__(self):
+        self.opened_at = {}
+
+    @classmethod
+    def from_records(cls, issues):
+        issue_store = cls()
+        for issue in issues:
+            issue_store.add(issue['number'], issue['created_at'])
+        return issue_store
+
+    @classmethod
+    def load(cls, issue_path):
+        # accetta sia un array JSON sia un file JSON Lines (un'issue per riga), letti entrambi in streaming
+        with open(issue_path) as issue_file:
+            return cls.from_records(iter_json_records(issue_file))
+
+    def add(self, number, created_at):
+        self.opened_at[int(number)] = parse_issue_timestamp(created_at)
+
+    def get(self, number):
+        return self.opened_at.get(number)
+
+    def __contains__(self, number):
+        return number in self.opened_at
+
+    def __len__(self):
+        return len(self.opened_at)
 
 
 def extract_commit_by_timestamp(all_candidate_commits, issue_opened_at):
     suspect_commit = []
 
-    # Itera su ciascun commit candidato ad essere commit che ha introdotto il bug ottenuto dal blame
-    for commit_sha, author in all_candidate_commits:
-        # per ogni commit candidato, estraiamo la data
-        commit_bug = repo.commit(commit_sha)
-        # Ottieni la data del commit come timestamp
-        commit_date_timestamp = commit_bug.committed_date
-
-        # Converti la stringa ISO 8601 in un oggetto datetime
-        issue_opened_at_datetime = datetime.fromisoformat(issue_opened_at.replace('Z', '+00:00'))
+    # la data di apertura dell'issue può essere già convertita in timestamp dall'IssueStore
+    if isinstance(issue_opened_at, str):
+        timestamp_issue_opened_at = parse_issue_timestamp(issue_opened_at)
+    else:
+        timestamp_issue_opened_at = issue_opened_at
 
-        # Estrai il timestamp Unix
-        timestamp_issue_opened_at = int(issue_opened_at_datetime.timestamp())
+    # Itera su ciascun commit candidato ad essere commit che ha introdotto il bug ottenuto dal blame
+    for candidate_commit in all_candidate_commits:
+        profiler.count('issue_filter_candidates')
+        # per ogni commit candidato si usa la data letta dal blame
+        commit_date_timestamp = get_candidate_date(candidate_commit)
 
         # Stampa solo i commit effettuati prima della data di apertura dell'issue
         # cioè che sicuramente non sono fix parziali
         if commit_date_timestamp < timestamp_issue_opened_at:
-            suspect_commit.append((commit_sha, commit_bug.author.name))
+            suspect_commit.append(candidate_commit)
 
     return suspect_commit
 
 
-def szz():
-    bug_fix_commits = get_bug_fix_commits_for_szz()
+def get_incremental_state_path():
+    return args.incremental
 
-    total_candidate_commit = {}
-    # iteriamo su tutti i commit bug_fix
-    for bug_fix_commit in bug_fix_commits[0:5]:
-        # chiamiamo la funzione che fa diff, blame e ottiene i commit candidati
-        total_candidate_commit[bug_fix_commit] = search_candidate_commit_szz(bug_fix_commit)
 
-    print_candidate_commit(total_candidate_commit)
+def get_incremental_options(mode):
+    # i risultati salvati sono validi solo se ottenuti con la stessa modalità e le stesse opzioni
+    options = {'mode': mode, 'recent': bool(args.recent),
+               'pattern': issue_classifier.pattern if mode == 'issue' else None}
+    if prune_rules is not None:
+        options['prune'] = prune_rules.describe()
+    return options
 
 
-def szz_issue():
-    suspect_commit_dict = {}
+def load_incremental_state(state_path, mode):
+    # restituisce l'HEAD analizzato nell'esecuzione precedente e i relativi risultati per ogni commit bug fix
+    try:
+        with open(state_path) as state_file:
+            state = json.load(state_file)
+    except FileNotFoundError:
+        return None, {}
+
+    if state.get('options') != get_incremental_options(mode):
+        print(f'The state file {state_path} was created with different options, the whole history is analyzed')
+        return None, {}
+
+    return state['head'], {bug_fix_sha: [tuple(candidate) for candidate in candidate_commits]
+                           for bug_fix_sha, candidate_commits in state['results'].items()}
+
+
+def save_incremental_state(state_path, mode, head, results):
+    state = {
+        'options': get_incremental_options(mode),
+        'head': head,
+        'results': {str(bug_fix_commit): sorted(candidate_commits)
+                    for bug_fix_commit, candidate_commits in results.items()},
+    }
+    # il file viene sostituito in modo atomico, così un'interruzione non lascia uno stato parziale
+    tmp_path = state_path + '.tmp'
+    with open(tmp_path, 'w') as state_file:
+        json.dump(state, state_file)
+    os.replace(tmp_path, state_path)
+
+
+def get_incremental_rev(previous_head, head):
+    # vengono analizzati solo i commit raggiungibili dal nuovo HEAD che non lo erano da quello precedente
+    if previous_head is None:
+        return None
+    try:
+        if not repo.is_ancestor(previous_head, head):
+            print(f'The previously analyzed HEAD {previous_head} is not an ancestor of {head}, the whole history '
+                  f'is analyzed')
+            return None
+    except git.GitCommandError:
+        print(f'The previously analyzed HEAD {previous_head} is not in the repository, the whole history is analyzed')
+        return None
+
+    return f'{previous_head}..{head}'
+
+
+def start_incremental_run(mode):
+    # restituisce l'HEAD corrente, l'intervallo di commit da analizzare e i risultati già salvati
+    state_path = get_incremental_state_path()
+    if state_path is None:
+        return None, None, {}
+
+    head = repo.head.commit.hexsha
+    previous_head, previous_results = load_incremental_state(state_path, mode)
+    rev = get_incremental_rev(previous_head, head)
+    if rev is None:
+        return head, head, {}
+
+    return head, rev, previous_results
+
+
+def finish_incremental_run(mode, head, results, previous_results):
+    # i nuovi risultati precedono quelli salvati, come nell'ordine di git log
+    state_path = get_incremental_state_path()
+    if state_path is None:
+        return results
+
+    merged_results = {str(bug_fix_commit): candidate_commits for bug_fix_commit, candidate_commits in
+                      results.items()}
+    for bug_fix_sha, candidate_commits in previous_results.items():
+        if bug_fix_sha not in merged_results:
+            merged_results[bug_fix_sha] = candidate_commits
+            # i risultati delle esecuzioni precedenti completano il file di output
+            if output_sink is not None:
+                output_sink.write(bug_fix_sha, candidate_commits)
+    save_incremental_state(state_path, mode, head, merged_results)
+    return merged_results
 
-    bug_fix_commits = get_bug_fix_commits_szz_issue()
+
+def szz():
+    head, rev, previous_results = start_incremental_run('szz')
+    # i commit bug fix passano uno alla volta da discovery a diff, blame, filtro e output: i risultati sono indicizzati
+    # per sha, così gli oggetti Commit non restano in memoria dopo l'analisi
+    bug_fix_commits = profiler.iter_stage('discovery', get_bug_fix_commits_for_szz(rev))
+
+    total_candidate_commit = {}
+    completed_shas = start_journal('szz', total_candidate_commit)
+    # iteriamo su tutti i commit bug_fix, tranne quelli già analizzati prima di un'interruzione
+    bug_fix_commits = islice(bug_fix_commits, 0, 5)
+    if completed_shas:
+        bug_fix_commits = (bug_fix_commit for bug_fix_commit in bug_fix_commits if
+                           str(bug_fix_commit) not in completed_shas)
+    # chiamiamo la funzione che fa diff, blame e ottiene i commit candidati; tee conserva solo i commit inviati al
+    # pool di processi e non ancora restituiti
+    bug_fix_commits, searched_commits = tee(bug_fix_commits)
+    for bug_fix_commit, all_candidate_commits in zip(bug_fix_commits, search_candidate_commits(searched_commits)):
+        store_result(total_candidate_commit, str(bug_fix_commit), all_candidate_commits)
+    finish_journal()
+
+    total_candidate_commit = finish_incremental_run('szz', head, total_candidate_commit, previous_results)
+    if output_sink is None:
+        print_candidate_commit(total_candidate_commit)
+    print_blame_cache_stats()
+    print_prune_stats()
+
+
+def iter_bug_fix_commits_with_issue(bug_fix_commits):
+    # restituisce le coppie (commit bug fix, data di apertura dell'issue) da analizzare
     for bug_fix_commit in bug_fix_commits:
-        issue_number_in_bug_fix = extract_issue_number(bug_fix_commit.message, issue_pattern)
+        is_fix, issue_numbers = issue_classifier.classify(bug_fix_commit.message)
+        # se il messaggio cita più issue si usa la prima presente nel file delle issue
+        issue_number_in_bug_fix = next((issue_number for issue_number in issue_numbers if issue_number in issue_data),
+                                       issue_numbers[0] if issue_numbers else None)
         commit_sha_bug_fix = bug_fix_commit.hexsha
 
         print(f'The bug fix commit: {commit_sha_bug_fix} refers to issue {issue_number_in_bug_fix}')
-        found = False
-
-        for issue in issue_data:
-            issue_n = int(issue["number"])
-
-            if issue_n == issue_number_in_bug_fix:
-                found = True
-                print(f"The issue {issue_number_in_bug_fix} is present in the issue file, so it is possible to search "
-                      f"for commits")
-                issue_opened_at = issue['created_at']
-                all_candidate_commits = search_candidate_commit_szz(bug_fix_commit)
-                suspect_commit_dict[commit_sha_bug_fix] = extract_commit_by_timestamp(all_candidate_commits,
-                                                                                      issue_opened_at)
-        if not found:
+
+        # l'indice delle issue restituisce direttamente la data di apertura, senza scorrere tutto il file
+        issue_opened_at = issue_data.get(issue_number_in_bug_fix)
+        if issue_opened_at is not None:
+            print(f"The issue {issue_number_in_bug_fix} is present in the issue file, so it is possible to search "
+                  f"for commits")
+            yield bug_fix_commit, issue_opened_at
+        else:
             print(f'The bug_fix_commit: {commit_sha_bug_fix} contains a reference to issue {issue_number_in_bug_fix} '
                   f'but is not contained in the file that has been passed')
 
-    print('\n\n\nThis is the list of every bug fix commits and the relative bug inducing commits')
-    print_candidate_commit(suspect_commit_dict)
-
 
-args = None
-repo = None
-issue_pattern = None
-issue_data = None
+def szz_issue():
+    suspect_commit_dict = {}
 
-if __name__ == '__main__':
+    head, rev, previous_results = start_incremental_run('issue')
+    # come in szz i commit vengono analizzati in streaming e i risultati sono indicizzati per sha
+    bug_fix_commits = profiler.iter_stage('discovery', get_bug_fix_commits_szz_issue(rev))
+    completed_shas = start_journal('issue', suspect_commit_dict)
+    if completed_shas:
+        bug_fix_commits = (bug_fix_commit for bug_fix_commit in bug_fix_commits if
+                           bug_fix_commit.hexsha not in completed_shas)
+    bug_fix_commits_with_issue, searched_commits_with_issue = tee(iter_bug_fix_commits_with_issue(bug_fix_commits))
+    all_candidate_commits_list = search_candidate_commits(bug_fix_commit for bug_fix_commit, issue_opened_at in
+                                                          searched_commits_with_issue)
+    for (bug_fix_commit, issue_opened_at), all_candidate_commits in zip(bug_fix_commits_with_issue,
+                                                                        all_candidate_commits_list):
+        with profiler.stage('issue_filter'):
+            suspect_commits = extract_commit_by_timestamp(all_candidate_commits, issue_opened_at)
+        store_result(suspect_commit_dict, bug_fix_commit.hexsha, suspect_commits)
+    finish_journal()
+
+    suspect_commit_dict = finish_incremental_run('issue', head, suspect_commit_dict, previous_results)
+    if output_sink is None:
+        print('\n\n\nThis is the list of every bug fix commits and the relative bug inducing commits')
+        print_candidate_commit(suspect_commit_dict)
+    print_blame_cache_stats()
+    print_prune_stats()
+
+
+def load_batch_manifest(manifest_path, output_dir='.', output_format=None):
+    # ogni voce del manifest indica il repository e, per l'analisi basata sulle issue, il file delle issue e il
+    # pattern; i percorsi relativi sono risolti rispetto alla cartella del manifest. Senza 'output' i risultati di
+    # ogni repository sono scritti in output_dir, in un file con il nome del repository
+    manifest_dir = os.path.dirname(os.path.abspath(manifest_path))
+    extension = 'csv' if output_format == 'csv' else 'jsonl'
+    entries = []
+    with open(manifest_path) as manifest_file:
+        for record in iter_json_records(manifest_file):
+            if isinstance(record, str):
+                record = {'repo_path': record}
+            repo_path = os.path.join(manifest_dir, record['repo_path'])
+            issue_path = os.path.join(manifest_dir, record['issue']) if record.get('issue') else None
+            output_path = os.path.join(manifest_dir, record['output']) if record.get('output') else \
+                os.path.join(output_dir, f'{os.path.basename(os.path.normpath(repo_path))}.{extension}')
+            entries.append(BatchEntry(repo_path, issue_path, record.get('pattern'), output_path))
+    return entries
+
+
+def estimate_repository_cost(repo_path):
+    # il costo del blame cresce con la lunghezza della storia, che git conta senza leggere i commit; restituisce None
+    # se il repository non può essere aperto
+    try:
+        with open_repository(repo_path) as repository:
+            return int(repository.git.rev_list('--count', 'HEAD'))
+    except (git.NoSuchPathError, git.InvalidGitRepositoryError) as e:
+        print(f'The repository {repo_path} cannot be opened ({e!r}), it is skipped')
+        return None
+    except git.GitCommandError:
+        # repository senza commit
+        return 0
+
+
+class BatchRepository:
+    # Stato di un repository durante l'analisi in batch: il file dei risultati e il numero di commit bug fix inviati
+    # ai processi e non ancora restituiti. Il file viene chiuso quando la ricerca dei commit è terminata e tutti i
+    # risultati sono stati scritti
+
+    def __init__(self, entry, cost):
+        self.entry = entry
+        self.cost = cost
+        self.sink = None
+        self.pending = 0
+        self.analyzed = 0
+        self.discovery_done = False
+
+    def open(self, output_format=None):
+        os.makedirs(os.path.dirname(os.path.abspath(self.entry.output)), exist_ok=True)
+        self.sink = open_output_sink(self.entry.output, output_format)
+
+    def store(self, bug_fix_sha, candidate_commits):
+        self.sink.write(bug_fix_sha, candidate_commits)
+        self.pending -= 1
+        self.analyzed += 1
+        self.finish_if_done()
+
+    def finish_if_done(self):
+        if self.discovery_done and self.pending == 0 and self.sink is not None:
+            self.sink.close()
+            self.sink = None
+            print(f'{self.entry.repo_path}: {self.analyzed} bug-fix commits analyzed, results written to '
+                  f'{self.entry.output}')
+
+
+def iter_batch_tasks(entry):
+    # apre il repository nel processo principale e restituisce lo sha di ogni commit bug fix da analizzare con la
+    # data di apertura della relativa issue (None senza file delle issue)
+    global repo, issue_classifier, issue_data
+    repo = open_repository(entry.repo_path)
+    try:
+        if entry.issue is None:
+            # come in szz vengono analizzati i primi 5 commit bug fix
+            bug_fix_commits = ((bug_fix_commit, None) for bug_fix_commit in
+                               islice(get_bug_fix_commits_for_szz(), 0, 5))
+        else:
+            pattern = entry.pattern or load_regex_config()
+            if pattern is None:
+                print(f'No valid issue pattern found for {entry.repo_path}, it is skipped')
+                return
+            issue_classifier = BugFixClassifier.from_config(pattern)
+            issue_data = IssueStore.load(entry.issue)
+            bug_fix_commits = iter_bug_fix_commits_with_issue(get_bug_fix_commits_szz_issue())
+
+        for bug_fix_commit, issue_opened_at in profiler.iter_stage('discovery', bug_fix_commits):
+            yield bug_fix_commit.hexsha, issue_opened_at
+    finally:
+        repo.close()
+
+
+def init_batch_worker(worker_args, worker_prune_rules=None):
+    # i repository vengono aperti da ogni processo solo quando riceve il primo commit da analizzare
+    global args, profiler, prune_rules
+    args = worker_args
+    profiler = Profiler(profiler_enabled(), worker_args.profile_memory)
+    prune_rules = worker_prune_rules
+
+
+def open_repository_context(repo_path):
+    repository = open_repository(repo_path)
+    context_blame_cache = None
+    if args.blame_cache is not None:
+        context_blame_cache = BlameCache(args.blame_cache or default_blame_cache_path(repository),
+                                         args.blame_cache_size)
+    context_git_pool = GitProcessPool(repository.git_dir, get_diff_pathspecs()) if args.git_pool else None
+    return RepositoryContext(repository, create_backend(args.backend, repository), context_blame_cache,
+                             context_git_pool)
+
+
+def close_repository_context(context):
+    context.backend.close()
+    if context.git_pool is not None:
+        context.git_pool.close()
+    if context.blame_cache is not None:
+        context.blame_cache.close()
+    context.repo.close()
+
+
+def activate_repository(repo_path):
+    # ogni processo tiene aperti gli ultimi repository usati; quando se ne apre uno nuovo viene chiuso quello usato
+    # meno di recente
+    global repo, backend, blame_cache, git_pool, commit_metadata, commit_lookups
+    context = repository_contexts.pop(repo_path, None)
+    if context is None:
+        if len(repository_contexts) >= BATCH_REPOSITORY_CACHE_SIZE:
+            close_repository_context(repository_contexts.pop(next(iter(repository_contexts))))
+        context = open_repository_context(repo_path)
+    repository_contexts[repo_path] = context
+    repo, backend, blame_cache, git_pool = context
+    # la tabella dei metadati descrive un solo repository
+    commit_metadata = None
+    commit_lookups = 0
+
+
+def search_candidate_commit_batch_worker(repo_path, bug_fix_sha, issue_opened_at):
+    activate_repository(repo_path)
+    return search_candidate_commit_worker(bug_fix_sha, issue_opened_at)
+
+
+def collect_batch_result(batch_repository, bug_fix_sha, future):
+    batch_repository.store(bug_fix_sha, collect_worker_result(future))
+
+
+def szz_batch(manifest_path):
+    batch_repositories = []
+    for entry in load_batch_manifest(manifest_path, args.output or '.', args.format):
+        cost = estimate_repository_cost(entry.repo_path)
+        if cost is not None:
+            batch_repositories.append(BatchRepository(entry, cost))
+    # i repository con la storia più lunga vengono avviati per primi, così alla fine restano da analizzare solo i
+    # commit dei repository più piccoli e i processi non restano fermi ad aspettare l'ultimo
+    batch_repositories.sort(key=lambda batch_repository: batch_repository.cost, reverse=True)
+
+    jobs = get_jobs()
+    # tutti i repository condividono lo stesso pool di processi: mentre si cercano i commit bug fix di un repository
+    # i processi analizzano ancora quelli dei repository precedenti
+    with ProcessPoolExecutor(max_workers=jobs, initializer=init_batch_worker,
+                             initargs=(args, prune_rules)) as executor:
+        pending = deque()
+        for batch_repository in batch_repositories:
+            batch_repository.open(args.format)
+            try:
+                for bug_fix_sha, issue_opened_at in iter_batch_tasks(batch_repository.entry):
+                    future = executor.submit(search_candidate_commit_batch_worker, batch_repository.entry.repo_path,
+                                             bug_fix_sha, issue_opened_at)
+                    pending.append((batch_repository, bug_fix_sha, future))
+                    batch_repository.pending += 1
+                    if len(pending) >= jobs * PIPELINE_WINDOW_PER_JOB:
+                        collect_batch_result(*pending.popleft())
+            except (OSError, ValueError, re.error, git.GitCommandError) as e:
+                # un file delle issue non valido o un errore di git interrompono solo il repository corrente
+                print(f'The analysis of {batch_repository.entry.repo_path} stopped: {e}')
+            batch_repository.discovery_done = True
+            batch_repository.finish_if_done()
+
+        while pending:
+            collect_batch_result(*pending.popleft())
+    print_prune_stats()
+
+
+def create_parser():
     parser = argparse.ArgumentParser(description="""Insert repository name""")
     parser.add_argument('--repo-path', type=str, help="The absolute path to a local copy of the git repository from "
-                                                      "where the git log is taken.")
+                                                      "where the git log is taken. A bare mirror can be used too")
+    parser.add_argument('--git-dir', type=str,
+                        help="Path of the git directory to analyze (a bare mirror or the .git directory of a working "
+                             "copy), as an alternative to --repo-path. Only the object store is read, so several "
+                             "analyses can run on the same mirror at once")
 
     # Aggiungi l'opzione -i e specifica il parametro --issue
     parser.add_argument('-i', '--issue', type=str, help="The absolute path to a local copy of a JSON file containing "
-                                                        "the issue bug report of the repository")
+                                                        "the issue bug report of the repository. Both a JSON array "
+                                                        "and JSON Lines (one issue per line) are accepted")
 
     # Aggiungi l'opzione -r e specifica il parametro --recent
     parser.add_argument('-r', '--recent', action='store_true',
                         help="Show only the most recent commit for each bug-fix commit")
 
+    # Aggiungi l'opzione --blame-cache per riutilizzare i blame già calcolati nelle esecuzioni precedenti
+    parser.add_argument('--blame-cache', type=str, nargs='?', const='',
+                        help="Path of the SQLite file used to cache blame results across runs. If the path is omitted "
+                             "the cache is created next to the repository")
+    parser.add_argument('--blame-cache-size', type=int, default=DEFAULT_BLAME_CACHE_SIZE,
+                        help="Maximum number of (revision, file) blame results kept in the cache")
+
+    # Aggiungi l'opzione -j e specifica il parametro --jobs
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help="Number of worker processes used to analyze the bug-fix commits in parallel")
+
+    # Aggiungi l'opzione --blame-concurrency per eseguire insieme i blame dei file di uno stesso commit
+    parser.add_argument('--blame-concurrency', type=int, default=1,
+                        help="Maximum number of git blame processes run at the same time for the files changed by "
+                             "one bug-fix commit (default: 1, one file after the other)")
+
+    # Aggiungi l'opzione --discovery per scegliere come vengono individuati i commit bug fix
+    parser.add_argument('--discovery', choices=['python', 'git'], default='python',
+                        help="Where bug-fix commits are searched: 'python' reads every commit message, 'git' passes "
+                             "the keywords or the issue pattern to git log --grep and falls back to 'python' when the "
+                             "pattern cannot be expressed as a git regular expression")
+
+    # Aggiungi l'opzione --backend per scegliere come leggere diff e blame
+    parser.add_argument('--backend', choices=['cli', 'pygit2'], default='cli',
+                        help="Repository access backend: 'cli' runs git commands through GitPython, 'pygit2' computes "
+                             "diffs and blames in-process with libgit2 (requires the pygit2 package)")
+
+    # Aggiungi l'opzione --git-pool per riutilizzare gli stessi processi git per tutta l'analisi
+    parser.add_argument('--git-pool', action='store_true',
+                        help="Keep long-lived git processes (cat-file --batch, cat-file --batch-check and diff-tree "
+                             "--stdin) for object lookups and diffs instead of starting a new git process each time")
+
+    # Aggiungi l'opzione --profile per misurare le singole fasi dell'analisi
+    parser.add_argument('--profile', type=str,
+                        help="Path of a JSON report with the wall and CPU time of each stage, the git processes "
+                             "started and the bytes read from them, the blame lines parsed and matched, the peak "
+                             "memory and the slowest bug-fix commits")
+    parser.add_argument('--profile-memory', action='store_true',
+                        help="Also trace the Python allocations with tracemalloc (slower)")
+
+    # Aggiungi l'opzione --incremental per analizzare solo i commit aggiunti dopo l'ultima esecuzione
+    parser.add_argument('--incremental', type=str,
+                        help="Path of a state file that records the last analyzed HEAD and the results of every "
+                             "bug-fix commit. Only the commits added since the previous run are analyzed and their "
+                             "results are merged with the stored ones")
+
+    # Aggiungi le opzioni per escludere dei file prima del blame
+    parser.add_argument('--prune-config', type=str,
+                        help="JSON file with the rules used to skip files before blame: 'include' and 'exclude' "
+                             "globs, 'max_blob_size', 'max_changed_lines' and per-extension rules in 'extensions' "
+                             "(for example {\".min.js\": {\"exclude\": true}, \".c\": {\"max_changed_lines\": 200}})")
+    parser.add_argument('--include', action='append',
+                        help="Only analyze the files matching this glob (can be repeated)")
+    parser.add_argument('--exclude', action='append',
+                        help="Skip the files matching this glob (can be repeated)")
+    parser.add_argument('--max-blob-size', type=int,
+                        help="Skip the files larger than this number of bytes in the parent commit")
+    parser.add_argument('--max-changed-lines', type=int,
+                        help="Skip the files with more than this number of changed lines in a bug-fix commit")
+
+    # Aggiungi l'opzione --line-index per attribuire le righe senza eseguire git blame
+    parser.add_argument('--line-index', type=str,
+                        help="Path of a line-origin index of the first-parent history of HEAD. It is built on the "
+                             "first run, updated with the new commits on the next ones, and used to find the commit "
+                             "that last changed a line instead of running git blame")
+
+    # Aggiungi le opzioni --journal e --resume per riprendere un'analisi interrotta
+    parser.add_argument('--journal', type=str,
+                        help="Path of a progress journal where every analyzed bug-fix commit and its candidate "
+                             "commits are appended and synced to disk as soon as its analysis ends")
+    parser.add_argument('--resume', action='store_true',
+                        help="Continue the run recorded in the --journal file: the bug-fix commits already in the "
+                             "journal are not analyzed again and their results are merged with the new ones")
+
+    # Aggiungi l'opzione --output per scrivere i risultati man mano su file
+    parser.add_argument('--output', type=str,
+                        help="Path of a file where the candidate commits of every bug-fix commit are written as soon "
+                             "as its analysis ends, instead of printing all of them at the end")
+    parser.add_argument('--format', choices=sorted(OUTPUT_SINKS),
+                        help="Format of the --output file (default: csv for a .csv file, jsonl otherwise)")
+
+    # Aggiungi l'opzione --batch per analizzare più repository con lo stesso pool di processi
+    parser.add_argument('--batch', type=str,
+                        help="Path of a manifest (JSON array or JSON Lines) of repositories to analyze with one shared "
+                             "pool of --jobs worker processes. Each entry has a 'repo_path' and optionally an 'issue' "
+                             "file, a 'pattern' (default: regex_config.txt) and an 'output' file; the results of the "
+                             "entries without 'output' are written to the --output directory")
+    return parser
+
+
+args = None
+repo = None
+issue_classifier = None
+issue_data = None
+blame_cache = None
+commit_metadata = None
+commit_lookups = 0
+git_pool = None
+profiler = Profiler()
+backend = GitCliBackend()
+output_sink = None
+prune_rules = None
+line_index = None
+progress_journal = None
+repository_contexts = {}
+
+if __name__ == '__main__':
+    parser = create_parser()
     args = parser.parse_args()
-    path_to_repo = args.repo_path
-    repo = git.Repo(path_to_repo)
-    issue_pattern_str = load_regex_config()
+    if args.repo_path is not None and args.git_dir is not None:
+        parser.error("--repo-path and --git-dir cannot be used together")
+    if args.resume and args.journal is None:
+        parser.error("--resume requires --journal")
+    if args.backend == 'pygit2' and pygit2 is None:
+        parser.error("the pygit2 backend requires the pygit2 package (pip install pygit2)")
+    if args.batch is not None:
+        for option in ('repo_path', 'git_dir', 'issue', 'incremental', 'line_index', 'journal'):
+            if getattr(args, option) is not None:
+                parser.error(f"--{option.replace('_', '-')} cannot be used with --batch, use the manifest entries")
+    profiler = Profiler(profiler_enabled(), args.profile_memory)
+
+    if (args.prune_config or args.include or args.exclude or args.max_blob_size is not None or
+            args.max_changed_lines is not None):
+        prune_rules = PruneRules.load(args.prune_config, args.include, args.exclude, args.max_blob_size,
+                                      args.max_changed_lines)
+
+    if args.batch is not None:
+        szz_batch(args.batch)
+    else:
+        path_to_repo = args.repo_path if args.repo_path is not None else args.git_dir
+        repo = open_repository(path_to_repo)
+        backend = create_backend(args.backend, repo)
 
-    if issue_pattern_str is not None:
-        issue_pattern = re.compile(issue_pattern_str)
+        if args.git_pool:
+            git_pool = GitProcessPool(repo.git_dir, get_diff_pathspecs())
 
-        if args.issue:
-            try:
-                with open(args.issue) as issue_path_file:
-                    issue_data = json.load(issue_path_file)
-                szz_issue()
-            except json.JSONDecodeError as e:
-                print(f"Error decoding JSON content: {e}")
+        if args.blame_cache is not None:
+            blame_cache = BlameCache(args.blame_cache or default_blame_cache_path(repo), args.blame_cache_size)
+
+        if args.output is not None:
+            output_sink = open_output_sink(args.output, args.format)
+
+        if args.line_index is not None:
+            line_index = load_line_index(args.line_index)
+
+        # le date dei commit usate dal flag -r e dal filtro sulle issue arrivano dal blame, quindi non serve leggere
+        # in anticipo i metadati di tutta la storia
+        issue_pattern_str = load_regex_config()
+
+        if issue_pattern_str is not None:
+            issue_classifier = BugFixClassifier.from_config(issue_pattern_str)
+
+            if args.issue:
+                try:
+                    issue_data = IssueStore.load(args.issue)
+                    szz_issue()
+                except json.JSONDecodeError as e:
+                    print(f"Error decoding JSON content: {e}")
+            else:
+                szz()
         else:
-            szz()
-    else:
-        print("No valid issue pattern found. Please check the regex_config.txt file.")
+            print("No valid issue pattern found. Please check the regex_config.txt file.")
+
+        if git_pool is not None:
+            git_pool.close()
+        backend.close()
+
+        if output_sink is not None:
+            output_sink.close()
+
+    if args.profile is not None:
+        profiler.write(args.profile)
@@ -1,17 +1,58 @@
+import argparse
+import io
+import itertools
+import json
+import os
+import pickle
+import tempfile
 import unittest
 from unittest.mock import MagicMock, patch, call, mock_open
-import re
+
+import git
 
 from src.main import get_bug_fix_commits_for_szz, generate_changes_dict, get_candidate_commits, \
-    get_all_candidate_commits, extract_issue_number, match_comment, is_fix_contained, \
+    get_all_candidate_commits, \
     get_bug_fix_commits_szz_issue, \
     search_candidate_commit_szz, \
     print_candidate_commit, szz, \
-    load_regex_config, commit_is_more_recent, szz_issue, extract_commit_by_timestamp  # Assicurati di sostituire 'your_script' con il nome reale del tuo script
+    load_regex_config, commit_is_more_recent, szz_issue, extract_commit_by_timestamp, \
+    parse_blame_output, BlameCache, LineRanges, blame_line_ranges, search_candidate_commits, get_jobs, IssueStore, iter_json_array, parse_issue_timestamp, \
+    CommitMetadata, regex_to_git_ere, iter_git_log_commits, iter_diff_changes, stream_git_diff, \
+    load_incremental_state, save_incremental_state, get_incremental_rev, GitProcessPool, Profiler, JsonLinesSink, \
+    CsvSink, OutputSink, open_output_sink, get_blame_concurrency, GitCliBackend, create_backend, pygit2, \
+    PruneRules, prune_changes, LineOriginIndex, get_file_comment_lexer, load_batch_manifest, szz_batch, \
+    activate_repository, ProgressJournal, BugFixClassifier, get_required_literal, \
+    CandidateCommit, open_repository, create_parser  # Assicurati di sostituire 'your_script' con il nome reale del tuo script
+
+# identità usata dai comandi git che creano commit nei repository di test
+TEST_IDENTITY = {'GIT_AUTHOR_NAME': 'Test Author', 'GIT_AUTHOR_EMAIL': 'test@example.com',
+                 'GIT_COMMITTER_NAME': 'Test Author', 'GIT_COMMITTER_EMAIL': 'test@example.com'}
+
+
+def make_args(**options):
+    # argomenti con i valori predefiniti della riga di comando, sostituiti da quelli indicati
+    test_args = create_parser().parse_args([])
+    vars(test_args).update(options)
+    return test_args
+
+
+def create_test_repository(repo_path, file_versions):
+    # crea un repository con un commit per ogni versione del file 'file1.py'
+    test_repo = git.Repo.init(repo_path)
+    actor = git.Actor('Test Author', 'test@example.com')
+    for version, content in enumerate(file_versions):
+        with open(os.path.join(repo_path, 'file1.py'), 'w') as test_file:
+            test_file.write(content)
+        test_repo.index.add(['file1.py'])
+        test_repo.index.commit(f'commit {version}', author=actor, committer=actor,
+                               author_date=f'2021-11-0{version + 1}T00:00:00',
+                               commit_date=f'2021-11-0{version + 1}T00:00:00')
+    return test_repo
 
 
 class UnitTest(unittest.TestCase):
 
+    @patch('src.main.args', make_args())
     @patch('src.main.repo', autospec=True)
     def test_get_bug_fix_commits_for_szz_with_bug_and_fix(self, mock_repo):
         # Crea alcuni commit mock con messaggi specifici per il testing
@@ -25,11 +66,12 @@ class UnitTest(unittest.TestCase):
         mock_repo.iter_commits.return_value = mock_commits
 
         # Esegui la funzione di test
-        bug_fix_commits = get_bug_fix_commits_for_szz()
+        bug_fix_commits = list(get_bug_fix_commits_for_szz())
 
         # Verifica che la funzione restituisca i commit corretti
         self.assertEqual(bug_fix_commits, [mock_commits[0], mock_commits[2]])
 
+    @patch('src.main.args', make_args())
     @patch('src.main.repo', autospec=True)
     def test_get_bug_fix_commits_for_szz_with_bug_and_fixed(self, mock_repo):
         # Crea alcuni commit mock con messaggi specifici per il testing
@@ -43,11 +85,12 @@ class UnitTest(unittest.TestCase):
         mock_repo.iter_commits.return_value = mock_commits
 
         # Esegui la funzione di test
-        bug_fix_commits = get_bug_fix_commits_for_szz()
+        bug_fix_commits = list(get_bug_fix_commits_for_szz())
 
         # Verifica che la funzione restituisca i commit corretti
         self.assertEqual(bug_fix_commits, [mock_commits[0], mock_commits[2]])
 
+    @patch('src.main.args', make_args())
     @patch('src.main.repo', autospec=True)
     def test_get_bug_fix_commits_for_szz_with_fix_only(self, mock_repo):
         # Crea alcuni commit mock con messaggi specifici per il testing
@@ -61,11 +104,12 @@ class UnitTest(unittest.TestCase):
         mock_repo.iter_commits.return_value = mock_commits
 
         # Esegui la funzione di test
-        bug_fix_commits = get_bug_fix_commits_for_szz()
+        bug_fix_commits = list(get_bug_fix_commits_for_szz())
 
         # Verifica che la funzione restituisca una lista vuota
         self.assertEqual(bug_fix_commits, [])
 
+    @patch('src.main.args', make_args())
     @patch('src.main.repo', autospec=True)
     def test_get_bug_fix_commits_for_szz_with_bug_only(self, mock_repo):
         # Crea alcuni commit mock con messaggi specifici per il testing
@@ -79,11 +123,12 @@ class UnitTest(unittest.TestCase):
         mock_repo.iter_commits.return_value = mock_commits
 
         # Esegui la funzione di test
-        bug_fix_commits = get_bug_fix_commits_for_szz()
+        bug_fix_commits = list(get_bug_fix_commits_for_szz())
 
         # Verifica che la funzione restituisca una lista vuota
         self.assertEqual(bug_fix_commits, [])
 
+    @patch('src.main.args', make_args())
     @patch('src.main.repo', autospec=True)
     def test_get_bug_fix_commits_for_szz_with_empty_message(self, mock_repo):
         # Crea alcuni commit mock con messaggi specifici per il testing
@@ -97,14 +142,15 @@ class UnitTest(unittest.TestCase):
         mock_repo.iter_commits.return_value = mock_commits
 
         # Esegui la funzione di test
-        bug_fix_commits = get_bug_fix_commits_for_szz()
+        bug_fix_commits = list(get_bug_fix_commits_for_szz())
 
         # Verifica che la funzione restituisca una lista vuota
         self.assertEqual(bug_fix_commits, [])
 
-    @patch('src.main.is_fix_contained', autospec=True)
+    @patch('src.main.args', make_args())
+    @patch('src.main.issue_classifier')
     @patch('src.main.repo', autospec=True)
-    def test_get_bug_fix_commits_szz_issue_true(self, mock_repo, mock_is_fix_contained):
+    def test_get_bug_fix_commits_szz_issue_true(self, mock_repo, mock_issue_classifier):
         # Configura il mock del repository
         mock_commits = [
             MagicMock(message="Fixing a bug"),
@@ -112,16 +158,17 @@ class UnitTest(unittest.TestCase):
             MagicMock(message="Fix: Another bug in the code")
         ]
         mock_repo.iter_commits.return_value = mock_commits
-        mock_is_fix_contained.return_value = True
+        mock_issue_classifier.classify.return_value = (True, [])
         # Chiamata alla funzione da testare
-        result = get_bug_fix_commits_szz_issue()
+        result = list(get_bug_fix_commits_szz_issue())
 
         # Verifica che il risultato sia una lista di commit che contengono correzioni di bug
         self.assertEqual(result, [mock_commits[0], mock_commits[1], mock_commits[2]])
 
-    @patch('src.main.is_fix_contained', autospec=True)
+    @patch('src.main.args', make_args())
+    @patch('src.main.issue_classifier')
     @patch('src.main.repo', autospec=True)
-    def test_get_bug_fix_commits_szz_issue_false(self, mock_repo, mock_is_fix_contained):
+    def test_get_bug_fix_commits_szz_issue_false(self, mock_repo, mock_issue_classifier):
         # Configura il mock del repository
         mock_commits = [
             MagicMock(message="Fixing a bug"),
@@ -129,9 +176,9 @@ class UnitTest(unittest.TestCase):
             MagicMock(message="Fix: Another bug in the code")
         ]
         mock_repo.iter_commits.return_value = mock_commits
-        mock_is_fix_contained.return_value = False
+        mock_issue_classifier.classify.return_value = (False, [])
         # Chiamata alla funzione da testare
-        result = get_bug_fix_commits_szz_issue()
+        result = list(get_bug_fix_commits_szz_issue())
 
         # Verifica che il risultato sia una lista di commit che contengono correzioni di bug
         self.assertEqual(result, [])
@@ -152,13 +199,13 @@ class UnitTest(unittest.TestCase):
 index 67468fef9b5..00f1d5ebe98 100644
 --- a/third_party/xla/xla/service/gpu/BUILD
 +++ b/third_party/xla/xla/service/gpu/BUILD
-@@ -3469 +3468,0 @@ cc_library(
--        "@com_google_absl//absl/algorithm:container",
-@@ -3471 +3469,0 @@ cc_library(
--        "@com_google_absl//absl/log:check" """
+@@ -3468,0 +3469 @@ cc_library(
++        "@com_google_absl//absl/algorithm:container",
+@@ -3469,0 +3471 @@ cc_library(
++        "@com_google_absl//absl/log:check" """
         # Esempio di output atteso dal tuo codice
         expected_output = {
-            'third_party/xla/xla/service/gpu/BUILD': [3469, 3471]
+            'third_party/xla/xla/service/gpu/BUILD': LineRanges([(3469, 3469), (3471, 3471)])
         }
 
         # Esegui la funzione e verifica se l'output è corretto
@@ -175,7 +222,7 @@ index 67468fef9b5..00f1d5ebe98 100644
         changes_dict = generate_changes_dict(diff_output)
         self.assertEqual(changes_dict, expected_output)
 
-    @patch('src.main.args', recent=False)
+    @patch('src.main.args', new_callable=make_args, recent=False)
     def test_get_candidate_commits_with_changes_no_recent_flag(self, mock_args):
         blame_result = """
         f4529e80ab30a51207901b74b438980ac8b3ceaf 1 1 23
@@ -250,14 +297,14 @@ filename third_party/xla/xla/service/gpu/buffer_sharing.cc
         changes_dict = {'third_party/xla/xla/service/gpu/buffer_sharing.cc': [1, 35]}
 
         # Imposta args.recent a True (come se fosse passato il flag -r)
-        with patch('src.main.args', recent=True):
+        with patch('src.main.args', make_args(recent=True)):
             result = get_candidate_commits(blame_result, file_path, changes_dict)
 
         expected_result = {('85ac1c6ddc93d4f53ff5b2c5c1c7bac7a8a44030', 'Sergey Kozub')}
 
         self.assertEqual(result, expected_result)
 
-    @patch('src.main.args', recent=False or True)
+    @patch('src.main.args', new_callable=make_args, recent=False or True)
     def test_get_candidate_commits_no_changes(self, mock_args):
         blame_result = ""
         file_path = 'some/file/path'
@@ -268,7 +315,7 @@ filename third_party/xla/xla/service/gpu/buffer_sharing.cc
         commit_set = get_candidate_commits(blame_result, file_path, changes_dict)
         self.assertEqual(commit_set, expected_commits)
 
-    @patch('src.main.args', recent=False or True)
+    @patch('src.main.args', new_callable=make_args, recent=False or True)
     def test_get_candidate_commits_line_not_in_changes_dict(self, mock_args):
         blame_result = """
         f4529e80ab30a51207901b74b438980ac8b3ceaf 1 1 23
@@ -306,7 +353,7 @@ filename third_party/xla/xla/service/gpu/buffer_sharing.cc
         commit_set = get_candidate_commits(blame_result, file_path, changes_dict)
         self.assertEqual(commit_set, expected_commits)
 
-    @patch('src.main.args', recent=False or True)
+    @patch('src.main.args', new_callable=make_args, recent=False or True)
     def test_get_candidate_commits_partial_changes(self, mock_args):
         blame_result = """
         f4529e80ab30a51207901b74b438980ac8b3ceaf 1 1 23
@@ -344,6 +391,7 @@ filename third_party/xla/xla/service/gpu/buffer_sharing.cc
         commit_set = get_candidate_commits(blame_result, file_path, changes_dict)
         self.assertEqual(commit_set, expected_commits)
 
+    @patch('src.main.args', make_args())
     @patch('src.main.repo', autospec=True)
     @patch('src.main.get_candidate_commits',
            side_effect=[
@@ -360,6 +408,7 @@ filename third_party/xla/xla/service/gpu/buffer_sharing.cc
         expected_commits = {('commit1', 'author1'), ('commit2', 'author2')}
         self.assertEqual(result, expected_commits)
 
+    @patch('src.main.args', make_args())
     @patch('src.main.repo', autospec=True)
     @patch('src.main.get_candidate_commits',
            side_effect=[
@@ -376,6 +425,7 @@ filename third_party/xla/xla/service/gpu/buffer_sharing.cc
         expected_commits = {('commit1', 'author1')}
         self.assertEqual(result, expected_commits)
 
+    @patch('src.main.args', make_args())
     @patch('src.main.repo', autospec=True)
     @patch('src.main.get_candidate_commits',
            side_effect=[
@@ -392,18 +442,18 @@ filename third_party/xla/xla/service/gpu/buffer_sharing.cc
         expected_commits = set()
         self.assertEqual(result, expected_commits)
 
-    @patch('src.main.repo', autospec=True)
+    @patch('src.main.stream_git_diff', autospec=True)
     @patch('src.main.generate_changes_dict', autospec=True)
     @patch('src.main.get_all_candidate_commits', autospec=True)
     def test_search_candidate_commit_szz_with_parent_commit(self, mock_get_all_candidate_commits,
-                                                            mock_generate_changes_dict, mock_repo):
+                                                            mock_generate_changes_dict, mock_stream_git_diff):
         # Crea un mock per il bug_fix_commit
         bug_fix_commit = MagicMock()
         bug_fix_commit.parents = [MagicMock()]  # Assicurati che ci sia almeno un parent
 
         # Configura il comportamento desiderato per i mock
         mock_diff = MagicMock()
-        mock_repo.git.diff.return_value = mock_diff
+        mock_stream_git_diff.return_value = mock_diff
         mock_generate_changes_dict.return_value = {'file1': [1, 2, 3], 'file2': [4, 5]}
         mock_get_all_candidate_commits.return_value = {('commit1', 'author1'), ('commit2', 'author2')}
 
@@ -414,8 +464,7 @@ filename third_party/xla/xla/service/gpu/buffer_sharing.cc
         self.assertEqual(result, {('commit1', 'author1'), ('commit2', 'author2')})
 
         # Verifica le chiamate ai metodi
-        mock_repo.git.diff.assert_called_with(bug_fix_commit.hexsha, bug_fix_commit.parents[0].hexsha, '-U0',
-                                              '--histogram')
+        mock_stream_git_diff.assert_called_with(bug_fix_commit.hexsha, bug_fix_commit.parents[0].hexsha)
         mock_generate_changes_dict.assert_called_with(mock_diff)
         mock_get_all_candidate_commits.assert_called_with(bug_fix_commit.parents[0],
                                                           {'file1': [1, 2, 3], 'file2': [4, 5]})
@@ -491,6 +540,7 @@ filename third_party/xla/xla/service/gpu/buffer_sharing.cc
         # Verifica che l'output effettivo sia uguale all'output desiderato
         self.assertEqual(captured_output, expected_output)
 
+    @patch('src.main.args', make_args())
     @patch('src.main.get_bug_fix_commits_for_szz')
     @patch('src.main.search_candidate_commit_szz')
     @patch('src.main.print_candidate_commit')
@@ -501,8 +551,8 @@ filename third_party/xla/xla/service/gpu/buffer_sharing.cc
 
         szz()
 
-        # Verifica che get_bug_fix_commits_for_szz venga chiamato una volta
-        mock_get_bug_fix_commits.assert_called_once_with()
+        # Verifica che get_bug_fix_commits_for_szz venga chiamato una volta, su tutta la storia
+        mock_get_bug_fix_commits.assert_called_once_with(None)
 
         # Verifica che search_candidate_commit_szz venga chiamato 5 volte con i primi 5 commit di bug_fix_commits
         expected_calls = [call('commit1'), call('commit2'), call('commit3'), call('commit4'), call('commit5')]
@@ -565,82 +615,27 @@ filename third_party/xla/xla/service/gpu/buffer_sharing.cc
         # Verifica il risultato atteso
         self.assertTrue(result)  # Il commit1 è più recente di commit2
 
-    def test_extract_issue_number_found(self):
-        result = extract_issue_number("Fixes issue #42", r'(\d+)')
-        self.assertEqual(result, 42)
-
-    def test_extract_issue_number_not_found(self):
-        result = extract_issue_number("Fixes issue #", r'(\d+)')
-        self.assertIsNone(result)
-
-    def test_extract_issue_number_non_numeric(self):
-        result = extract_issue_number("Fixes issue non_numeric", r'(\d+)')
-        self.assertIsNone(result)
-
-    def test_extract_issue_number_invalid_match(self):
-        result = extract_issue_number("Fixes issue without a number", r'(\d+)')
-        self.assertIsNone(result)
-
-    def test_match_single_line_double_slash(self):
-        line = " // This is a comment"
-        result = match_comment(line)
-        self.assertIsNotNone(result, "Expected a comment, but got None.")
-
-    def test_match_multiline_single_quotes(self):
-        line = " '''This is a multiline\ncomment'''"
-        result = match_comment(line)
-        self.assertIsNotNone(result, "Expected a comment, but got None.")
-
-    def test_match_multiline_double_quotes(self):
-        line = ' """This is another\nmultiline comment"""'
-        result = match_comment(line)
-        self.assertIsNotNone(result, "Expected a comment, but got None.")
-
-    def test_match_comment_with_leading_spaces(self):
-        line = "   # Comment with leading spaces"
-        result = match_comment(line)
-        self.assertIsNotNone(result, "Expected a comment, but got None.")
-
-    def test_not_match_diff_output_line(self):
-        line = "+ This is an added line from diff output"
-        result = match_comment(line)
-        self.assertIsNone(result, "Expected None for diff output line, but got a result.")
-
-    def test_issue_pattern_found(self):
-        commit_message = "Fixed issue #123"
-        issue_pattern = re.compile(r'#(\d+)', re.IGNORECASE)
-        result = is_fix_contained(commit_message, issue_pattern)
-        self.assertTrue(result)
-
-    def test_issue_pattern_not_found(self):
-        commit_message = "This commit does not reference any issue."
-        issue_pattern = re.compile(r'#(\d+)', re.IGNORECASE)
-        result = is_fix_contained(commit_message, issue_pattern)
-        self.assertFalse(result)
+    def test_comment_lexer_single_line_double_slash(self):
+        # i file con estensione sconosciuta riconoscono tutte le sintassi dei commenti
+        code_flags = get_file_comment_lexer('file.unknown').code_lines([" // This is a comment"])
+        self.assertEqual(code_flags, [False], "Expected a comment, but got code.")
 
-    def test_non_string_input(self):
-        commit_message = None
-        issue_pattern = re.compile(r'#(\d+)', re.IGNORECASE)
-        result = is_fix_contained(commit_message, issue_pattern)
-        self.assertFalse(result)
+    def test_comment_lexer_single_quotes(self):
+        code_flags = get_file_comment_lexer('file.unknown').code_lines([" '''This is a multiline comment'''"])
+        self.assertEqual(code_flags, [False], "Expected a comment, but got code.")
 
-    def different_char_sensitive_matching(self):
-        commit_message = "Fixed Issue -123"
-        issue_pattern = re.compile(r'#(\d+)')
-        result = is_fix_contained(commit_message, issue_pattern)
-        self.assertFalse(result)
+    def test_comment_lexer_multiline_double_quotes(self):
+        # con delimitatori uguali si scartano solo le righe dei delimitatori, il testo resta da analizzare
+        code_flags = get_file_comment_lexer('file.unknown').code_lines([' """', 'multiline comment', '"""'])
+        self.assertEqual(code_flags, [False, True, False])
 
-    def test_case_insensitive_matching(self):
-        commit_message = "Fixed Issue #123"
-        issue_pattern = re.compile(r'issue #(\d+)', re.IGNORECASE)
-        result = is_fix_contained(commit_message, issue_pattern)
-        self.assertTrue(result)
+    def test_comment_lexer_with_leading_spaces(self):
+        code_flags = get_file_comment_lexer('file.unknown').code_lines(["   # Comment with leading spaces"])
+        self.assertEqual(code_flags, [False], "Expected a comment, but got code.")
 
-    def test_case_sensitive_matching(self):
-        commit_message = "fixed issue #123"
-        issue_pattern = re.compile(r'issue #(\d+)', re.IGNORECASE)
-        result = is_fix_contained(commit_message, issue_pattern)
-        self.assertTrue(result)
+    def test_comment_lexer_code_line(self):
+        code_flags = get_file_comment_lexer('file.unknown').code_lines(["This is an added line from diff output"])
+        self.assertEqual(code_flags, [True], "Expected code, but got a comment.")
 
     @patch('src.main.repo')
     def test_extract_commit_by_timestamp_scenario1(self, mock_repo):
@@ -746,13 +741,14 @@ filename third_party/xla/xla/service/gpu/buffer_sharing.cc
         # Verifica che i commit siano estratti correttamente
         self.assertEqual(result, [])
 
-    @patch('src.main.issue_data', [{"number": 1, "created_at": "2022-01-01T00:00:00Z"}])
+    @patch('src.main.args', make_args())
+    @patch('src.main.issue_data', IssueStore.from_records([{"number": 1, "created_at": "2022-01-01T00:00:00Z"}]))
     @patch('src.main.get_bug_fix_commits_szz_issue')
-    @patch('src.main.extract_issue_number')
+    @patch('src.main.issue_classifier')
     @patch('src.main.search_candidate_commit_szz')
     @patch('src.main.extract_commit_by_timestamp')
     @patch('src.main.print_candidate_commit')
-    def test_szz_issue_valid(self, mock_print, mock_extract_commit, mock_search_commit, mock_extract_issue, mock_get_commits):
+    def test_szz_issue_valid(self, mock_print, mock_extract_commit, mock_search_commit, mock_issue_classifier, mock_get_commits):
         # Configura dati di esempio
         mock_bug_fix_commit1 = MagicMock()
         mock_bug_fix_commit1.message = "Fixes #1"
@@ -764,7 +760,7 @@ filename third_party/xla/xla/service/gpu/buffer_sharing.cc
         mock_get_commits.return_value = mock_bug_fix_commits
 
         # Caso in cui l'issue è presente
-        mock_extract_issue.return_value = 1
+        mock_issue_classifier.classify.return_value = (True, [1])
         mock_search_commit.return_value = [('commit2', 'author2')]
 
         issue_opened_at = '2023-10-30T00:00:00Z'  # timestamp 1635552000
@@ -774,18 +770,19 @@ filename third_party/xla/xla/service/gpu/buffer_sharing.cc
 
         # Verifica che i metodi siano stati chiamati correttamente
         mock_get_commits.assert_called_once()
-        mock_extract_issue.assert_called_once()
+        mock_issue_classifier.classify.assert_called_once()
         mock_search_commit.assert_called_once()
         mock_extract_commit.assert_called_once()
         mock_print.assert_called_once()
 
-    @patch('src.main.issue_data', [])  # Lista vuota
+    @patch('src.main.args', make_args())
+    @patch('src.main.issue_data', IssueStore())  # Nessuna issue
     @patch('src.main.get_bug_fix_commits_szz_issue')
-    @patch('src.main.extract_issue_number')
+    @patch('src.main.issue_classifier')
     @patch('src.main.search_candidate_commit_szz')
     @patch('src.main.extract_commit_by_timestamp')
     @patch('src.main.print_candidate_commit')
-    def test_szz_issue_not_valid(self, mock_print, mock_extract_commit, mock_search_commit, mock_extract_issue, mock_get_commits):
+    def test_szz_issue_not_valid(self, mock_print, mock_extract_commit, mock_search_commit, mock_issue_classifier, mock_get_commits):
         # Configura dati di esempio
         mock_bug_fix_commit1 = MagicMock()
         mock_bug_fix_commit1.message = "Fixes #1"
@@ -797,18 +794,1401 @@ filename third_party/xla/xla/service/gpu/buffer_sharing.cc
         mock_get_commits.return_value = mock_bug_fix_commits
 
         # Caso in cui l'issue non è presente
-        mock_extract_issue.return_value = None
+        mock_issue_classifier.classify.return_value = (True, [])
 
         # Chiamata al metodo da testare
         szz_issue()
 
         # Verifica che i metodi siano stati chiamati correttamente
         mock_get_commits.assert_called_once()
-        mock_extract_issue.assert_called_once()
+        mock_issue_classifier.classify.assert_called_once()
         mock_search_commit.assert_not_called()  # Non dovrebbe essere chiamato senza un'issue valida
         mock_extract_commit.assert_not_called()  # Non dovrebbe essere chiamato senza un'issue valida
         mock_print.assert_called_once()
 
+    def test_parse_blame_output(self):
+        blame_result = """f4529e80ab30a51207901b74b438980ac8b3ceaf 1 1 1
+author Adrian Kuegel
+filename buffer_sharing.cc
+\t/* Copyright 2023 The TensorFlow Authors. All Rights Reserved.
+85ac1c6ddc93d4f53ff5b2c5c1c7bac7a8a44030 35 2 1
+author Sergey Kozub
+filename buffer_sharing.cc
+\t#include "xla/stream_executor/device_description.pb.h"
+"""
+        result = parse_blame_output(blame_result)
+
+        self.assertEqual(result, [(1, 'f4529e80ab30a51207901b74b438980ac8b3ceaf', 'Adrian Kuegel', None),
+                                  (2, '85ac1c6ddc93d4f53ff5b2c5c1c7bac7a8a44030', 'Sergey Kozub', None)])
+
+    def test_parse_blame_output_porcelain(self):
+        # con --porcelain le informazioni del commit sono riportate solo la prima volta che compare
+        blame_result = """f4529e80ab30a51207901b74b438980ac8b3ceaf 1 1 2
+author Adrian Kuegel
+author-mail <akuegel@google.com>
+committer-time 1695131394
+summary first commit
+filename buffer_sharing.cc
+	f4529e80ab30a51207901b74b438980ac8b3ceaf 9 9 9
+f4529e80ab30a51207901b74b438980ac8b3ceaf 2 2
+	author Somebody Else
+85ac1c6ddc93d4f53ff5b2c5c1c7bac7a8a44030 3 3 1
+author Sergey Kozub
+committer-time 1698139458
+previous 2cf8b1c62a98c859bbe2ae69160680eea6aae160 buffer_sharing.cc
+filename buffer_sharing.cc
+	
+"""
+        profiler = Profiler(enabled=True)
+
+        with patch('src.main.profiler', profiler):
+            result = parse_blame_output(blame_result)
+            changed_result = parse_blame_output(blame_result, LineRanges([(2, 3)]))
+
+        self.assertEqual(result, [(1, 'f4529e80ab30a51207901b74b438980ac8b3ceaf', 'Adrian Kuegel', 1695131394),
+                                  (2, 'f4529e80ab30a51207901b74b438980ac8b3ceaf', 'Adrian Kuegel', 1695131394),
+                                  (3, '85ac1c6ddc93d4f53ff5b2c5c1c7bac7a8a44030', 'Sergey Kozub', 1698139458)])
+        self.assertEqual(changed_result, result[1:])
+        self.assertEqual(profiler.counters, {'blame_lines_parsed': 6})
+
+    @patch('src.main.args', new_callable=make_args, recent=False)
+    def test_get_candidate_commits_with_parsed_blame(self, mock_args):
+        # il blame già analizzato (ad esempio proveniente dalla cache) viene filtrato come l'output testuale
+        blame_entries = [(1, 'commit1', 'author1', None), (2, 'commit2', 'author2', None)]
+        changes_dict = {'file1': [2]}
+
+        result = get_candidate_commits(blame_entries, 'file1', changes_dict)
+
+        self.assertEqual(result, {('commit2', 'author2')})
+
+    @patch('src.main.args', new_callable=make_args, recent=False)
+    def test_get_candidate_commits_with_line_ranges(self, mock_args):
+        blame_entries = [(1, 'commit1', 'author1', None), (50000, 'commit2', 'author2', None),
+                         (70000, 'commit3', 'author3', None)]
+        changes_dict = {'file1': LineRanges([(10, 60000)])}
+
+        result = get_candidate_commits(blame_entries, 'file1', changes_dict)
+
+        self.assertEqual(result, {('commit2', 'author2')})
+
+    def test_candidate_commit_keeps_date(self):
+        candidate_commit = CandidateCommit('commit1', 'author1', 1635724800)
+
+        # si comporta come la coppia (sha, autore) ma conserva la data letta dal blame
+        self.assertEqual(candidate_commit, ('commit1', 'author1'))
+        self.assertEqual({candidate_commit}, {('commit1', 'author1')})
+        self.assertEqual(candidate_commit.committed_date, 1635724800)
+        restored = pickle.loads(pickle.dumps(candidate_commit))
+        self.assertEqual(restored, candidate_commit)
+        self.assertEqual(restored.committed_date, 1635724800)
+
+    @patch('src.main.repo')
+    def test_recent_and_issue_filter_use_blame_dates(self, mock_repo):
+        blame_entries = [(1, 'commit1', 'author1', 1635544000), (2, 'commit2', 'author2', 1634336000),
+                         (3, 'commit3', 'author3', 1635900000)]
+        changes_dict = {'file1': [1, 2, 3]}
+
+        with patch('src.main.args', make_args(recent=True)):
+            recent_result = get_candidate_commits(blame_entries, 'file1', changes_dict)
+        with patch('src.main.args', make_args(recent=False)):
+            all_candidate_commits = get_candidate_commits(blame_entries, 'file1', changes_dict)
+        suspect_commits = extract_commit_by_timestamp(sorted(all_candidate_commits), 1635724800)
+
+        # le date arrivano dal blame, quindi nessun commit viene caricato dal repository
+        self.assertEqual(recent_result, {('commit3', 'author3')})
+        self.assertEqual(suspect_commits, [('commit1', 'author1'), ('commit2', 'author2')])
+        mock_repo.commit.assert_not_called()
+
+    def test_blame_cache_hit_and_miss(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache = BlameCache(os.path.join(tmp_dir, 'cache.sqlite'))
+
+            self.assertEqual(cache.get('rev1', 'file1', LineRanges([(1, 1)])),
+                             (LineRanges(), [], LineRanges([(1, 1)])))
+            cache.put('rev1', 'file1', LineRanges([(1, 1)]), [(1, 'commit1', 'author1')])
+            result = cache.get('rev1', 'file1', LineRanges([(1, 1)]))
+            cache.close()
+
+        self.assertEqual(result, (LineRanges([(1, 1)]), [(1, 'commit1', 'author1')], LineRanges()))
+        self.assertEqual(cache.hits, 1)
+        self.assertEqual(cache.misses, 1)
+
+    def test_blame_cache_partial_hit(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache = BlameCache(os.path.join(tmp_dir, 'cache.sqlite'))
+            cache.put('rev1', 'file1', LineRanges([(1, 5)]), [(1, 'commit1', 'author1')])
+            # le righe 6-8 non sono mai state analizzate, quindi vanno richieste a git
+            result = cache.get('rev1', 'file1', LineRanges([(4, 8)]))
+            cache.close()
+
+        self.assertEqual(result, (LineRanges([(1, 5)]), [(1, 'commit1', 'author1')], LineRanges([(6, 8)])))
+        self.assertEqual(cache.misses, 1)
+
+    def test_blame_cache_persistent(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db_path = os.path.join(tmp_dir, 'cache.sqlite')
+            cache = BlameCache(db_path)
+            cache.put('rev1', 'file1', LineRanges([(1, 1)]), [(1, 'commit1', 'author1')])
+            cache.close()
+
+            # una nuova esecuzione ritrova i risultati salvati dalla precedente
+            cache = BlameCache(db_path)
+            result = cache.get('rev1', 'file1', LineRanges([(1, 1)]))
+            cache.close()
+
+        self.assertEqual(result[1], [(1, 'commit1', 'author1')])
+
+    @patch('src.main.time.time', side_effect=itertools.count())
+    def test_blame_cache_lru_eviction(self, mock_time):
+        line_ranges = LineRanges([(1, 1)])
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache = BlameCache(os.path.join(tmp_dir, 'cache.sqlite'), max_entries=2)
+            cache.put('rev1', 'file1', line_ranges, [(1, 'commit1', 'author1')])
+            cache.put('rev2', 'file2', line_ranges, [(1, 'commit2', 'author2')])
+            # l'accesso rende rev1 la voce usata più di recente, quindi viene rimossa rev2
+            cache.get('rev1', 'file1', line_ranges)
+            cache.put('rev3', 'file3', line_ranges, [(1, 'commit3', 'author3')])
+
+            self.assertFalse(cache.get('rev1', 'file1', line_ranges)[2])
+            self.assertTrue(cache.get('rev2', 'file2', line_ranges)[2])
+            self.assertFalse(cache.get('rev3', 'file3', line_ranges)[2])
+            cache.close()
+
+    def test_line_ranges_merge(self):
+        self.assertEqual(LineRanges.from_lines([7, 1, 2, 3, 5, 6, 3]).ranges(), [(1, 3), (5, 7)])
+        self.assertEqual(LineRanges([(10, 12), (1, 4), (3, 6), (5, 4)]).ranges(), [(1, 6), (10, 12)])
+        self.assertEqual(LineRanges().ranges(), [])
+
+    def test_line_ranges_contains(self):
+        line_ranges = LineRanges([(3, 5), (10, 10), (20, 100000)])
+
+        self.assertIn(3, line_ranges)
+        self.assertIn(10, line_ranges)
+        self.assertIn(5000, line_ranges)
+        self.assertNotIn(2, line_ranges)
+        self.assertNotIn(6, line_ranges)
+        self.assertNotIn(100001, line_ranges)
+
+    def test_line_ranges_lines(self):
+        line_ranges = LineRanges([(3, 5), (10, 10)])
+
+        self.assertEqual(list(line_ranges), [3, 4, 5, 10])
+        self.assertEqual(len(line_ranges), 4)
+        self.assertEqual(line_ranges.blame_options(), ['-L3,5', '-L10,10'])
+        self.assertFalse(LineRanges())
+
+    def test_line_ranges_union(self):
+        result = LineRanges([(1, 3), (10, 12)]).union(LineRanges([(4, 5), (11, 20)]))
+
+        self.assertEqual(result.ranges(), [(1, 5), (10, 20)])
+
+    def test_line_ranges_difference(self):
+        line_ranges = LineRanges([(1, 10), (20, 30)])
+
+        self.assertEqual(line_ranges.difference(LineRanges([(3, 4), (8, 22)])).ranges(), [(1, 2), (5, 7), (23, 30)])
+        self.assertEqual(line_ranges.difference(line_ranges).ranges(), [])
+        self.assertEqual(line_ranges.difference(LineRanges()).ranges(), [(1, 10), (20, 30)])
+
+    def test_line_ranges_truncate(self):
+        self.assertEqual(LineRanges([(3, 8), (10, 10)]).truncate(5).ranges(), [(3, 5)])
+
+    @patch('src.main.repo', autospec=True)
+    def test_blame_line_ranges(self, mock_repo):
+        mock_repo.git.blame.return_value = 'blame'
+
+        result = blame_line_ranges('rev', 'file1', LineRanges([(1, 3), (10, 10)]))
+
+        self.assertEqual(result, 'blame')
+        mock_repo.git.blame.assert_called_once_with('rev', '-L1,3', '-L10,10', '--porcelain', '--', 'file1')
+
+    @patch('src.main.repo', autospec=True)
+    def test_blame_line_ranges_beyond_end_of_file(self, mock_repo):
+        error = git.GitCommandError('git blame', 128, 'fatal: file file1 has only 5 lines')
+        mock_repo.git.blame.side_effect = [error, 'blame']
+
+        result = blame_line_ranges('rev', 'file1', LineRanges([(3, 8), (10, 10)]))
+
+        # gli intervalli vengono troncati alla lunghezza del file
+        self.assertEqual(result, 'blame')
+        mock_repo.git.blame.assert_called_with('rev', '-L3,5', '--porcelain', '--', 'file1')
+
+    @patch('src.main.repo', autospec=True)
+    def test_blame_line_ranges_all_beyond_end_of_file(self, mock_repo):
+        error = git.GitCommandError('git blame', 128, 'fatal: file file1 has only 5 lines')
+        mock_repo.git.blame.side_effect = [error]
+
+        result = blame_line_ranges('rev', 'file1', LineRanges([(10, 12)]))
+
+        self.assertEqual(result, '')
+
+    @patch('src.main.args', new_callable=make_args, recent=False)
+    @patch('src.main.repo', autospec=True)
+    def test_get_all_candidate_commits_with_blame_cache(self, mock_repo, mock_args):
+        blame_result = """85ac1c6ddc93d4f53ff5b2c5c1c7bac7a8a44030 1 1 1
+author Sergey Kozub
+filename file1
+\tline
+"""
+        mock_repo.git.blame.return_value = blame_result
+        parent_commit = MagicMock(hexsha='parent')
+        changes_dict = {'file1': [1]}
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache = BlameCache(os.path.join(tmp_dir, 'cache.sqlite'))
+            with patch('src.main.blame_cache', cache):
+                first = get_all_candidate_commits(parent_commit, changes_dict)
+                second = get_all_candidate_commits(parent_commit, changes_dict)
+            cache.close()
+
+        expected_commits = {('85ac1c6ddc93d4f53ff5b2c5c1c7bac7a8a44030', 'Sergey Kozub')}
+        self.assertEqual(first, expected_commits)
+        self.assertEqual(second, expected_commits)
+        # la seconda analisi non invoca git blame
+        mock_repo.git.blame.assert_called_once_with('parent', '-L1,1', '--porcelain', '--', 'file1')
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    @patch('src.main.args', new_callable=make_args, jobs=4)
+    def test_get_jobs(self, mock_args):
+        self.assertEqual(get_jobs(), 4)
+
+    @patch('src.main.args', make_args())
+    def test_get_jobs_default(self):
+        self.assertEqual(get_jobs(), 1)
+
+    @patch('src.main.args', new_callable=make_args, jobs=1)
+    @patch('src.main.search_candidate_commit_szz', side_effect=lambda commit: {(commit, 'author')})
+    def test_search_candidate_commits_sequential(self, mock_search, mock_args):
+        result = list(search_candidate_commits(['commit1', 'commit2']))
+
+        self.assertEqual(result, [{('commit1', 'author')}, {('commit2', 'author')}])
+
+    @patch('src.main.args', new_callable=make_args, jobs=2)
+    @patch('src.main.repo', autospec=True)
+    @patch('src.main.ProcessPoolExecutor')
+    def test_search_candidate_commits_parallel(self, mock_executor_class, mock_repo, mock_args):
+        # l'esecutore restituisce i risultati nell'ordine di invio degli sha
+        mock_executor = mock_executor_class.return_value.__enter__.return_value
+        worker_stats = {'blame_cache_hits': 0, 'blame_cache_misses': 0, 'profile': None, 'prune': None}
+        mock_executor.submit.side_effect = lambda function, sha: MagicMock(**{'result.return_value': (
+            {(sha, 'author')}, worker_stats)})
+        bug_fix_commits = [MagicMock(hexsha='sha1'), MagicMock(hexsha='sha2')]
+
+        result = list(search_candidate_commits(bug_fix_commits))
+
+        self.assertEqual(result, [{('sha1', 'author')}, {('sha2', 'author')}])
+        self.assertEqual(mock_executor_class.call_args.kwargs['max_workers'], 2)
+
+    @patch('src.main.args', new_callable=make_args, jobs=2)
+    @patch('src.main.repo', autospec=True)
+    @patch('src.main.ProcessPoolExecutor')
+    def test_search_candidate_commits_parallel_window(self, mock_executor_class, mock_repo, mock_args):
+        # i commit vengono letti solo man mano che i risultati precedenti sono restituiti
+        mock_executor = mock_executor_class.return_value.__enter__.return_value
+        worker_stats = {'blame_cache_hits': 0, 'blame_cache_misses': 0, 'profile': None, 'prune': None}
+        mock_executor.submit.side_effect = lambda function, sha: MagicMock(**{'result.return_value': (
+            {(sha, 'author')}, worker_stats)})
+        bug_fix_commits = (MagicMock(hexsha=f'sha{index}') for index in itertools.count())
+
+        result = list(itertools.islice(search_candidate_commits(bug_fix_commits), 3))
+
+        self.assertEqual(result, [{('sha0', 'author')}, {('sha1', 'author')}, {('sha2', 'author')}])
+        self.assertEqual(mock_executor.submit.call_count, 10)
+
+    @patch('src.main.args', make_args())
+    @patch('src.main.search_candidate_commit_szz')
+    @patch('src.main.print_candidate_commit')
+    def test_szz_streams_bug_fix_commits(self, mock_print, mock_search):
+        # la ricerca dei commit bug fix è consumata solo per i commit analizzati
+        bug_fix_commits = (f'commit{index}' for index in itertools.count())
+        mock_search.side_effect = lambda commit: {(commit + '_candidate', 'author')}
+
+        with patch('src.main.get_bug_fix_commits_for_szz', return_value=bug_fix_commits):
+            szz()
+
+        self.assertEqual(next(bug_fix_commits), 'commit5')
+        self.assertEqual(list(mock_print.call_args.args[0]), [f'commit{index}' for index in range(5)])
+
+    def test_parse_issue_timestamp(self):
+        self.assertEqual(parse_issue_timestamp('2021-11-01T00:00:00Z'), 1635724800)
+
+    def test_issue_store_from_records(self):
+        issue_store = IssueStore.from_records([{"number": "1", "created_at": "2021-11-01T00:00:00Z"},
+                                               {"number": 2, "created_at": "2021-11-02T00:00:00Z"}])
+
+        self.assertEqual(len(issue_store), 2)
+        self.assertEqual(issue_store.get(1), 1635724800)
+        self.assertEqual(issue_store.get(2), 1635811200)
+        self.assertIsNone(issue_store.get(3))
+        self.assertNotIn(None, issue_store)
+
+    def test_issue_store_load_json_array(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            issue_path = os.path.join(tmp_dir, 'issues.json')
+            with open(issue_path, 'w') as issue_file:
+                issue_file.write('  [{"number": 1, "created_at": "2021-11-01T00:00:00Z", "title": "a"},\n'
+                                 ' {"number": 2, "created_at": "2021-11-02T00:00:00Z", "title": "b"}]\n')
+            issue_store = IssueStore.load(issue_path)
+
+        self.assertEqual(issue_store.opened_at, {1: 1635724800, 2: 1635811200})
+
+    def test_issue_store_load_json_lines(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            issue_path = os.path.join(tmp_dir, 'issues.jsonl')
+            with open(issue_path, 'w') as issue_file:
+                issue_file.write('{"number": 1, "created_at": "2021-11-01T00:00:00Z"}\n\n'
+                                 '{"number": 2, "created_at": "2021-11-02T00:00:00Z"}\n')
+            issue_store = IssueStore.load(issue_path)
+
+        self.assertEqual(issue_store.opened_at, {1: 1635724800, 2: 1635811200})
+
+    def test_iter_json_array_small_chunks(self):
+        # con blocchi di lettura piccoli gli elementi arrivano spezzati e devono essere ricomposti
+        issue_file = io.StringIO('[{"number": 12, "body": "a, ]"}, 345, {"number": 6}]')
+
+        result = list(iter_json_array(issue_file, chunk_size=3))
+
+        self.assertEqual(result, [{"number": 12, "body": "a, ]"}, 345, {"number": 6}])
+
+    def test_iter_json_array_empty(self):
+        self.assertEqual(list(iter_json_array(io.StringIO(' [ ] '))), [])
+
+    def test_iter_json_array_not_an_array(self):
+        with self.assertRaises(json.JSONDecodeError):
+            list(iter_json_array(io.StringIO('{"number": 1}')))
+
+    def test_iter_json_array_truncated(self):
+        with self.assertRaises(json.JSONDecodeError):
+            list(iter_json_array(io.StringIO('[{"number": 1}, {"numb')))
+
+    @patch('src.main.repo')
+    def test_extract_commit_by_timestamp_with_epoch(self, mock_repo):
+        # la data dell'issue già convertita dall'IssueStore viene usata direttamente
+        mock_commit1 = MagicMock()
+        mock_commit1.committed_date = 1635724799
+        mock_commit1.author.name = 'author1'
+        mock_repo.commit.side_effect = [mock_commit1]
+
+        result = extract_commit_by_timestamp([('commit1', 'author1')], 1635724800)
+
+        self.assertEqual(result, [('commit1', 'author1')])
+
+    @patch('src.main.repo')
+    def test_commit_is_more_recent_with_candidate_commits(self, mock_repo):
+        result = commit_is_more_recent(CandidateCommit('hash1', 'author1', 1647878400),
+                                       CandidateCommit('hash2', 'author2', 1638260400))
+
+        # le date arrivano dal blame, senza caricare i commit dal repository
+        self.assertTrue(result)
+        mock_repo.commit.assert_not_called()
+
+    def test_commit_metadata_add(self):
+        commit_metadata = CommitMetadata()
+        commit_metadata.add('sha1', 1635724800, 'author1')
+        commit_metadata.add('sha2', 1635724801, 'author2')
+        commit_metadata.add('sha3', 1635724802, 'author1')
+
+        self.assertEqual(len(commit_metadata), 3)
+        self.assertEqual(commit_metadata.committed_date('sha2'), 1635724801)
+        self.assertEqual(commit_metadata.author('sha3'), 'author1')
+        self.assertIsNone(commit_metadata.committed_date('sha4'))
+        # gli autori ripetuti vengono memorizzati una sola volta
+        self.assertEqual(commit_metadata.authors, ['author1', 'author2'])
+
+    def test_commit_metadata_build(self):
+        mock_repo = MagicMock()
+        mock_repo.git.log.return_value.stdout = [b'sha1\x001635724800\x00Adrian Kuegel\n',
+                                                 b'sha2\x001635724801\x00Sergey Kozub\n']
+
+        commit_metadata = CommitMetadata.build(mock_repo)
+
+        mock_repo.git.log.assert_called_once_with('HEAD', '--format=%H%x00%ct%x00%an', as_process=True)
+        self.assertEqual(commit_metadata.committed_date('sha1'), 1635724800)
+        self.assertEqual(commit_metadata.author('sha2'), 'Sergey Kozub')
+
+    @patch('src.main.commit_lookups', 0)
+    @patch('src.main.commit_metadata', None)
+    @patch('src.main.COMMIT_METADATA_LOOKUP_THRESHOLD', 2)
+    @patch('src.main.repo')
+    def test_extract_commit_by_timestamp_builds_commit_metadata(self, mock_repo):
+        mock_commit = MagicMock()
+        mock_commit.committed_date = 1635724801
+        mock_commit.author.name = 'author1'
+        mock_repo.commit.return_value = mock_commit
+        mock_repo.git.log.return_value.stdout = [b'commit3\x001635724799\x00author3\n',
+                                                 b'commit4\x001635724802\x00author4\n']
+
+        result = extract_commit_by_timestamp([('commit1', 'author1'), ('commit2', 'author2'),
+                                              ('commit3', 'author3'), ('commit4', 'author4')], 1635724800)
+
+        # superata la soglia, le date arrivano dalla tabella costruita con un solo git log
+        self.assertEqual(result, [('commit3', 'author3')])
+        self.assertEqual(mock_repo.commit.call_count, 2)
+        mock_repo.git.log.assert_called_once()
+
+    def test_regex_to_git_ere_translatable(self):
+        self.assertEqual(regex_to_git_ere(r'#(\d+)'), '#([0-9]+)')
+        self.assertEqual(regex_to_git_ere(r'fix(es|ed)?\s+#\d+?'), 'fix(es|ed)?[[:space:]]+#[0-9]+')
+        self.assertEqual(regex_to_git_ere(r'[\w-]+\.c'), '[[:alnum:]_-]+\\.c')
+        self.assertEqual(regex_to_git_ere(r'[^\d]{2,}'), '[^0-9]{2,}')
+        # maiuscole e minuscole sono ignorate sia da git sia da BugFixClassifier
+        self.assertEqual(regex_to_git_ere(r'JIRA-(\d+)'), 'JIRA-([0-9]+)')
+
+    def test_regex_to_git_ere_not_translatable(self):
+        # ancore, gruppi speciali, escape sconosciuti e lettere maiuscole ricadono sul filtro in Python
+        self.assertIsNone(regex_to_git_ere(r'^fix'))
+        self.assertIsNone(regex_to_git_ere(r'(?:fix)'))
+        self.assertIsNone(regex_to_git_ere(r'\bfix\b'))
+        self.assertIsNone(regex_to_git_ere(r'[abc'))
+
+    @patch('src.main.repo')
+    def test_iter_git_log_commits(self, mock_repo):
+        mock_process = mock_repo.git.log.return_value
+        output = (b'f4529e80ab30a51207901b74b438980ac8b3ceaf\nFixed bug #2\n\0'
+                  b'85ac1c6ddc93d4f53ff5b2c5c1c7bac7a8a44030\nbug fix\n\nfor #1\n\0')
+        mock_process.stdout.read.side_effect = [output[:50], output[50:], b'']
+
+        result = list(iter_git_log_commits('-i', '--grep=fix'))
+
+        mock_repo.git.log.assert_called_once_with('-z', '--format=%H%n%B', '-i', '--grep=fix', as_process=True)
+        self.assertEqual([commit.hexsha for commit in result], ['f4529e80ab30a51207901b74b438980ac8b3ceaf',
+                                                                '85ac1c6ddc93d4f53ff5b2c5c1c7bac7a8a44030'])
+        self.assertEqual([commit.message for commit in result], ['Fixed bug #2\n', 'bug fix\n\nfor #1\n'])
+
+    @patch('src.main.args', new_callable=make_args, discovery='git')
+    @patch('src.main.repo', autospec=True)
+    @patch('src.main.iter_git_log_commits', return_value=iter(['commit1']))
+    def test_get_bug_fix_commits_for_szz_git_discovery(self, mock_iter_git_log_commits, mock_repo, mock_args):
+        result = list(get_bug_fix_commits_for_szz())
+
+        self.assertEqual(result, ['commit1'])
+        mock_iter_git_log_commits.assert_called_once_with('-i', '--all-match', '--grep=bug', '--grep=fix', rev=None)
+        mock_repo.iter_commits.assert_not_called()
+
+    @patch('src.main.args', new_callable=make_args, discovery='git')
+    @patch('src.main.issue_classifier', BugFixClassifier([r'#(\d+)']))
+    @patch('src.main.repo', autospec=True)
+    @patch('src.main.iter_git_log_commits', return_value=iter(['commit1']))
+    def test_get_bug_fix_commits_szz_issue_git_discovery(self, mock_iter_git_log_commits, mock_repo, mock_args):
+        result = list(get_bug_fix_commits_szz_issue())
+
+        self.assertEqual(result, ['commit1'])
+        mock_iter_git_log_commits.assert_called_once_with('-E', '-i', '--grep=#([0-9]+)', rev=None)
+
+    @patch('src.main.args', new_callable=make_args, discovery='git')
+    @patch('src.main.issue_classifier', BugFixClassifier([r'^#(\d+)']))
+    @patch('src.main.repo', autospec=True)
+    @patch('src.main.iter_git_log_commits')
+    def test_get_bug_fix_commits_szz_issue_git_discovery_fallback(self, mock_iter_git_log_commits, mock_repo,
+                                                                  mock_args):
+        # il pattern ancorato non è esprimibile in git, quindi i messaggi vengono filtrati in Python
+        mock_commits = [MagicMock(message="#12 fixed"), MagicMock(message="see #12")]
+        mock_repo.iter_commits.return_value = mock_commits
+
+        result = list(get_bug_fix_commits_szz_issue())
+
+        self.assertEqual(result, [mock_commits[0]])
+        mock_iter_git_log_commits.assert_not_called()
+
+    def test_iter_diff_changes(self):
+        diff_lines = [
+            'diff --git a/file1.py b/file1.py',
+            '--- a/file1.py',
+            '+++ b/file1.py',
+            '@@ -3,2 +3,2 @@ def main():',
+            '-    a = 1',
+            '-    a = 2',
+            '+    a = 3',
+            # una riga di contenuto che assomiglia a un'intestazione non cambia il file corrente
+            '+++ b/other.py',
+            '@@ -10,0 +10 @@',
+            '+    b = 3',
+            '\\ No newline at end of file',
+            'diff --git a/file2.py b/file2.py',
+            '--- a/file2.py',
+            '+++ b/file2.py',
+            '@@ -7 +7 @@',
+            '-x',
+            '+y',
+        ]
+
+        result = list(iter_diff_changes(diff_lines))
+
+        self.assertEqual(result, [('file1.py', [(3, 4), (10, 10)]), ('file2.py', [(7, 7)])])
+
+    def test_iter_diff_changes_deleted_file(self):
+        # un file che non esiste nel commit parent non viene attribuito al file precedente
+        diff_lines = [
+            '+++ b/file1.py',
+            '@@ -1 +1 @@',
+            '-a',
+            '+b',
+            '+++ /dev/null',
+            '@@ -1,2 +0,0 @@',
+            '-c',
+            '-d',
+        ]
+
+        result = list(iter_diff_changes(diff_lines))
+
+        self.assertEqual(result, [('file1.py', [(1, 1)])])
+
+    def test_iter_diff_changes_skips_comment_and_blank_lines(self):
+        # nel diff 'commit parent' il contenuto delle righe analizzate dal blame è quello delle righe '+'
+        diff_lines = [
+            '+++ b/file1.py',
+            # l'intestazione termina con un delimitatore di commento, ma le righe del parent contengono codice
+            '@@ -3,4 +3,4 @@ def main():  """',
+            '-    # commento nel bug fix',
+            '-    a = 1',
+            '-    b = 2',
+            '-    c = 3',
+            '+    # commento',
+            '+    a = 1',
+            '+',
+            '+    b = 2  # commento',
+            '+++ b/file2.c',
+            # i due lati dell'hunk iniziano da righe diverse: si usano i numeri di riga del parent
+            '@@ -10,3 +14,3 @@',
+            '-int x;',
+            '-int y;',
+            '-int z;',
+            '+/* inizio',
+            '+   fine */',
+            '+int x;',
+        ]
+
+        result = list(iter_diff_changes(diff_lines))
+
+        self.assertEqual(result, [('file1.py', [(4, 4), (6, 6)]), ('file2.c', [(16, 16)])])
+
+    def test_iter_diff_changes_comment_replaced_in_place(self):
+        diff_lines = [
+            '+++ b/file1.py',
+            # il bug fix sostituisce il codice con un commento: la riga del parent è codice e va analizzata
+            '@@ -5 +5 @@',
+            '-# removed the division by zero',
+            '+x = 1 / 0',
+            # il bug fix sostituisce un commento con il codice: la riga del parent è un commento e viene scartata
+            '@@ -8 +8 @@',
+            '-y = 2',
+            '+# old comment',
+            # le righe rimosse dal bug fix sono solo nel parent: si analizzano quelle di codice
+            '@@ -20,0 +30,2 @@',
+            '+# other comment',
+            '+z = 3',
+            # le righe aggiunte dal bug fix non esistono nel parent
+            '@@ -40,2 +49,0 @@',
+            '-w = 4',
+            '-v = 5',
+        ]
+
+        result = list(iter_diff_changes(diff_lines))
+
+        self.assertEqual(result, [('file1.py', [(5, 5), (31, 31)])])
+
+    @patch('src.main.args', make_args())
+    def test_search_candidate_commit_szz_comment_sides(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            test_repo = create_test_repository(tmp_dir, ['x = 1 / 0\n# note\n',
+                                                         '# removed the division by zero\n# note\n',
+                                                         '# removed the division by zero\nb = 1\n'])
+            commits = list(test_repo.iter_commits())
+            with patch('src.main.repo', test_repo):
+                code_replaced = search_candidate_commit_szz(commits[1])
+                comment_replaced = search_candidate_commit_szz(commits[0])
+            test_repo.close()
+
+        self.assertEqual(code_replaced, {(commits[2].hexsha, 'Test Author')})
+        self.assertEqual(comment_replaced, set())
+
+    @patch('src.main.args', make_args())
+    def test_search_candidate_commit_szz_deleted_comments(self):
+        # il bug fix elimina le righe di commento 3-4 del parent e modifica la riga 6: i due lati degli hunk iniziano
+        # da righe diverse, ma la riga di codice viene comunque analizzata
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            test_repo = create_test_repository(tmp_dir, [
+                'a = 1\nb = 2\n# comment 1\n# comment 2\nc = 3\nd = buggy()\ne = 5\n',
+                'a = 1\nb = 2\nc = 3\nd = fixed()\ne = 5\n'])
+            commits = list(test_repo.iter_commits())
+            with patch('src.main.repo', test_repo):
+                changes_dict = GitCliBackend().get_changes(commits[0].hexsha, commits[1].hexsha)
+                candidate_commits = search_candidate_commit_szz(commits[0])
+            test_repo.close()
+
+        self.assertEqual(changes_dict, {'file1.py': LineRanges([(6, 6)])})
+        self.assertEqual(candidate_commits, {(commits[1].hexsha, 'Test Author')})
+
+    @patch('src.main.args', make_args())
+    def test_search_candidate_commit_szz_shifted_comment(self):
+        # il bug fix aggiunge 5 righe in cima al file e riformula il commento alla riga 25 del parent, che nel bug fix
+        # è la riga 30: la riga 30 del parent è codice ma non è stata modificata
+        parent_lines = [f'x{line_number} = {line_number}\n' for line_number in range(1, 36)]
+        parent_lines[24] = '# old wording\n'
+        fix_lines = [f'y{line_number} = {line_number}\n' for line_number in range(1, 6)] + parent_lines
+        fix_lines[29] = '# new wording\n'
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            test_repo = create_test_repository(tmp_dir, [''.join(parent_lines), ''.join(fix_lines)])
+            commits = list(test_repo.iter_commits())
+            with patch('src.main.repo', test_repo):
+                changes_dict = GitCliBackend().get_changes(commits[0].hexsha, commits[1].hexsha)
+                candidate_commits = search_candidate_commit_szz(commits[0])
+            test_repo.close()
+
+        self.assertEqual(changes_dict, {})
+        self.assertEqual(candidate_commits, set())
+
+    def test_comment_lexer_by_extension(self):
+        python_lexer = get_file_comment_lexer('src/module.py')
+        c_lexer = get_file_comment_lexer('src/module.cc')
+
+        self.assertIs(python_lexer, get_file_comment_lexer('other/file.py'))
+        self.assertEqual(python_lexer.code_lines(['# a', '  ', 'x = 1', '"""docstring"""', '"""', '// x']),
+                         [False, False, True, False, False, True])
+        self.assertEqual(c_lexer.code_lines(['/* a', ' * b', ' */ int y;', '*p = 0;', '    * height;', '# define X']),
+                         [False, False, True, True, True, True])
+        self.assertEqual(c_lexer.code_lines(['/* a */ /* b */ // c', '/* a */ int x; /* b */']), [False, True])
+        self.assertEqual(get_file_comment_lexer('Makefile').code_lines(['# target', 'all:']), [False, True])
+        self.assertEqual(get_file_comment_lexer('file.unknown').code_lines(['<!-- a -->', '// b', 'c']),
+                         [False, False, True])
+
+    def test_generate_changes_dict_from_lines(self):
+        diff_lines = iter(['+++ b/file1.py', '@@ -5 +5,3 @@', '-d', '+a', '+b', '+c'])
+
+        self.assertEqual(generate_changes_dict(diff_lines), {'file1.py': LineRanges([(5, 7)])})
+
+    @patch('src.main.repo', autospec=True)
+    def test_stream_git_diff(self, mock_repo):
+        mock_repo.git.diff.return_value.stdout = iter([b'+++ b/file1.py\n', b'@@ -5 +5 @@\n'])
+
+        result = list(stream_git_diff('commit', 'parent'))
+
+        self.assertEqual(result, ['+++ b/file1.py', '@@ -5 +5 @@'])
+        mock_repo.git.diff.assert_called_once_with('commit', 'parent', '-U0', '--histogram', as_process=True)
+
+    @patch('src.main.args', new_callable=make_args, recent=False)
+    @patch('src.main.issue_classifier', BugFixClassifier([r'#(\d+)']))
+    def test_incremental_state_round_trip(self, mock_args):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            state_path = os.path.join(tmp_dir, 'state.json')
+            save_incremental_state(state_path, 'szz', 'head1', {'fix1': {('commit2', 'author2'),
+                                                                         ('commit1', 'author1')}})
+            result = load_incremental_state(state_path, 'szz')
+
+        self.assertEqual(result, ('head1', {'fix1': [('commit1', 'author1'), ('commit2', 'author2')]}))
+
+    @patch('src.main.issue_classifier', BugFixClassifier([r'#(\d+)']))
+    def test_incremental_state_different_options(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            state_path = os.path.join(tmp_dir, 'state.json')
+            with patch('src.main.args', make_args(recent=False)):
+                save_incremental_state(state_path, 'szz', 'head1', {'fix1': set()})
+            # i risultati ottenuti senza -r non sono validi per un'esecuzione con -r
+            with patch('src.main.args', make_args(recent=True)), patch('builtins.print'):
+                result = load_incremental_state(state_path, 'szz')
+
+        self.assertEqual(result, (None, {}))
+
+    def test_incremental_state_missing_file(self):
+        self.assertEqual(load_incremental_state('nonexistent_path', 'szz'), (None, {}))
+
+    @patch('src.main.repo')
+    def test_get_incremental_rev(self, mock_repo):
+        mock_repo.is_ancestor.return_value = True
+
+        self.assertEqual(get_incremental_rev('head1', 'head2'), 'head1..head2')
+        self.assertIsNone(get_incremental_rev(None, 'head2'))
+
+    @patch('builtins.print')
+    @patch('src.main.repo')
+    def test_get_incremental_rev_rewritten_history(self, mock_repo, mock_print):
+        mock_repo.is_ancestor.return_value = False
+
+        self.assertIsNone(get_incremental_rev('head1', 'head2'))
+
+    @patch('src.main.args', new_callable=make_args, recent=False)
+    @patch('src.main.repo')
+    @patch('src.main.get_bug_fix_commits_for_szz')
+    @patch('src.main.search_candidate_commit_szz')
+    @patch('src.main.print_candidate_commit')
+    def test_szz_incremental(self, mock_print, mock_search, mock_get_bug_fix_commits, mock_repo, mock_args):
+        mock_repo.head.commit.hexsha = 'head2'
+        mock_repo.is_ancestor.return_value = True
+        mock_get_bug_fix_commits.return_value = ['fix2']
+        mock_search.return_value = {('commit2', 'author2')}
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            state_path = os.path.join(tmp_dir, 'state.json')
+            mock_args.incremental = state_path
+            save_incremental_state(state_path, 'szz', 'head1', {'fix1': {('commit1', 'author1')}})
+
+            szz()
+            result = load_incremental_state(state_path, 'szz')
+
+        # vengono cercati solo i commit successivi all'HEAD già analizzato
+        mock_get_bug_fix_commits.assert_called_once_with('head1..head2')
+        mock_search.assert_called_once_with('fix2')
+        merged_results = {'fix2': {('commit2', 'author2')}, 'fix1': [('commit1', 'author1')]}
+        mock_print.assert_called_once_with(merged_results)
+        self.assertEqual(result, ('head2', {'fix2': [('commit2', 'author2')], 'fix1': [('commit1', 'author1')]}))
+
+    def test_git_process_pool_objects(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            test_repo = create_test_repository(tmp_dir, ['a\nb\n', 'a\nc\n'])
+            head = test_repo.head.commit
+            git_pool = GitProcessPool(test_repo.git_dir)
+
+            header = git_pool.object_header(f'{head.hexsha}:file1.py')
+            content = git_pool.read_object(f'{head.hexsha}:file1.py')
+            missing = git_pool.object_header('0' * 40)
+            commit_info = git_pool.commit_info(head.hexsha)
+            expected_parents = [head.parents[0].hexsha]
+            expected_committed_date = head.committed_date
+            git_pool.close()
+            test_repo.close()
+
+        self.assertEqual(header[1:], ('blob', 4))
+        self.assertEqual(content[1:], ('blob', b'a\nc\n'))
+        self.assertIsNone(missing)
+        self.assertEqual(commit_info.parents, expected_parents)
+        self.assertEqual(commit_info.author, 'Test Author')
+        self.assertEqual(commit_info.committed_date, expected_committed_date)
+        self.assertEqual(commit_info.message, 'commit 1')
+
+    def test_git_process_pool_diff_lines(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            test_repo = create_test_repository(tmp_dir, ['a\nb\nc\n', 'a\nB\nc\n', 'a\nB\n'])
+            commits = list(test_repo.iter_commits())
+            git_pool = GitProcessPool(test_repo.git_dir)
+
+            # lo stesso processo risponde a più richieste, anche se una non viene letta fino in fondo
+            first_diff = list(git_pool.diff_lines(commits[0].hexsha, commits[1].hexsha))
+            partial_diff = git_pool.diff_lines(commits[1].hexsha, commits[2].hexsha)
+            next(partial_diff)
+            partial_diff.close()
+            second_diff = list(git_pool.diff_lines(commits[1].hexsha, commits[2].hexsha))
+            git_pool.close()
+
+            expected_first_diff = test_repo.git.diff(commits[0].hexsha, commits[1].hexsha, '-U0',
+                                                     '--histogram').split('\n')
+            expected_second_diff = test_repo.git.diff(commits[1].hexsha, commits[2].hexsha, '-U0',
+                                                      '--histogram').split('\n')
+            test_repo.close()
+
+        self.assertEqual(first_diff, expected_first_diff)
+        self.assertEqual(second_diff, expected_second_diff)
+
+    @patch('src.main.repo', autospec=True)
+    def test_stream_git_diff_with_git_pool(self, mock_repo):
+        mock_git_pool = MagicMock()
+        mock_git_pool.diff_lines.return_value = iter(['+++ b/file1.py'])
+
+        with patch('src.main.git_pool', mock_git_pool):
+            result = list(stream_git_diff('commit', 'parent'))
+
+        self.assertEqual(result, ['+++ b/file1.py'])
+        mock_git_pool.diff_lines.assert_called_once_with('commit', 'parent')
+        mock_repo.git.diff.assert_not_called()
+
+    def test_profiler_disabled_collects_nothing(self):
+        profiler = Profiler()
+
+        with profiler.stage('blame'), profiler.fix_commit('sha1'):
+            profiler.count('blame_lines_parsed', 3)
+            profiler.count_subprocess('blame')
+            profiler.add_bytes_read('blame', 100)
+
+        self.assertEqual(profiler.take(), {'stages': {}, 'subprocesses': {}, 'counters': {},
+                                           'slowest_fix_commits': []})
+
+    def test_profiler_report(self):
+        profiler = Profiler(enabled=True)
+
+        with profiler.stage('blame'):
+            profiler.count_subprocess('blame')
+            profiler.add_bytes_read('blame', 100)
+        with profiler.stage('blame'):
+            profiler.count('blame_lines_parsed', 3)
+        with profiler.fix_commit('sha1'):
+            pass
+        report = profiler.report()
+
+        self.assertEqual(report['stages']['blame']['calls'], 2)
+        self.assertGreaterEqual(report['stages']['blame']['wall_time'], 0)
+        self.assertEqual(report['subprocesses'], {'blame': {'spawned': 1, 'bytes_read': 100}})
+        self.assertEqual(report['counters'], {'blame_lines_parsed': 3})
+        self.assertEqual([entry['commit'] for entry in report['slowest_fix_commits']], ['sha1'])
+
+    def test_profiler_merge_keeps_slowest_fix_commits(self):
+        profiler = Profiler(enabled=True)
+        worker_profiler = Profiler(enabled=True)
+        for number in range(15):
+            worker_profiler.add_fix_commit(f'sha{number}', number)
+        worker_profiler.count('blame_lines_matched', 2)
+        worker_profiler.add_bytes_read('blame', 10)
+        profiler.count('blame_lines_matched', 1)
+
+        profiler.merge(worker_profiler.take())
+        report = profiler.report()
+
+        self.assertEqual(report['counters'], {'blame_lines_matched': 3})
+        self.assertEqual(report['subprocesses'], {'blame': {'spawned': 0, 'bytes_read': 10}})
+        self.assertEqual([entry['commit'] for entry in report['slowest_fix_commits']],
+                         [f'sha{number}' for number in range(14, 4, -1)])
+        self.assertEqual(worker_profiler.take()['counters'], {})
+
+    @patch('src.main.args', new_callable=make_args)
+    def test_get_candidate_commits_counts_blame_lines(self, mock_args):
+        profiler = Profiler(enabled=True)
+        blame_result = [(1, 'sha1', 'author1', None), (2, 'sha2', 'author2', None), (3, 'sha3', 'author3', None)]
+
+        with patch('src.main.profiler', profiler):
+            get_candidate_commits(blame_result, 'file1.py', {'file1.py': LineRanges.from_lines([2, 3])})
+
+        # il blame già analizzato viene solo filtrato
+        self.assertEqual(profiler.counters, {'blame_lines_matched': 2})
+
+    def test_json_lines_sink(self):
+        output_file = io.StringIO()
+        sink = JsonLinesSink(output_file)
+
+        sink.write('fix1', {('sha2', 'author2'), ('sha1', 'author1')})
+        sink.write('fix2', [])
+
+        records = [json.loads(line) for line in output_file.getvalue().splitlines()]
+        self.assertEqual(records, [
+            {'bug_fix_commit': 'fix1', 'candidate_commits': [{'commit': 'sha1', 'author': 'author1'},
+                                                             {'commit': 'sha2', 'author': 'author2'}]},
+            {'bug_fix_commit': 'fix2', 'candidate_commits': []}])
+
+    def test_output_sink_is_abstract(self):
+        # un formato di output deve definire come scrivere ogni record
+        with self.assertRaises(TypeError):
+            OutputSink(io.StringIO())
+
+    def test_csv_sink(self):
+        output_file = io.StringIO()
+        sink = CsvSink(output_file)
+
+        sink.write('fix1', [('sha1', 'author, 1')])
+        sink.write('fix2', set())
+
+        self.assertEqual(output_file.getvalue().splitlines(), ['bug_fix_commit,candidate_commit,author',
+                                                               'fix1,sha1,"author, 1"', 'fix2,,'])
+
+    def test_open_output_sink_format(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            csv_sink = open_output_sink(os.path.join(tmp_dir, 'results.CSV'))
+            jsonl_sink = open_output_sink(os.path.join(tmp_dir, 'results.out'))
+            forced_sink = open_output_sink(os.path.join(tmp_dir, 'results.csv'), 'jsonl')
+            for sink in (csv_sink, jsonl_sink, forced_sink):
+                sink.close()
+
+        self.assertIsInstance(csv_sink, CsvSink)
+        self.assertIsInstance(jsonl_sink, JsonLinesSink)
+        self.assertIsInstance(forced_sink, JsonLinesSink)
+
+    @patch('src.main.args', make_args())
+    @patch('src.main.get_bug_fix_commits_for_szz')
+    @patch('src.main.search_candidate_commit_szz')
+    @patch('src.main.print_candidate_commit')
+    def test_szz_with_output_sink(self, mock_print, mock_search, mock_get_bug_fix_commits):
+        mock_get_bug_fix_commits.return_value = ['commit1', 'commit2']
+        mock_sink = MagicMock()
+        written = []
+        # al momento di ogni scrittura l'analisi del commit successivo non deve essere ancora iniziata
+        mock_sink.write.side_effect = lambda sha, candidates: written.append((sha, mock_search.call_count))
+        mock_search.side_effect = lambda commit: {(commit + '_candidate', 'author')}
+
+        with patch('src.main.output_sink', mock_sink):
+            szz()
+
+        self.assertEqual(written, [('commit1', 1), ('commit2', 2)])
+        mock_print.assert_not_called()
+
+    def test_get_blame_concurrency(self):
+        with patch('src.main.args', make_args()):
+            self.assertEqual(get_blame_concurrency(), 1)
+        with patch('src.main.args', make_args(blame_concurrency=4)):
+            self.assertEqual(get_blame_concurrency(), 4)
+        with patch('src.main.args', make_args(blame_concurrency=0)):
+            self.assertEqual(get_blame_concurrency(), 1)
+
+    def test_get_all_candidate_commits_concurrent_blame(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            test_repo = create_test_repository(tmp_dir, ['a\nb\nc\n', 'a\nB\nc\nd\n'])
+            with open(os.path.join(tmp_dir, 'file2.py'), 'w') as test_file:
+                test_file.write('x\ny\n')
+            test_repo.index.add(['file2.py'])
+            test_repo.index.commit('add file2')
+            head = test_repo.head.commit
+            # le righe oltre la fine di file2.py vengono scartate come nel blame sequenziale
+            changes_dict = {'file1.py': LineRanges([(1, 4)]), 'file2.py': LineRanges([(2, 5)])}
+
+            with patch('src.main.repo', test_repo), patch('src.main.args', make_args()) as mock_args:
+                mock_args.blame_concurrency = 1
+                sequential = get_all_candidate_commits(head, changes_dict)
+                mock_args.blame_concurrency = 2
+                concurrent = get_all_candidate_commits(head, changes_dict)
+            test_repo.close()
+
+        self.assertEqual(concurrent, sequential)
+        self.assertEqual(len(concurrent), 3)
+
+    def test_open_repository_bare_mirror(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            work_path = os.path.join(tmp_dir, 'work')
+            mirror_path = os.path.join(tmp_dir, 'mirror.git')
+            test_repo = create_test_repository(work_path, ['a\nb\nc\n', 'a\nB\nc\nd\n'])
+            git.Repo.clone_from(work_path, mirror_path, mirror=True).close()
+            changes_dict = {'file1.py': LineRanges([(1, 3)])}
+
+            results = []
+            # la copia di lavoro, la sua cartella .git e il mirror bare danno gli stessi commit candidati
+            for path in (work_path, test_repo.git_dir, mirror_path):
+                repository = open_repository(path)
+                head = repository.head.commit
+                with patch('src.main.repo', repository), patch('src.main.args', make_args()) as mock_args:
+                    mock_args.blame_concurrency = 1
+                    results.append(get_all_candidate_commits(head, changes_dict))
+                    mock_args.blame_concurrency = 2
+                    results.append(get_all_candidate_commits(head, changes_dict))
+                    diff_lines = list(stream_git_diff(head.hexsha, head.parents[0].hexsha))
+                    results.append(generate_changes_dict(diff_lines))
+                environment = repository.git.environment()
+                repository.close()
+            with git.Repo(mirror_path) as mirror_repo:
+                mirror_is_bare = mirror_repo.bare
+            test_repo.close()
+
+        self.assertTrue(mirror_is_bare)
+        self.assertEqual(results[3:6], results[:3])
+        self.assertEqual(results[6:], results[:3])
+        self.assertEqual(len(results[0]), 2)
+        self.assertEqual(environment['GIT_OPTIONAL_LOCKS'], '0')
+
+    @patch('src.main.repo', autospec=True)
+    @patch('src.main.stream_git_diff')
+    def test_git_cli_backend(self, mock_stream_git_diff, mock_repo):
+        mock_stream_git_diff.return_value = iter(['+++ b/file1.py', '@@ -2,0 +3,2 @@', '+a', '+b'])
+        mock_repo.git.blame.return_value = 'blame'
+        cli_backend = create_backend('cli', mock_repo)
+
+        self.assertIsInstance(cli_backend, GitCliBackend)
+        self.assertEqual(cli_backend.get_changes('commit', 'parent'), {'file1.py': LineRanges([(3, 4)])})
+        self.assertEqual(cli_backend.blame('parent', 'file1.py', LineRanges([(3, 4)])), 'blame')
+        mock_stream_git_diff.assert_called_once_with('commit', 'parent')
+
+    @patch('src.main.args', new_callable=make_args, recent=False)
+    @patch('src.main.repo', autospec=True)
+    def test_get_all_candidate_commits_uses_backend(self, mock_repo, mock_args):
+        mock_backend = MagicMock()
+        mock_backend.blame.return_value = [(3, 'sha1', 'author1', 1635724800), (5, 'sha2', 'author2', 1635724801)]
+
+        with patch('src.main.backend', mock_backend):
+            result = get_all_candidate_commits(MagicMock(hexsha='parent'), {'file1.py': [3, 4]})
+
+        self.assertEqual(result, {('sha1', 'author1')})
+        mock_backend.blame.assert_called_once_with('parent', 'file1.py', LineRanges([(3, 4)]))
+        mock_repo.git.blame.assert_not_called()
+
+    @unittest.skipIf(pygit2 is None, 'pygit2 is not installed')
+    def test_pygit2_backend_matches_cli_backend(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            test_repo = create_test_repository(tmp_dir, ['a\nb\nc\nd\n', 'a\nB\nc\nd\n', 'a\nB\nC\n'])
+            commits = list(test_repo.iter_commits())
+            pygit2_backend = create_backend('pygit2', test_repo)
+            with patch('src.main.repo', test_repo):
+                cli_backend = GitCliBackend()
+                cli_changes = cli_backend.get_changes(commits[0].hexsha, commits[1].hexsha)
+                cli_blame = parse_blame_output(cli_backend.blame(commits[1].hexsha, 'file1.py',
+                                                                 LineRanges([(2, 6)])))
+            pygit2_changes = pygit2_backend.get_changes(commits[0].hexsha, commits[1].hexsha)
+            pygit2_blame = pygit2_backend.blame(commits[1].hexsha, 'file1.py', LineRanges([(2, 6)]))
+            pygit2_backend.close()
+            test_repo.close()
+
+        self.assertEqual(pygit2_changes, cli_changes)
+        self.assertEqual(pygit2_blame, cli_blame)
+
+    def test_prune_rules_load(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            config_path = os.path.join(tmp_dir, 'prune.json')
+            with open(config_path, 'w') as config_file:
+                json.dump({'exclude': ['vendor/*'], 'max_blob_size': 1000,
+                           'extensions': {'.lock': {'exclude': True}, '.min.js': {'max_changed_lines': 5},
+                                          '.js': {'max_changed_lines': 50}}}, config_file)
+            rules = PruneRules.load(config_path, include=['src/*'], exclude=['*.pb.go'], max_changed_lines=100)
+
+        self.assertEqual(rules.pathspecs(), ['src/*', ':(exclude)vendor/*', ':(exclude)*.pb.go', ':(exclude)*.lock'])
+        self.assertEqual(rules.max_blob_size, 1000)
+        self.assertEqual(rules.get_limit('src/app.min.js', 'max_changed_lines'), 5)
+        self.assertEqual(rules.get_limit('src/app.js', 'max_changed_lines'), 50)
+        self.assertEqual(rules.get_limit('src/app.py', 'max_changed_lines'), 100)
+        self.assertTrue(rules.matches_path('src/lib/app.py'))
+        self.assertFalse(rules.matches_path('src/yarn.lock'))
+        self.assertFalse(rules.matches_path('docs/index.md'))
+
+    def test_prune_rules_pathspecs(self):
+        # la selezione segue le regole dei pathspec di git, non quelle di fnmatch
+        directory_rules = PruneRules(include=['src'], exclude=['src/gen'])
+        glob_rules = PruneRules(include=[':(glob)src/*', ':(glob)**/test_*.py'])
+
+        self.assertTrue(directory_rules.matches_path('src/lib/app.py'))
+        self.assertFalse(directory_rules.matches_path('srcx/app.py'))
+        self.assertFalse(directory_rules.matches_path('src/gen/model.py'))
+        self.assertTrue(glob_rules.matches_path('src/app.py'))
+        self.assertFalse(glob_rules.matches_path('src/lib/app.py'))
+        self.assertTrue(glob_rules.matches_path('tests/unit/test_app.py'))
+        self.assertTrue(PruneRules(include=[':(glob)src/**']).matches_path('src/lib/app.py'))
+        self.assertTrue(PruneRules(include=['src/*']).matches_path('src/lib/app.py'))
+        self.assertTrue(PruneRules(include=['a[1].py']).matches_path('a[1].py'))
+        self.assertFalse(PruneRules(exclude=['*.lock']).matches_path('src/yarn.lock'))
+
+    def test_git_cli_backend_directory_include(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            test_repo = git.Repo.init(tmp_dir)
+            for version in ('a = 1\n', 'a = 2\n'):
+                for file_path in ('src/lib/app.py', 'docs/conf.py', 'tools.py'):
+                    os.makedirs(os.path.dirname(os.path.join(tmp_dir, file_path)), exist_ok=True)
+                    with open(os.path.join(tmp_dir, file_path), 'w') as test_file:
+                        test_file.write(version)
+                test_repo.index.add(['src/lib/app.py', 'docs/conf.py', 'tools.py'])
+                test_repo.index.commit(f'commit {version}')
+            head = test_repo.head.commit
+
+            results = []
+            for include in ('src', ':(glob)src/**'):
+                for profile in (False, True):
+                    rules = PruneRules(include=[include])
+                    with patch('src.main.repo', test_repo), patch('src.main.prune_rules', rules), \
+                            patch('src.main.profiler', Profiler(profile)):
+                        changes_dict = GitCliBackend().get_changes(head.hexsha, head.parents[0].hexsha)
+                        results.append((prune_changes(head.parents[0].hexsha, changes_dict), rules.take_stats()))
+            test_repo.close()
+
+        # i file esclusi dal pathspec non vengono analizzati; sono contati nel riepilogo solo con --profile
+        self.assertEqual(results, [({'src/lib/app.py': LineRanges([(1, 1)])}, {'files_blamed': 1}),
+                                   ({'src/lib/app.py': LineRanges([(1, 1)])},
+                                    {'files_skipped_by_path': 2, 'files_blamed': 1})] * 2)
+
+    def test_prune_changes(self):
+        rules = PruneRules(max_blob_size=100, extensions={'.txt': {'max_changed_lines': 1}})
+        mock_backend = MagicMock()
+        mock_backend.blob_sizes.return_value = {'big.py': 500, 'small.py': 50}
+        changes_dict = {'big.py': LineRanges([(1, 2)]), 'small.py': LineRanges([(3, 3)]),
+                        'notes.txt': LineRanges([(1, 4)])}
+
+        with patch('src.main.prune_rules', rules), patch('src.main.backend', mock_backend):
+            result = prune_changes('parent', changes_dict)
+
+        self.assertEqual(result, {'small.py': LineRanges([(3, 3)])})
+        mock_backend.blob_sizes.assert_called_once_with('parent', ['big.py', 'small.py'])
+        self.assertEqual(rules.take_stats(), {'files_skipped_by_changed_lines': 1, 'files_skipped_by_size': 1,
+                                              'bytes_skipped': 500, 'lines_skipped': 6, 'files_blamed': 1})
+
+    def test_prune_changes_without_rules(self):
+        changes_dict = {'file1.py': [1]}
+
+        self.assertIs(prune_changes('parent', changes_dict), changes_dict)
+
+    @patch('src.main.repo', autospec=True)
+    def test_stream_git_diff_with_pathspecs(self, mock_repo):
+        mock_repo.git.diff.return_value.stdout = iter([])
+
+        with patch('src.main.prune_rules', PruneRules(exclude=['*.lock'])):
+            list(stream_git_diff('commit', 'parent'))
+
+        mock_repo.git.diff.assert_called_once_with('commit', 'parent', '-U0', '--histogram', '--',
+                                                   ':(exclude)*.lock', as_process=True)
+
+    def test_git_cli_backend_blob_sizes(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            test_repo = create_test_repository(tmp_dir, ['a\nb\n'])
+            with patch('src.main.repo', test_repo):
+                ls_tree_sizes = GitCliBackend().blob_sizes('HEAD', ['file1.py', 'missing.py'])
+            git_pool = GitProcessPool(test_repo.git_dir)
+            with patch('src.main.git_pool', git_pool):
+                pool_sizes = GitCliBackend().blob_sizes('HEAD', ['file1.py', 'missing.py'])
+            git_pool.close()
+            test_repo.close()
+
+        self.assertEqual(ls_tree_sizes, {'file1.py': 4})
+        self.assertEqual(pool_sizes, {'file1.py': 4})
+
+    def test_line_origin_index_matches_blame(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            test_repo = create_test_repository(tmp_dir, ['a\nb\nc\nd\n', 'a\nB\nc\nd\ne\n', 'x\na\nB\nd\ne\n'])
+            # un file rinominato mantiene l'origine delle sue righe
+            test_repo.index.move(['file1.py', 'file2.py'])
+            test_repo.index.commit('rename')
+            with open(os.path.join(tmp_dir, 'file2.py'), 'w') as test_file:
+                test_file.write('x\na\nB2\nd\ne\nf\n')
+            test_repo.index.add(['file2.py'])
+            test_repo.index.commit('edit after rename')
+
+            line_index = LineOriginIndex()
+            self.assertTrue(line_index.update(test_repo))
+            self.assertFalse(line_index.update(test_repo))
+            index_path = os.path.join(tmp_dir, 'line_index.bin')
+            line_index.save(index_path)
+            line_index = LineOriginIndex.load(index_path)
+
+            results = []
+            for commit in test_repo.iter_commits():
+                file_path = 'file2.py' if 'file2.py' in commit.tree else 'file1.py'
+                # le righe oltre la fine del file vengono ignorate, come nel blame con gli intervalli troncati
+                line_ranges = LineRanges([(1, 10)])
+                expected = parse_blame_output(test_repo.git.blame(commit.hexsha, '--porcelain', '--', file_path))
+                results.append((line_index.lookup(commit.hexsha, file_path, line_ranges), (expected, LineRanges())))
+            missing_revision = line_index.lookup('0' * 40, 'file1.py', LineRanges([(1, 1)]))
+            missing_file = line_index.lookup(test_repo.head.commit.hexsha, 'file1.py', LineRanges([(1, 1)]))
+            test_repo.close()
+
+        for result, expected in results:
+            self.assertEqual(result, expected)
+        self.assertIsNone(missing_revision)
+        self.assertIsNone(missing_file)
+
+    def test_line_origin_index_update(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            test_repo = create_test_repository(tmp_dir, ['a\nb\n', 'a\nB\n'])
+            line_index = LineOriginIndex()
+            line_index.update(test_repo)
+            with open(os.path.join(tmp_dir, 'file1.py'), 'w') as test_file:
+                test_file.write('a\nB\nc\n')
+            test_repo.index.add(['file1.py'])
+            test_repo.index.commit('new commit')
+            line_index.update(test_repo)
+            full_index = LineOriginIndex()
+            full_index.update(test_repo)
+
+            # dopo una riscrittura della storia l'indice viene ricostruito
+            test_repo.git.commit('--amend', '-m', 'rewritten commit', env=TEST_IDENTITY)
+            line_index.update(test_repo)
+            head = test_repo.head.commit.hexsha
+            test_repo.close()
+
+        self.assertEqual(full_index.commits[:len(line_index.commits) - 1], line_index.commits[:-1])
+        self.assertEqual(len(line_index.commits), 3)
+        self.assertEqual(line_index.commits[-1], head)
+        self.assertEqual(list(line_index.inserted[0]), list(full_index.inserted[0]))
+
+    def test_line_origin_index_update_unknown_commit(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            # l'ultimo commit indicizzato non esiste nel repository: git rev-list fallisce e l'indice viene ricostruito
+            other_repo = create_test_repository(os.path.join(tmp_dir, 'other'), ['x\n', 'y\n'])
+            test_repo = create_test_repository(os.path.join(tmp_dir, 'repo'), ['a\nb\n', 'a\nB\n'])
+            line_index = LineOriginIndex()
+            line_index.update(other_repo)
+            changed = line_index.update(test_repo)
+            full_index = LineOriginIndex()
+            full_index.update(test_repo)
+            other_repo.close()
+            test_repo.close()
+
+        self.assertTrue(changed)
+        self.assertEqual(line_index.commits, full_index.commits)
+        self.assertEqual(list(line_index.inserted[0]), list(full_index.inserted[0]))
+
+    def test_line_origin_index_merge_lines(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            test_repo = create_test_repository(tmp_dir, ['a\nb\nc\n'])
+            test_repo.git.checkout('-b', 'side')
+            with open(os.path.join(tmp_dir, 'file1.py'), 'w') as test_file:
+                test_file.write('a\nb\nc\nside\n')
+            test_repo.index.add(['file1.py'])
+            test_repo.index.commit('side commit')
+            test_repo.git.checkout('-')
+            with open(os.path.join(tmp_dir, 'other.py'), 'w') as test_file:
+                test_file.write('main\n')
+            test_repo.index.add(['other.py'])
+            test_repo.index.commit('main commit')
+            test_repo.git.merge('side', '--no-edit', env=TEST_IDENTITY)
+
+            line_index = LineOriginIndex()
+            line_index.update(test_repo)
+            blame_entries, merge_ranges = line_index.lookup(test_repo.head.commit.hexsha, 'file1.py',
+                                                            LineRanges([(1, 4)]))
+            test_repo.close()
+
+        # la riga portata dal merge viene lasciata a git blame, che la attribuisce al commit del ramo secondario
+        self.assertEqual([line_number for line_number, commit_sha, author, committed_date in blame_entries], [1, 2, 3])
+        self.assertEqual(merge_ranges, LineRanges([(4, 4)]))
+
+    @patch('src.main.args', new_callable=make_args, recent=False)
+    @patch('src.main.repo', autospec=True)
+    def test_get_all_candidate_commits_with_line_index(self, mock_repo, mock_args):
+        mock_line_index = MagicMock()
+        mock_line_index.lookup.side_effect = [([(1, 'sha1', 'author1', 1635724800)], LineRanges()), None]
+        mock_repo.git.blame.return_value = """85ac1c6ddc93d4f53ff5b2c5c1c7bac7a8a44030 2 2 1
+author Sergey Kozub
+filename file2
+	line
+"""
+        changes_dict = {'file1': [1], 'file2': [2]}
+
+        with patch('src.main.line_index', mock_line_index):
+            result = get_all_candidate_commits(MagicMock(hexsha='parent'), changes_dict)
+
+        self.assertEqual(result, {('sha1', 'author1'), ('85ac1c6ddc93d4f53ff5b2c5c1c7bac7a8a44030', 'Sergey Kozub')})
+        # solo il file che l'indice non conosce viene passato a git blame
+        mock_repo.git.blame.assert_called_once_with('parent', '-L2,2', '--porcelain', '--', 'file2')
+
+
+    def test_load_batch_manifest(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            manifest_path = os.path.join(tmp_dir, 'manifest.jsonl')
+            with open(manifest_path, 'w') as manifest_file:
+                manifest_file.write('"repos/first"\n')
+                manifest_file.write(json.dumps({'repo_path': '/repos/second/', 'issue': 'issues.json',
+                                                'pattern': r'#(\d+)', 'output': 'second.csv'}) + '\n')
+
+            entries = load_batch_manifest(manifest_path, 'results')
+
+            # i percorsi relativi sono risolti rispetto alla cartella del manifest
+            self.assertEqual(entries[0], (os.path.join(tmp_dir, 'repos/first'), None, None,
+                                          os.path.join('results', 'first.jsonl')))
+            self.assertEqual(entries[1], ('/repos/second/', os.path.join(tmp_dir, 'issues.json'), r'#(\d+)',
+                                          os.path.join(tmp_dir, 'second.csv')))
+
+    def test_szz_batch(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            small_repo = create_test_repository(os.path.join(tmp_dir, 'small'), ['a\nb\n', 'a\nc\n'])
+            large_repo = create_test_repository(os.path.join(tmp_dir, 'large'), ['a\nb\n', 'a\nc\n', 'a\nd\n'])
+            for test_repo in (small_repo, large_repo):
+                test_repo.git.commit('--amend', '-m', 'fix bug', env=TEST_IDENTITY)
+            manifest_path = os.path.join(tmp_dir, 'manifest.json')
+            with open(manifest_path, 'w') as manifest_file:
+                json.dump(['small', 'large', 'missing'], manifest_file)
+            output_dir = os.path.join(tmp_dir, 'results')
+            batch_args = make_args(jobs=2, output=output_dir)
+
+            with patch('src.main.args', batch_args), patch('src.main.repo', None), \
+                    patch('builtins.print') as mock_print:
+                szz_batch(manifest_path)
+
+            results = {}
+            for name, test_repo in (('small', small_repo), ('large', large_repo)):
+                with open(os.path.join(output_dir, f'{name}.jsonl')) as output_file:
+                    results[name] = [json.loads(line) for line in output_file]
+                self.assertEqual(results[name][0]['bug_fix_commit'], test_repo.head.commit.hexsha)
+                self.assertEqual(results[name][0]['candidate_commits'][0]['commit'],
+                                 test_repo.head.commit.parents[0].hexsha)
+                test_repo.close()
+
+        messages = [printed_call.args[0] for printed_call in mock_print.call_args_list]
+        # il repository con la storia più lunga viene analizzato per primo, quello mancante viene saltato
+        self.assertIn('missing', messages[0])
+        self.assertTrue(messages[1].startswith(os.path.join(tmp_dir, 'large')))
+        self.assertTrue(messages[2].startswith(os.path.join(tmp_dir, 'small')))
+
+    @patch('src.main.args', make_args())
+    @patch('src.main.BATCH_REPOSITORY_CACHE_SIZE', 1)
+    @patch('src.main.repo', None)
+    @patch('src.main.backend', None)
+    @patch('src.main.blame_cache', None)
+    @patch('src.main.git_pool', None)
+    def test_activate_repository(self):
+        with tempfile.TemporaryDirectory() as tmp_dir, patch('src.main.repository_contexts', {}) as contexts:
+            first_path, second_path = os.path.join(tmp_dir, 'first'), os.path.join(tmp_dir, 'second')
+            create_test_repository(first_path, ['a\n']).close()
+            create_test_repository(second_path, ['b\n']).close()
+
+            activate_repository(first_path)
+            first_repo = contexts[first_path].repo
+            activate_repository(first_path)
+            self.assertIs(contexts[first_path].repo, first_repo)
+
+            # il repository usato meno di recente viene chiuso quando se ne apre un altro
+            with patch.object(first_repo, 'close') as mock_close:
+                activate_repository(second_path)
+            mock_close.assert_called_once()
+            self.assertEqual(list(contexts), [second_path])
+            contexts[second_path].repo.close()
+
+    def test_progress_journal_resume(self):
+        options = {'mode': 'szz', 'recent': False, 'pattern': None}
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            journal_path = os.path.join(tmp_dir, 'journal.jsonl')
+            journal, completed = ProgressJournal.open(journal_path, options)
+            journal.write('fix1', {('commit1', 'author1')})
+            journal.write('fix2', set())
+            journal.close()
+            # l'interruzione ha lasciato una riga scritta a metà
+            with open(journal_path, 'ab') as journal_file:
+                journal_file.write(b'{"bug_fix_commit": "fix3", "candid')
+
+            journal, completed = ProgressJournal.open(journal_path, options, resume=True)
+            journal.write('fix3', {('commit3', 'author3')})
+            journal.close()
+            journal, resumed = ProgressJournal.open(journal_path, options, resume=True)
+            journal.close()
+            journal, restarted = ProgressJournal.open(journal_path, dict(options, recent=True), resume=True)
+            journal.close()
+
+        self.assertEqual(completed, {'fix1': [('commit1', 'author1')], 'fix2': []})
+        self.assertEqual(resumed, {'fix1': [('commit1', 'author1')], 'fix2': [], 'fix3': [('commit3', 'author3')]})
+        # un registro creato con opzioni diverse non viene usato
+        self.assertEqual(restarted, {})
+
+    @patch('src.main.args', new_callable=make_args, recent=False, incremental=None, resume=True)
+    @patch('src.main.get_bug_fix_commits_for_szz')
+    @patch('src.main.search_candidate_commit_szz')
+    @patch('src.main.print_candidate_commit')
+    def test_szz_resume(self, mock_print, mock_search, mock_get_bug_fix_commits, mock_args):
+        mock_get_bug_fix_commits.return_value = ['fix1', 'fix2']
+        mock_search.return_value = {('commit2', 'author2')}
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            mock_args.journal = os.path.join(tmp_dir, 'journal.jsonl')
+            journal, _ = ProgressJournal.open(mock_args.journal, {'mode': 'szz', 'recent': False, 'pattern': None})
+            journal.write('fix1', {('commit1', 'author1')})
+            journal.close()
+
+            szz()
+            journal, completed = ProgressJournal.open(mock_args.journal, {'mode': 'szz', 'recent': False,
+                                                                          'pattern': None}, resume=True)
+            journal.close()
+
+        # solo il commit non registrato viene analizzato, i risultati comprendono anche quello già registrato
+        mock_search.assert_called_once_with('fix2')
+        mock_print.assert_called_once_with({'fix1': [('commit1', 'author1')], 'fix2': {('commit2', 'author2')}})
+        self.assertEqual(completed, {'fix1': [('commit1', 'author1')], 'fix2': [('commit2', 'author2')]})
+
+    def test_get_required_literal(self):
+        self.assertEqual(get_required_literal(r'#(\d+)'), '#')
+        self.assertEqual(get_required_literal(r'JIRA-(\d+)'), 'jira-')
+        self.assertEqual(get_required_literal(r'fix(es|ed)?\s+#\d+'), 'fix')
+        # il carattere reso opzionale dal quantificatore non è obbligatorio
+        self.assertEqual(get_required_literal(r'closes?'), 'close')
+        self.assertEqual(get_required_literal(r'[#!]\d+ fixed'), ' fixed')
+        self.assertEqual(get_required_literal(r'fix|close'), '')
+        self.assertEqual(get_required_literal(r'\x23(\d+)'), '')
+
+    def test_bug_fix_classifier(self):
+        classifier = BugFixClassifier.from_config('#(\\d+)\nJIRA-(\\d+)\n\nfixes\ncloses\n')
+
+        self.assertEqual(classifier.patterns, [r'#(\d+)', r'JIRA-(\d+)', 'fixes', 'closes'])
+        # un'unica scansione restituisce tutte le issue citate, senza ripetizioni e senza distinguere le maiuscole
+        self.assertEqual(classifier.classify('Fixes #12 and jira-7, see #12'), (True, [12, 7]))
+        self.assertEqual(classifier.classify('Closes the leak'), (True, []))
+        self.assertEqual(classifier.classify('Add a feature'), (False, []))
+        self.assertEqual(classifier.classify(None), (False, []))
+        self.assertEqual(classifier.git_patterns(), ['#([0-9]+)', 'JIRA-([0-9]+)', 'fixes', 'closes'])
+
+    def test_bug_fix_classifier_prefilter(self):
+        classifier = BugFixClassifier([r'#(\d+)'])
+        with patch.object(classifier, 'regex', wraps=classifier.regex) as mock_regex:
+            self.assertEqual(classifier.classify('Add a feature'), (False, []))
+            mock_regex.finditer.assert_not_called()
+            self.assertEqual(classifier.classify('Fix #3'), (True, [3]))
+            mock_regex.finditer.assert_called_once()
+
+    def test_bug_fix_classifier_keywords(self):
+        classifier = BugFixClassifier(keywords=('bug', 'fix'))
+
+        self.assertEqual(classifier.classify('Fixed a BUG'), (True, []))
+        self.assertEqual(classifier.classify('Fix a typo'), (False, []))
 
 if __name__ == '__main__':
     unittest.main()